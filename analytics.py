@@ -0,0 +1,80 @@
+"""
+Exports the API catalog of a crawl to Parquet or Arrow tables from the documents it
+saved in the basic format, and summarizes it. Needs pyarrow.
+
+    python analytics.py build --save_path out
+    python analytics.py stats --catalog_path out/catalog
+"""
+import argparse
+import os
+import time
+
+from catalog.writer import CatalogWriter, FORMATS, clear
+from catalog.reader import read_table
+from search import saved_documents
+
+
+def build(save_path, catalog_path, format='parquet'):
+    clear(catalog_path)
+    writer = CatalogWriter(catalog_path, format=format)
+    count = 0
+    for doc in saved_documents(save_path):
+        writer.add(doc, doc['url'])
+        count += 1
+    writer.close()
+    return count
+
+
+def _api_level_key(level):
+    return (0, int(level)) if level and level.isdigit() else (1, level or '')
+
+
+def stats(catalog_path):
+    """
+    Returns {package: (classes, methods)} and {api_level: methods}
+    """
+    classes = read_table(catalog_path, 'classes', ['url', 'package'])
+    methods = read_table(catalog_path, 'methods', ['url', 'api_level', 'method_id'])
+
+    per_class = methods.group_by('url').aggregate([('method_id', 'count')])
+    per_package = per_class.join(classes, 'url', join_type='right outer').group_by('package').aggregate(
+        [('url', 'count'), ('method_id_count', 'sum')]).to_pydict()
+    packages = {}
+    for package, class_count, method_count in zip(per_package['package'], per_package['url_count'],
+                                                  per_package['method_id_count_sum']):
+        packages[package] = (class_count, method_count or 0)
+
+    per_level = methods.group_by('api_level').aggregate([('method_id', 'count')]).to_pydict()
+    api_levels = dict(zip(per_level['api_level'], per_level['method_id_count']))
+    return packages, api_levels
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='Export the catalog of saved documents')
+    build_parser.add_argument('--save_path', required=True, help='Save path of the crawl')
+    build_parser.add_argument('--catalog_path', default=None,
+                              help='[Optional] Directory of the catalog. Defaults to catalog under the save path')
+    build_parser.add_argument('--format', choices=sorted(FORMATS), default='parquet',
+                              help='[Optional] Write Parquet or Arrow IPC files')
+    stats_parser = subparsers.add_parser('stats', help='Print classes and methods per package and api level')
+    stats_parser.add_argument('--catalog_path', required=True, help='Directory of the catalog')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        catalog_path = args.catalog_path or os.path.join(args.save_path, 'catalog')
+        start = time.time()
+        count = build(args.save_path, catalog_path, args.format)
+        print('Exported %d documents in %.1fs' % (count, time.time() - start))
+    else:
+        start = time.perf_counter()
+        packages, api_levels = stats(args.catalog_path)
+        elapsed = time.perf_counter() - start
+        print('%-40s %8s %8s' % ('package', 'classes', 'methods'))
+        for package in sorted(packages):
+            print('%-40s %8d %8d' % ((package,) + packages[package]))
+        print('\n%-40s %8s' % ('api level', 'methods'))
+        for level in sorted(api_levels, key=_api_level_key):
+            print('%-40s %8d' % (level, api_levels[level]))
+        print('\nScanned in %.1f ms' % (elapsed * 1000))
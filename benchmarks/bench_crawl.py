@@ -0,0 +1,87 @@
+"""
+Crawls the benchmark corpus from a local replay server end to end and prints a JSON
+report with pages/sec, p50/p99 page latency, the stage timings of the crawl and the
+peak RSS of the main process and of the largest worker.
+
+    python benchmarks/bench_crawl.py --latency 0.05 --num_workers 8 --output after.json
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import DEFAULT_CORPUS, ensure_corpus
+from benchmarks.replay_server import ReplayServer
+from fetchers.async_fetcher import AsyncFetcher
+from fetchers.urllib_fetcher import UrllibFetcher
+from parsers.android_ref_parser import AndroidDocParser
+from scraper import Scraper
+from serializers.basic_serializer import BasicSerializer
+from sinks.file_sink import FileSink
+from sinks.shard_sink import ShardSink
+
+FETCHERS = {'urllib': UrllibFetcher, 'async': AsyncFetcher}
+SINKS = {'files': FileSink, 'shards': ShardSink}
+
+
+def peak_rss_mb(who):
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(who).ru_maxrss / 1024.0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='Corpus directory, generated if missing')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds the server adds to every response')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--num_workers', type=int, default=5)
+    parser.add_argument('--fetcher', default='urllib', choices=sorted(FETCHERS))
+    parser.add_argument('--max_inflight', type=int, default=20)
+    parser.add_argument('--fetch_threads', type=int, default=0)
+    parser.add_argument('--write_threads', type=int, default=1)
+    parser.add_argument('--sink', default='files', choices=sorted(SINKS))
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    ensure_corpus(args.corpus)
+    server = ReplayServer(args.corpus, latency=args.latency, jitter=args.jitter).start()
+
+    with tempfile.TemporaryDirectory() as save_path:
+        report_path = os.path.join(save_path, 'crawl-report.json')
+        scraper = Scraper(server.url + '/reference/classes.html', parser_class=AndroidDocParser,
+                          serializer_class=BasicSerializer, path_filters=['reference'],
+                          save_path=save_path, num_workers=args.num_workers,
+                          fetcher_class=FETCHERS[args.fetcher], max_inflight=args.max_inflight,
+                          sink_class=SINKS[args.sink], progress_interval=0, report_path=report_path,
+                          fetch_threads=args.fetch_threads, write_threads=args.write_threads)
+        for _ in scraper.start_scraping():
+            pass
+        scraper.close()
+        with open(report_path) as fp:
+            crawl = json.load(fp)
+    server.stop()
+
+    page_latency = crawl['latency'].get('page', {})
+    report = {
+        'config': vars(args),
+        'pages': crawl['pages'],
+        'elapsed': crawl['elapsed'],
+        'pages_per_sec': crawl['pages_per_sec'],
+        'latency_p50_ms': page_latency.get('p50', 0) * 1000,
+        'latency_p99_ms': page_latency.get('p99', 0) * 1000,
+        'peak_rss_mb': {'main': peak_rss_mb(resource.RUSAGE_SELF),
+                        'worker': peak_rss_mb(resource.RUSAGE_CHILDREN)},
+        'counters': crawl['counters'],
+        'stages': crawl['stages'],
+    }
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(text + '\n')
+    else:
+        print(text)
@@ -0,0 +1,115 @@
+"""
+Micro benchmarks for AndroidDocParser on one page of every corpus profile: building the
+tree, parse, text cleaning and both serializers. Prints a JSON report, so runs
+before and after a change can be diffed.
+
+    python benchmarks/bench_parser.py --output before.json
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import DEFAULT_CORPUS, ensure_corpus, profile_pages
+from documentation import Documentation
+from parsers.android_ref_parser import AndroidDocParser
+from parsers.text import TextCleaner
+from serializers.basic_serializer import BasicSerializer
+from serializers.drqa_serializer import DrQASerializer
+
+
+def _get_text_cleaned_regex(block):
+    # Text cleaning as it was before parsers.text, a Python callback for every whitespace run
+    return re.sub('\n+|\s+', lambda m: ' ' if ' ' in m.group(0) else '', block.get_text().strip())
+
+
+def measure(fn, repeat, min_time=0.2):
+    """
+    Calls fn until min_time has passed, repeat times over, and returns the best and
+    median seconds per call
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_time / 10 or number >= 1 << 20:
+            break
+        number *= 2
+
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - start) / number)
+    runs.sort()
+    return {'best_ms': runs[0] * 1000, 'median_ms': runs[len(runs) // 2] * 1000, 'calls': number}
+
+
+def bench_page(html, repeat):
+    results = {'bytes': len(html)}
+    results['build_tree'] = measure(lambda: AndroidDocParser.build_tree(html), repeat)
+
+    soup = AndroidDocParser.build_tree(html)
+
+    def parse():
+        AndroidDocParser(soup).parse(soup, Documentation())
+    results['parse'] = measure(parse, repeat)
+
+    # One TextCleaner per call, the parser uses one per page
+    blocks = soup.find('div', class_='api').find_all(['p', 'h3', 'code', 'td'])
+
+    def clean_blocks():
+        cleaner = TextCleaner()
+        return [cleaner.clean(b) for b in blocks]
+    assert clean_blocks() == [_get_text_cleaned_regex(b) for b in blocks]
+    results['get_text_cleaned.regex'] = measure(lambda: [_get_text_cleaned_regex(b) for b in blocks], repeat)
+    results['get_text_cleaned'] = measure(clean_blocks, repeat)
+    results['get_text_cleaned']['speedup'] = (results['get_text_cleaned.regex']['best_ms'] /
+                                              results['get_text_cleaned']['best_ms'])
+
+    # Table cells after the code in them, the way the parser cleans them
+    cells = [node for b in blocks if b.name == 'td' for node in (b.code, b) if node is not None]
+
+    def clean_cells():
+        cleaner = TextCleaner()
+        return [cleaner.clean(cell) for cell in cells]
+    results['clean_cells.regex'] = measure(lambda: [_get_text_cleaned_regex(cell) for cell in cells], repeat)
+    results['clean_cells'] = measure(clean_cells, repeat)
+    results['clean_cells']['speedup'] = results['clean_cells.regex']['best_ms'] / results['clean_cells']['best_ms']
+    results['get_text_cleaned']['blocks'] = len(blocks)
+
+    parser = AndroidDocParser(soup)
+    parser.extract()
+    url = 'https://developer.android.com/reference/android/app/Page.html'
+    for name, Serializer in (('basic', BasicSerializer), ('drqa', DrQASerializer)):
+        serializer = Serializer(url, parser)
+        results['serialize.' + name] = measure(
+            lambda: serializer.convert(parser.documentation, url, 'Page'), repeat)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='Corpus directory, generated if missing')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    ensure_corpus(args.corpus)
+    report = {'repeat': args.repeat, 'profiles': {}}
+    for profile, rel_path in sorted(profile_pages().items()):
+        with open(os.path.join(args.corpus, rel_path), 'rb') as fp:
+            report['profiles'][profile] = bench_page(fp.read(), args.repeat)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(text + '\n')
+    else:
+        print(text)
@@ -0,0 +1,54 @@
+"""
+Times building the tree and extracting documentation for every saved page in a
+directory with each BeautifulSoup backend, and checks that all backends produce the
+same output as html5lib. Uses the generated benchmark corpus unless --pages_dir is given.
+
+    python benchmarks/bench_parser_backends.py --pages_dir path/to/saved/pages
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import DEFAULT_CORPUS, ensure_corpus
+from parsers.android_ref_parser import AndroidDocParser
+from serializers.basic_serializer import BasicSerializer
+
+BACKENDS = ['html5lib', 'html.parser', 'lxml']
+
+
+def parse_page(html, backend):
+    Parser = type('Parser', (AndroidDocParser,), {'tree_backend': backend})
+    parser = Parser(Parser.build_tree(html))
+    if not parser.extract():
+        return None
+    return BasicSerializer('', parser).convert(parser.documentation, '', '')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages_dir', default=None, help='Directory of saved html pages')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    if not args.pages_dir:
+        args.pages_dir = ensure_corpus(DEFAULT_CORPUS)
+
+    pages = [open(p, 'rb').read() for p in sorted(glob.glob(os.path.join(args.pages_dir, '**', '*.html'), 
+                                                           recursive=True))]
+    expected = [parse_page(html, 'html5lib') for html in pages]
+
+    failed = False
+    for backend in BACKENDS:
+        mismatches = sum(parse_page(html, backend) != out for html, out in zip(pages, expected))
+        start = time.time()
+        for _ in range(args.repeat):
+            for html in pages:
+                parse_page(html, backend)
+        per_page = (time.time() - start) / (args.repeat * len(pages))
+        print('%-12s %8.2f ms/page  mismatches=%d/%d' % (backend, per_page * 1000, mismatches, len(pages)))
+        failed = failed or mismatches > 0
+
+    sys.exit(1 if failed else 0)
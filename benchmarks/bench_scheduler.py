@@ -0,0 +1,190 @@
+"""
+Crawls a synthetic site graph served from a local HTTP server and reports how many
+pages were reached and how long the crawl took for a range of worker counts. The
+busy_flag loop is the crawl loop the scheduler replaced, which polled queue sizes and
+a bitmask of busy workers to tell when the crawl was over.
+
+    python benchmarks/bench_scheduler.py --num_pages 2000 --workers 4 16 64
+    python benchmarks/bench_scheduler.py --loops busy_flag scheduler --workers 16
+"""
+from urllib.parse import urldefrag
+import argparse
+import functools
+import http.server
+import multiprocessing as mp
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from scraper import Scraper
+from parsers.android_ref_parser import AndroidDocParser
+from serializers.basic_serializer import BasicSerializer
+from fetchers.fetcher import FetchError
+from fetchers.urllib_fetcher import UrllibFetcher
+
+# The busy_flag loop keeps a bit per worker in a C int
+MAX_BUSY_FLAG_WORKERS = 31
+
+
+def make_graph(num_pages, out_degree, seed=0):
+    rng = random.Random(seed)
+    return [rng.sample(range(num_pages), out_degree) for _ in range(num_pages)]
+
+
+def reachable(graph):
+    seen = {0}
+    stack = [0]
+    while stack:
+        for page in graph[stack.pop()]:
+            if page not in seen:
+                seen.add(page)
+                stack.append(page)
+    return len(seen)
+
+
+class _GraphHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def __init__(self, graph, *args, **kwargs):
+        self._graph = graph
+        super(_GraphHandler, self).__init__(*args, **kwargs)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        page = int(os.path.splitext(os.path.basename(self.path))[0])
+        host = 'http://%s:%d' % self.server.server_address
+        links = ''.join('<a href="%s/site/%d.html#top">%d</a>' % (host, p, p) for p in self._graph[page])
+        body = ('<html><body>%s</body></html>' % links).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(graph):
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(_GraphHandler, graph))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _busy_flag_worker(id, path_filter, url_queue, output_queue, busy_flag, processed, save_path, Parser,
+                      Serializer):
+    query_pattern = re.compile(path_filter)
+    fetcher = UrllibFetcher()
+    while True:
+        url = url_queue.get()
+        if url is None:
+            break
+
+        busy_flag.value |= 1 << id
+        try:
+            response = fetcher.fetch(url)
+        except FetchError:
+            output_queue.put(None)
+            busy_flag.value &= ~(1 << id)
+            continue
+
+        soup = BeautifulSoup(response.body, 'html5lib')
+        parser = Parser(soup)
+        try:
+            if parser.extract():
+                Serializer(url, parser, save_path=save_path).save()
+        except:
+            pass
+        with processed.get_lock():
+            processed.value += 1
+
+        url_set = set()
+        for link in (a['href'] for a in soup.find_all('a', href=True)):
+            if query_pattern.search(link):
+                link, frag = urldefrag(link)
+                if link not in url_set:
+                    url_set.add(link)
+                    output_queue.put(link)
+        if len(url_set) == 0:
+            output_queue.put(None)
+
+        busy_flag.value &= ~(1 << id)
+
+
+def crawl_busy_flag(start_url, num_workers, save_path, path_filter='site'):
+    """
+    Crawls from start_url with the loop the scheduler replaced and returns the number
+    of pages processed when it stopped
+    """
+    url_queue = mp.Queue()
+    output_queue = mp.Queue()
+    busy_flag = mp.Value('i', 0)
+    processed = mp.Value('i', 0)
+    workers = [mp.Process(target=_busy_flag_worker,
+                          args=(id, path_filter, url_queue, output_queue, busy_flag, processed, save_path,
+                                AndroidDocParser, BasicSerializer), daemon=True)
+               for id in range(num_workers)]
+    for worker in workers:
+        worker.start()
+
+    url_set = set([start_url])
+    url_queue.put(start_url)
+    while True:
+        cur_url = output_queue.get()
+        if cur_url is not None and cur_url not in url_set:
+            url_set.add(cur_url)
+            url_queue.put(cur_url)
+        if output_queue.qsize() == 0 and url_queue.qsize() == 0 and busy_flag.value == 0:
+            break
+
+    pages = processed.value
+    for worker in workers:
+        worker.terminate()
+        worker.join()
+    return pages
+
+
+def crawl_scheduler(start_url, num_workers, save_path):
+    scraper = Scraper(start_url, parser_class=AndroidDocParser, serializer_class=BasicSerializer,
+                      save_path=save_path, num_workers=num_workers)
+    pages = sum(1 for _ in scraper.start_scraping())
+    scraper.close()
+    return pages
+
+
+LOOPS = {'busy_flag': crawl_busy_flag, 'scheduler': crawl_scheduler}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num_pages', type=int, default=1000)
+    parser.add_argument('--out_degree', type=int, default=5)
+    parser.add_argument('--workers', type=int, nargs='*', default=[4, 16, 64])
+    parser.add_argument('--save_path', default='bench-output')
+    parser.add_argument('--loops', nargs='*', choices=sorted(LOOPS), default=['scheduler'],
+                        help='[Optional] Crawl loops to compare')
+    args = parser.parse_args()
+
+    graph = make_graph(args.num_pages, args.out_degree)
+    server = serve(graph)
+    start_url = 'http://%s:%d/site/0.html' % server.server_address
+    expected = reachable(graph)
+
+    for loop in args.loops:
+        for num_workers in args.workers:
+            if loop == 'busy_flag' and num_workers > MAX_BUSY_FLAG_WORKERS:
+                print('loop=%s workers=%d skipped, it supports up to %d workers' %
+                      (loop, num_workers, MAX_BUSY_FLAG_WORKERS))
+                continue
+            start = time.time()
+            pages = LOOPS[loop](start_url, num_workers, args.save_path)
+            elapsed = time.time() - start
+            print('loop=%s workers=%d pages=%d/%d time=%.2fs pages/sec=%.1f' %
+                  (loop, num_workers, pages, expected, elapsed, pages / elapsed))
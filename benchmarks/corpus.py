@@ -0,0 +1,224 @@
+"""
+Generates a corpus of pages shaped like the Android reference: a few packages, each
+with small interfaces, regular classes, constant heavy classes like Context and one
+huge class like Activity, plus package summaries and a classes.html index. Pages link
+to https://developer.android.com like the real ones, the replay server rewrites that
+to its own address. Generation is deterministic for a given seed.
+
+    python benchmarks/corpus.py --out benchmarks/corpus --num_classes 200
+"""
+import argparse
+import os
+import random
+
+ORIGIN = 'https://developer.android.com'
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+
+# name: (constants, fields, methods)
+PROFILES = {
+    'interface': (0, 0, 3),
+    'class': (5, 2, 25),
+    'constants': (250, 4, 40),
+    'huge': (30, 10, 400),
+}
+
+_WORDS = ('the view activity called when returns value system service instance of a to is for '
+          'with this that intent context window bundle state current default used by can be '
+          'set which user application').split()
+
+
+def _sentence(rng, words=12):
+    text = ' '.join(rng.choice(_WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + '.'
+
+
+def _description(rng):
+    # Real descriptions are wrapped at odd places and mix in inline code
+    parts = [_sentence(rng, rng.randint(6, 20)) for _ in range(rng.randint(1, 4))]
+    return '\n  '.join(parts).replace(' the ', ' <code>the</code>\n ', 1)
+
+
+def _link(path, text):
+    return '<a href="%s/reference/%s.html">%s</a>' % (ORIGIN, path, text)
+
+
+def _ref(rng, all_classes, text):
+    # Type references point at pages that exist in the corpus so a crawl never hits a 404
+    return _link(rng.choice(all_classes), text)
+
+
+def _chrome(rng, all_classes, title):
+    nav = ''.join('<li>%s</li>\n' % _link(path, path.split('/')[-1])
+                  for path in rng.sample(all_classes, min(150, len(all_classes))))
+    head = ('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>%s | Android Developers</title>'
+            '<script>var config = {"a": 1};</script></head>\n<body>\n'
+            '<header><nav><ul>%s</ul></nav></header>\n<div class="devsite-article-body">\n' % (title, nav))
+    tail = '</div>\n<footer><a href="%s/license">License</a></footer></body></html>\n' % ORIGIN
+    return head, tail
+
+
+def class_page(rng, package, name, profile, all_classes):
+    num_constants, num_fields, num_methods = PROFILES[profile]
+    obj_type = 'interface' if profile == 'interface' else 'class'
+    head, tail = _chrome(rng, all_classes, name)
+    out = [head]
+    out.append('<div class="api apilevel-%d" data-version-added="%d">\n' % ((rng.randint(1, 28),) * 2))
+    out.append('<h1 class="api-title">%s</h1>\n' % name)
+    out.append('<p>\n<code class="api-signature">public %s %s</code>\n' % (
+        'interface' if obj_type == 'interface' else 'abstract class', name))
+    if obj_type == 'class':
+        out.append('<br><code class="api-signature">extends %s</code>\n' % _ref(rng, all_classes,
+                                                                              'ContextThemeWrapper'))
+        out.append('<br><code class="api-signature">implements %s, %s</code>\n' % (
+            _ref(rng, all_classes, 'Window.Callback'), _ref(rng, all_classes, 'KeyEvent.Callback')))
+    out.append('</p>\n<table class="jd-inheritance-table"><tr><td colspan="3">java.lang.Object</td></tr></table>\n')
+    for _ in range(rng.randint(1, 5)):
+        out.append('<p>%s</p>\n' % _description(rng))
+    out.append('<ul>\n<li>%s</li>\n<li>%s</li>\n</ul>\n' % (_sentence(rng), _sentence(rng)))
+    out.append('<pre class="prettyprint">public class Example { }</pre>\n')
+
+    out.append('<h2 class="api-section" id="summary">Summary</h2>\n')
+    out.append('<table id="nestedclasses" class="responsive">\n<tr><th colspan="2"><h3>Nested classes</h3></th></tr>\n')
+    for i in range(rng.randint(0, 3)):
+        out.append('<tr><td><code>class</code></td><td width="100%%"><code>%s</code>\n<p>%s</p></td></tr>\n' % (
+            _ref(rng, all_classes, '%s.Inner%d' % (name, i)), _sentence(rng)))
+    out.append('</table>\n')
+
+    if num_constants:
+        out.append('<h2 class="api-section" id="constants">Constants</h2>\n')
+        for i in range(num_constants):
+            const = '%s_%d' % (rng.choice(_WORDS).upper(), i)
+            out.append('<div class="api apilevel-%d" data-version-added="%d">\n'
+                       '<h3 class="api-name" id="%s">%s</h3>\n'
+                       '<div class="api-level"><div>added in <a href="%s/guide/api-levels">API level 1</a></div></div>\n'
+                       '<pre class="api-signature no-pretty-print">\nint %s</pre>\n'
+                       '<p>%s</p>\n<p>Constant Value:\n\n            %d\n            (0x%08x)\n\n</p>\n</div>\n' % (
+                           rng.randint(1, 28), rng.randint(1, 28), const, const, ORIGIN, const,
+                           _description(rng), i, i))
+
+    if num_fields:
+        out.append('<h2 class="api-section" id="fields">Fields</h2>\n')
+        for i in range(num_fields):
+            field = 'FIELD_%d' % i
+            out.append('<div class="api apilevel-1" data-version-added="1">\n<h3 class="api-name" id="%s">%s</h3>\n'
+                       '<pre class="api-signature no-pretty-print">\nint[] %s</pre>\n<p>%s</p>\n</div>\n' % (
+                           field, field, field, _description(rng)))
+
+    if obj_type == 'class':
+        out.append('<a name="pubctors"></a>\n<a><h2 class="api-section" id="pubctors">Public constructors</h2></a>\n')
+        out.append('<div class="api apilevel-1" data-version-added="1">\n<h3 class="api-name" id="%s()">%s</h3>\n'
+                   '<pre class="api-signature no-pretty-print">\n%s ()</pre>\n<p>%s</p>\n</div>\n' % (
+                       name, name, name, _sentence(rng)))
+
+    for section, count in (('Public methods', num_methods), ('Protected methods', num_methods // 10)):
+        if not count:
+            continue
+        out.append('<h2 class="api-section" id="%s">%s</h2>\n' % (section.split()[0].lower(), section))
+        for i in range(count):
+            method = '%s%s%d' % (rng.choice(('get', 'set', 'on', 'is', 'dispatch')), rng.choice(_WORDS).title(), i)
+            params = rng.randint(0, 3)
+            returns = rng.random() < 0.6
+            out.append('<div class="api apilevel-%d" data-version-added="%d">\n'
+                       '<h3 class="api-name" id="%s(int)">%s</h3>\n'
+                       '<pre class="api-signature no-pretty-print">\n%s %s (%s)</pre>\n<p>%s</p>\n' % (
+                           rng.randint(1, 28), rng.randint(1, 28), method, method,
+                           'boolean' if returns else 'void', method,
+                           ', '.join('int arg%d' % p for p in range(params)), _description(rng)))
+            if params:
+                out.append('<table class="responsive">\n<tr><th colspan="2">Parameters</th></tr>\n')
+                for p in range(params):
+                    out.append('<tr>\n<td width="20%%"><code>arg%d</code></td>\n'
+                               '<td width="80%%"><code>%s</code>: %s</td>\n</tr>\n' % (
+                                   p, _ref(rng, all_classes, 'View'), _description(rng)))
+                out.append('</table>\n')
+            if returns:
+                out.append('<table class="responsive">\n<tr><th colspan="2">Returns</th></tr>\n'
+                           '<tr>\n<td width="20%%"><code>boolean</code></td>\n<td width="80%%">%s</td>\n</tr>\n'
+                           '</table>\n' % _description(rng))
+            out.append('</div>\n')
+
+    out.append('</div>\n')
+    out.append(tail)
+    return ''.join(out)
+
+
+def index_page(rng, title, paths, all_classes):
+    head, tail = _chrome(rng, all_classes, title)
+    rows = ''.join('<tr><td>%s</td><td>%s</td></tr>\n' % (_link(path, path.split('/')[-1]), _sentence(rng))
+                   for path in paths)
+    return '%s<h1>%s</h1>\n<table>%s</table>\n%s' % (head, title, rows, tail)
+
+
+def _classes(num_classes, num_packages):
+    packages = ['android/%s' % p for p in ('app', 'content', 'view', 'widget', 'os', 'net', 'media')[:num_packages]]
+    classes = []
+    for i in range(num_classes):
+        package = packages[i % len(packages)]
+        if i < len(packages):
+            profile = 'huge'
+        elif i % 10 == 1:
+            profile = 'constants'
+        elif i % 3 == 0:
+            profile = 'interface'
+        else:
+            profile = 'class'
+        classes.append((package, 'Class%d' % i, profile))
+    return packages, classes
+
+
+def profile_pages(num_classes=200, num_packages=5):
+    """
+    Returns the path relative to the corpus directory of the first class page of every
+    profile
+    """
+    pages = {}
+    for package, name, profile in _classes(num_classes, num_packages)[1]:
+        pages.setdefault(profile, os.path.join('reference', package, name + '.html'))
+    return pages
+
+
+def generate_corpus(out_dir, num_classes=200, num_packages=5, seed=0):
+    """
+    Writes the corpus under out_dir/reference and returns the paths of the class pages
+    relative to out_dir
+    """
+    rng = random.Random(seed)
+    packages, classes = _classes(num_classes, num_packages)
+    all_paths = ['%s/%s' % (package, name) for package, name, _ in classes]
+
+    pages = []
+    for (package, name, profile), path in zip(classes, all_paths):
+        rel_path = os.path.join('reference', path + '.html')
+        pages.append((rel_path, class_page(rng, package, name, profile, all_paths)))
+    for package in packages:
+        members = [p for p in all_paths if p.startswith(package + '/')]
+        pages.append((os.path.join('reference', package, 'package-summary.html'),
+                      index_page(rng, package.replace('/', '.'), members, all_paths)))
+    pages.append((os.path.join('reference', 'classes.html'), index_page(rng, 'Class Index', all_paths, all_paths)))
+
+    for rel_path, html in pages:
+        path = os.path.join(out_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as fp:
+            fp.write(html)
+    return [rel_path for rel_path, _ in pages[:num_classes]]
+
+
+def ensure_corpus(out_dir=DEFAULT_CORPUS, num_classes=200):
+    """
+    Generates the default corpus if it isn't there yet
+    """
+    if not os.path.exists(os.path.join(out_dir, 'reference', 'classes.html')):
+        generate_corpus(out_dir, num_classes)
+    return out_dir
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--out', default=DEFAULT_CORPUS, help='Directory to write the corpus to')
+    parser.add_argument('--num_classes', type=int, default=200)
+    parser.add_argument('--num_packages', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generate_corpus(args.out, args.num_classes, args.num_packages, args.seed)
@@ -0,0 +1,107 @@
+"""
+Serves a directory of recorded pages over HTTP/1.1 with keep-alive, optionally adding
+latency to every response. Links to the origin the pages were recorded from are
+rewritten to point at the server, so a crawl stays local.
+
+    python benchmarks/replay_server.py --root benchmarks/corpus --port 8000 --latency 0.05
+"""
+import argparse
+import functools
+import http.server
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import ORIGIN
+
+
+class _ReplayHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def __init__(self, replay, *args, **kwargs):
+        self._replay = replay
+        super(_ReplayHandler, self).__init__(*args, **kwargs)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = self._replay.load(self.path.split('?')[0].split('#')[0])
+        delay = self._replay.latency + random.uniform(0, self._replay.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ReplayServer(object):
+    """
+    Replays the pages under root from a background thread
+    """
+    def __init__(self, root, port=0, latency=0.0, jitter=0.0, origin=ORIGIN):
+        self.latency = latency
+        self.jitter = jitter
+        self._root = os.path.abspath(root)
+        self._origin = origin.encode('utf-8')
+        self._pages = {}
+        self._lock = threading.Lock()
+        self._server = http.server.ThreadingHTTPServer(('127.0.0.1', port),
+                                                       functools.partial(_ReplayHandler, self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % self._server.server_address
+
+    def load(self, path):
+        with self._lock:
+            if path in self._pages:
+                return self._pages[path]
+        file_path = os.path.abspath(os.path.join(self._root, path.lstrip('/')))
+        if not file_path.startswith(self._root) or not os.path.isfile(file_path):
+            return None
+        with open(file_path, 'rb') as fp:
+            body = fp.read().replace(self._origin, self.url.encode('utf-8'))
+        with self._lock:
+            self._pages[path] = body
+        return body
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--root', required=True, help='Directory of recorded pages')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many random seconds on top')
+    parser.add_argument('--origin', default=ORIGIN, help='Origin the pages were recorded from')
+    args = parser.parse_args()
+
+    server = ReplayServer(args.root, args.port, args.latency, args.jitter, args.origin)
+    print('Replaying %s on %s' % (args.root, server.url))
+    server.serve_forever()
@@ -0,0 +1,15 @@
+from catalog.writer import open_dataset, schema
+
+
+def read_table(path, table, columns=None, filter=None):
+    """
+    Reads table of the catalog in path, from the files of all workers, as a pyarrow
+    Table. Only columns are read, and with Parquet only row groups that can match
+    filter, a pyarrow.compute expression
+    """
+    dataset = open_dataset(path, table)
+    if dataset is None:
+        empty = schema(table).empty_table()
+        return empty.select(columns) if columns else empty
+    # Every file and row group has dictionaries of its own, grouping and joining needs one
+    return dataset.to_table(columns=columns, filter=filter).unify_dictionaries()
@@ -0,0 +1,258 @@
+from urllib.parse import urlparse
+import os
+import shutil
+import time
+
+# Extension of the files of every format. Files are written under a hidden name and
+# renamed once complete, so readers never see one a killed worker left behind
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+# Columns of every table of the catalog. Strings that repeat across rows, like the url
+# that ties rows to their class, types and api levels, are dictionary encoded. Members
+# of a class are numbered in page order, constructors and methods together, which is
+# what parameters refer to them by
+TABLES = {
+    'classes': (('url', 'dictionary'), ('package', 'dictionary'), ('name', 'string'),
+                ('object_type', 'dictionary'), ('api_level', 'dictionary'), ('parent_class', 'dictionary'),
+                ('summary', 'string')),
+    'interfaces': (('url', 'dictionary'), ('interface', 'dictionary')),
+    'nested_classes': (('url', 'dictionary'), ('name', 'string'), ('type', 'dictionary'),
+                       ('description', 'string')),
+    'constants': (('url', 'dictionary'), ('name', 'string'), ('type', 'dictionary'), ('value', 'string'),
+                  ('description', 'string'), ('api_level', 'dictionary')),
+    'fields': (('url', 'dictionary'), ('name', 'string'), ('type', 'dictionary'), ('description', 'string'),
+               ('api_level', 'dictionary')),
+    'constructors': (('url', 'dictionary'), ('method_id', 'int32'), ('name', 'string'),
+                     ('description', 'string'), ('api_level', 'dictionary')),
+    'methods': (('url', 'dictionary'), ('method_id', 'int32'), ('visibility', 'dictionary'), ('name', 'string'),
+                ('returns', 'dictionary'), ('returns_description', 'string'), ('description', 'string'),
+                ('api_level', 'dictionary')),
+    'parameters': (('url', 'dictionary'), ('method_id', 'int32'), ('position', 'int32'), ('name', 'dictionary'),
+                   ('type', 'dictionary'), ('description', 'string')),
+}
+
+
+def arrow():
+    """
+    The pyarrow module. The catalog is the only part of the scraper that needs it
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('The catalog needs pyarrow, install it with pip install pyarrow')
+    return pyarrow
+
+
+def schema(table):
+    pa = arrow()
+    types = {'dictionary': pa.dictionary(pa.int32(), pa.string()), 'string': pa.string(), 'int32': pa.int32()}
+    return pa.schema([(name, types[kind]) for name, kind in TABLES[table]])
+
+
+def open_dataset(path, table):
+    """
+    pyarrow dataset over the files of table in the catalog in path, None if no worker
+    wrote a row to it
+    """
+    arrow()
+    import pyarrow.dataset
+    directory = os.path.join(path, table)
+    names = os.listdir(directory) if os.path.isdir(directory) else []
+    for format, ext in FORMATS.items():
+        if any(name.endswith(ext) for name in names):
+            return pyarrow.dataset.dataset(directory, format=format, schema=schema(table))
+    return None
+
+
+def clear(path):
+    """
+    Deletes the tables of an earlier export to path
+    """
+    for table in TABLES:
+        shutil.rmtree(os.path.join(path, table), ignore_errors=True)
+
+
+def _value(doc, key):
+    return doc.get(key) if isinstance(doc, dict) else getattr(doc, key)
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+def _package(url):
+    # Directories of the page under the reference root, dotted, e.g. android.app
+    parts = urlparse(url).path.split('/')[1:-1]
+    if 'reference' in parts:
+        parts = parts[parts.index('reference') + 1:]
+    return '.'.join(parts)
+
+
+def document_rows(doc, url):
+    """
+    Flattens a Documentation, or the dict BasicSerializer saved it as, into
+    (table, row) pairs with the values of the columns of table in order
+    """
+    yield 'classes', (url, _package(url), _value(doc, 'name'), _value(doc, 'object_type'),
+                      _value(doc, 'api_level'), _value(doc, 'parent_class'), '\n'.join(_value(doc, 'summary') or []))
+    for interface in _value(doc, 'interfaces') or []:
+        yield 'interfaces', (url, interface)
+    for nested in _value(doc, 'nested_classes') or []:
+        yield 'nested_classes', (url, nested.get('name'), nested.get('type'), nested.get('description'))
+    for constant in _value(doc, 'constants') or []:
+        yield 'constants', (url, constant.get('name'), constant.get('type'), _text(constant.get('value')),
+                            constant.get('description'), constant.get('api_level'))
+    for field in _value(doc, 'fields') or []:
+        yield 'fields', (url, field.get('name'), field.get('type'), field.get('description'),
+                         field.get('api_level'))
+
+    method_id = 0
+    members = [('constructor', constructor) for constructor in _value(doc, 'constructors') or []]
+    members += [('public', method) for method in _value(doc, 'public_methods') or []]
+    members += [('protected', method) for method in _value(doc, 'protected_methods') or []]
+    for visibility, member in members:
+        if visibility == 'constructor':
+            yield 'constructors', (url, method_id, member.get('name'), member.get('description'),
+                                   member.get('api_level'))
+        else:
+            returns = member.get('returns') or {}
+            yield 'methods', (url, method_id, visibility, member.get('name'), returns.get('type'),
+                              returns.get('description'), member.get('description'), member.get('api_level'))
+        params = member.get('params') or {}
+        for position, (name, param) in enumerate(params.items()):
+            yield 'parameters', (url, method_id, position, name, param.get('type'), param.get('description'))
+        method_id += 1
+
+
+class CatalogWriter(object):
+    """
+    Writes the catalog of the documents a worker saves to a file per table under
+    path/<table>/, in Parquet or as Arrow IPC files. Rows are buffered by column and
+    written as a row group or record batch every row_group_size rows of a table, so
+    memory stays bounded however large the crawl. Files are complete on close
+    """
+    def __init__(self, path, writer_id=0, format='parquet', row_group_size=65536):
+        self._pa = arrow()
+        self._path = path
+        self._name = 'part-%03d%s' % (writer_id, FORMATS[format])
+        self._format = format
+        self._row_group_size = row_group_size
+        self._schemas = dict((table, schema(table)) for table in TABLES)
+        self._columns = dict((table, tuple([] for _ in columns)) for table, columns in TABLES.items())
+        self._writers = {}
+        # Arrow files can only extend the dictionary of a column from one batch to the next,
+        # so it's kept for the whole file. Parquet encodes every row group on its own
+        self._dictionaries = {}
+
+    def add(self, doc, url):
+        for table, row in document_rows(doc, url):
+            columns = self._columns[table]
+            for column, value in zip(columns, row):
+                column.append(value)
+            if len(columns[0]) >= self._row_group_size:
+                self._flush(table)
+
+    def add_batch(self, table, batch):
+        """
+        Adds the rows of a record batch of table, e.g. one read from an earlier catalog
+        """
+        columns = self._columns[table]
+        if self._format == 'parquet':
+            # Parquet encodes dictionaries per row group, the batch goes in as it is
+            self._flush(table)
+            if batch.num_rows:
+                self._writer(table).write_batch(batch)
+            return
+        for column, values in zip(columns, batch.columns):
+            column.extend(values.to_pylist())
+        if len(columns[0]) >= self._row_group_size:
+            self._flush(table)
+
+    def _array(self, table, field, values):
+        pa = self._pa
+        if self._format == 'parquet' or not pa.types.is_dictionary(field.type):
+            return pa.array(values, type=field.type)
+        ids = self._dictionaries.setdefault((table, field.name), {})
+        indices = [None if value is None else ids.setdefault(value, len(ids)) for value in values]
+        return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(list(ids), pa.string()))
+
+    def _writer(self, table):
+        writer = self._writers.get(table)
+        if writer is None:
+            directory = os.path.join(self._path, table)
+            os.makedirs(directory, exist_ok=True)
+            target = os.path.join(directory, '.' + self._name)
+            if self._format == 'parquet':
+                writer = self._pa.parquet.ParquetWriter(target, self._schemas[table])
+            else:
+                options = self._pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+                writer = self._pa.ipc.new_file(target, self._schemas[table], options=options)
+            self._writers[table] = writer
+        return writer
+
+    def _flush(self, table):
+        columns = self._columns[table]
+        if not columns[0]:
+            return
+        table_schema = self._schemas[table]
+        batch = self._pa.record_batch([self._array(table, field, values) for field, values in
+                                       zip(table_schema, columns)], schema=table_schema)
+        self._writer(table).write_batch(batch)
+        for column in columns:
+            del column[:]
+
+    def close(self):
+        for table in TABLES:
+            self._flush(table)
+        for table, writer in self._writers.items():
+            writer.close()
+            directory = os.path.join(self._path, table)
+            os.replace(os.path.join(directory, '.' + self._name), os.path.join(directory, self._name))
+        self._writers = {}
+
+
+def merge_catalog(path, parts_path, format='parquet', removed=()):
+    """
+    Adds the tables the workers of a crawl wrote to parts_path to the catalog in path.
+    Rows of the urls they saved again, or of urls in removed, are replaced and all
+    others carried over, so pages skipped as unchanged stay in the catalog
+    """
+    pa = arrow()
+    import pyarrow.compute
+    replaced = set(removed)
+    saved = open_dataset(parts_path, 'classes')
+    if saved:
+        replaced.update(saved.to_table(columns=['url']).column('url').to_pylist())
+    replaced = pa.array(sorted(replaced), pa.string())
+
+    # Rows carried over are streamed a batch at a time into a file of their own
+    carried_path = path + '.merge'
+    shutil.rmtree(carried_path, ignore_errors=True)
+    carried = CatalogWriter(carried_path, format=format)
+    for table in TABLES:
+        dataset = open_dataset(path, table)
+        for batch in dataset.to_batches() if dataset else []:
+            carried.add_batch(table, batch.filter(pyarrow.compute.invert(
+                pyarrow.compute.is_in(batch.column('url'), value_set=replaced))))
+    carried.close()
+
+    # The carried over rows are in place before the files they came from go, a crash in
+    # between leaves rows twice rather than not at all
+    base = 'base-%d%s' % (time.time() * 1000, FORMATS[format])
+    for table in TABLES:
+        directory = os.path.join(path, table)
+        os.makedirs(directory, exist_ok=True)
+        previous = [name for name in os.listdir(directory) if not name.startswith('.')]
+        carried_file = os.path.join(carried_path, table, carried._name)
+        if os.path.exists(carried_file):
+            os.replace(carried_file, os.path.join(directory, base))
+        for name in previous:
+            os.remove(os.path.join(directory, name))
+        parts = os.path.join(parts_path, table)
+        for name in os.listdir(parts) if os.path.isdir(parts) else []:
+            if not name.startswith('.'):
+                os.replace(os.path.join(parts, name), os.path.join(directory, name))
+    shutil.rmtree(carried_path, ignore_errors=True)
+    shutil.rmtree(parts_path, ignore_errors=True)
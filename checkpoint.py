@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import time
+
+# Per url crawl status
+QUEUED = 0
+FETCHED = 1
+PARSED = 2
+SAVED = 3
+UNCHANGED = 4
+FAILED = 5
+DUPLICATE = 6
+
+# Counter of the pages of every status in metrics
+STATUS_COUNTERS = {FETCHED: 'fetched', PARSED: 'parsed', SAVED: 'saved', UNCHANGED: 'unchanged',
+                   FAILED: 'failed', DUPLICATE: 'duplicates'}
+
+
+class Checkpoint(object):
+    """
+    Crawl state persisted incrementally in sqlite: every url seen along with its status.
+    Urls still queued when a crawl dies are the frontier to pick up again on resume,
+    everything else is complete. Changes are committed in batches every
+    commit_interval seconds
+    """
+    def __init__(self, path, resume=False, commit_interval=1.0):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, status INTEGER) WITHOUT ROWID')
+        if not resume:
+            self._db.execute('DELETE FROM urls')
+        self._db.commit()
+        self._commit_interval = commit_interval
+        self._last_commit = time.time()
+
+    def load(self, saved_urls=None):
+        """
+        Returns all urls seen so far and the ones to queue again. saved_urls are the
+        documents known to have reached the sink, None if every save is durable
+        """
+        seen, pending = [], []
+        for url, status in self._db.execute('SELECT url, status FROM urls'):
+            seen.append(url)
+            if status == QUEUED or (status == SAVED and saved_urls is not None and url not in saved_urls):
+                pending.append(url)
+        return seen, pending
+
+    def add(self, urls):
+        self._db.executemany('INSERT OR IGNORE INTO urls VALUES (?, ?)', ((url, QUEUED) for url in urls))
+        self._maybe_commit()
+
+    def update(self, url, status, new_urls):
+        """
+        Records the result for url along with the new urls found on it
+        """
+        self._db.execute('INSERT OR REPLACE INTO urls VALUES (?, ?)', (url, status))
+        self.add(new_urls)
+
+    def _maybe_commit(self):
+        if time.time() - self._last_commit >= self._commit_interval:
+            self._db.commit()
+            self._last_commit = time.time()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
@@ -0,0 +1,93 @@
+from fetchers.http_cache import normalize_url
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import os
+import sqlite3
+
+# Query parameters that never change the content of a page
+_IGNORED_PARAMS = ('hl', 'authuser', 'ref', 'source')
+_IGNORED_PARAM_PREFIXES = ('utm_',)
+_INDEX_PAGES = ('index.html', 'index.htm')
+
+
+def canonical_url(url):
+    """
+    Maps the aliases of a url to one form: scheme and host lower cased, default port,
+    fragment and index.html dropped, query parameters that don't change the content
+    (language, tracking) removed and the rest sorted
+    """
+    scheme, netloc, path, query, _ = urlsplit(normalize_url(url))
+    head, _, tail = path.rpartition('/')
+    if tail in _INDEX_PAGES:
+        path = head + '/'
+    params = sorted((name, value) for name, value in parse_qsl(query, keep_blank_values=True)
+                    if name not in _IGNORED_PARAMS and not name.startswith(_IGNORED_PARAM_PREFIXES))
+    return urlunsplit((scheme, netloc, path, urlencode(params), ''))
+
+
+class FingerprintIndex(object):
+    """
+    Content fingerprints shared by all workers in sqlite. Within a run the first url
+    to claim a fingerprint owns it and every other url with the same content is a
+    duplicate. Across runs it remembers the fingerprint every url was saved with, so
+    documents that haven't changed aren't parsed and written again. salt is mixed
+    into the saved fingerprints, so changing the parser or output format rewrites
+    everything
+    """
+    def __init__(self, path, run_id, salt=''):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._run_id = run_id
+        self._salt = salt
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS content ('
+                         'fingerprint TEXT PRIMARY KEY, url TEXT, run TEXT) WITHOUT ROWID')
+        self._db.execute('CREATE TABLE IF NOT EXISTS documents ('
+                         'url TEXT PRIMARY KEY, fingerprint TEXT) WITHOUT ROWID')
+
+    def claim(self, url, fingerprint):
+        """
+        Returns the url that owns fingerprint in this run, url itself unless another
+        url with the same content got there first
+        """
+        # Owners from earlier runs are taken over, unless they saved this very content and
+        # so keep it from being written again under another url
+        self._db.execute('INSERT INTO content VALUES (?, ?, ?) ON CONFLICT (fingerprint) DO UPDATE '
+                         'SET url = excluded.url, run = excluded.run WHERE run != excluded.run AND NOT EXISTS '
+                         '(SELECT 1 FROM documents WHERE documents.url = content.url AND documents.fingerprint = ?)',
+                         (fingerprint, url, self._run_id, self._salt + fingerprint))
+        owner, run = self._db.execute('SELECT url, run FROM content WHERE fingerprint = ?',
+                                      (fingerprint,)).fetchone()
+        if owner == url and run != self._run_id:
+            self._db.execute('UPDATE content SET run = ? WHERE fingerprint = ?', (self._run_id, fingerprint))
+        return owner
+
+    def unchanged(self, url, fingerprint):
+        row = self._db.execute('SELECT fingerprint FROM documents WHERE url = ?', (url,)).fetchone()
+        return row is not None and row[0] == self._salt + fingerprint
+
+    def saved(self, url, fingerprint):
+        self._db.execute('INSERT OR REPLACE INTO documents VALUES (?, ?)', (url, self._salt + fingerprint))
+
+    def retain(self, urls):
+        """
+        Forgets the saved fingerprints of all documents but urls, e.g. the ones a sink
+        lost in a crash
+        """
+        self._db.execute('BEGIN')
+        self._db.execute('CREATE TEMP TABLE IF NOT EXISTS retained (url TEXT PRIMARY KEY)')
+        self._db.execute('DELETE FROM retained')
+        self._db.executemany('INSERT OR IGNORE INTO retained VALUES (?)', ((url,) for url in urls))
+        self._db.execute('DELETE FROM documents WHERE url NOT IN (SELECT url FROM retained)')
+        self._db.execute('COMMIT')
+
+    def forget(self, urls):
+        """
+        Forgets the saved fingerprints of urls whose documents were deleted, so they are
+        written again if they come back
+        """
+        self._db.executemany('DELETE FROM documents WHERE url = ?', ((url,) for url in urls))
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,472 @@
+"""
+Spreads a crawl over several machines. A coordinator keeps the frontier and hands out
+urls in leases to crawl nodes, every node being a scraper with its own workers that
+reports back results and the links it found in batches.
+
+    export DOC_SCRAPER_AUTHKEY=<a long random secret>
+    python distributed.py --start_url https://developer.android.com/reference/classes.html \\
+        --listen 10.0.0.5:8790
+    python scraper.py --coordinator 10.0.0.5:8790 --start_url https://developer.android.com/reference/classes.html \\
+        --path_filters reference --save_path node1
+
+Messages are pickled, so anyone holding the key can run code on the coordinator. There
+is no default key, the coordinator and every node need the same secret in --authkey or
+DOC_SCRAPER_AUTHKEY, and the coordinator should only listen on a network you trust.
+"""
+from collections import deque
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge, wait
+import argparse
+import os
+import socket
+import threading
+import time
+import zlib
+
+from checkpoint import Checkpoint, STATUS_COUNTERS
+from dedup import canonical_url
+from metrics import metrics
+from scheduler import Scheduler
+
+DEFAULT_AUTHKEY = os.environ.get('DOC_SCRAPER_AUTHKEY') or None
+
+# Seconds a node waits before asking again when every url is leased to other nodes
+_RETRY_DELAY = 0.5
+# Seconds a client gets to answer the authentication challenge
+_HANDSHAKE_TIMEOUT = 10
+
+
+def parse_address(address):
+    host, _, port = address.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def _authkey_bytes(authkey):
+    # Messages are unpickled, a key anyone could guess would let anyone run code
+    if not authkey:
+        raise ValueError('A distributed crawl needs an authkey, pass --authkey or set DOC_SCRAPER_AUTHKEY')
+    return authkey.encode('utf-8') if isinstance(authkey, str) else authkey
+
+
+class _Node(object):
+    """
+    A connected crawl node and the urls it holds
+    """
+    def __init__(self, connection, lease_timeout):
+        self.connection = connection
+        self.leased = set()
+        self._lease_timeout = lease_timeout
+        self.renew()
+
+    def renew(self):
+        self.deadline = time.time() + self._lease_timeout
+
+
+class Coordinator(object):
+    """
+    Frontier of a distributed crawl, served on address. Urls are partitioned on a hash
+    of their canonical form, every partition deduplicating its share of the urls in a
+    scheduler of its own. Nodes lease urls in batches and hold them until they report
+    back on them. The leases of a node that disconnects, or isn't heard from for
+    lease_timeout seconds, go back to the frontier for other nodes to take
+    """
+    def __init__(self, start_urls, address=('127.0.0.1', 8790), authkey=DEFAULT_AUTHKEY, partitions=4,
+                 lease_timeout=120, frontier_path=None, max_frontier_memory=100000, visited_capacity=1000000,
+                 checkpoint_path=None, resume=False, progress_interval=10, report_path=None):
+        self._start_urls = start_urls
+        self._address = address
+        self._authkey = _authkey_bytes(authkey)
+        self._lease_timeout = lease_timeout
+        self._progress_interval = progress_interval
+        self._report_path = report_path
+        self._checkpoint_path = checkpoint_path
+        self._resume = resume
+        if frontier_path:
+            os.makedirs(frontier_path, exist_ok=True)
+        self._partitions = [Scheduler(canonical_url,
+                                      os.path.join(frontier_path, 'partition-%03d.db' % i) if frontier_path else None,
+                                      max(1, max_frontier_memory // partitions),
+                                      max(1000, visited_capacity // partitions))
+                            for i in range(partitions)]
+        self._nodes = {}
+        self._new_connections = []
+        self._lock = threading.Lock()
+        self._owners = {}
+        self._checkpoint = None
+
+    def _partition(self, url):
+        return zlib.crc32(url.encode('utf-8')) % len(self._partitions)
+
+    def _split(self, urls, canonicalize=False):
+        """
+        urls grouped by partition, in the order of the partitions
+        """
+        parts = [[] for _ in self._partitions]
+        for url in urls:
+            parts[self._partition(canonical_url(url) if canonicalize else url)].append(url)
+        return parts
+
+    def _add(self, urls):
+        # Aliases land in the partition of their canonical url, which deduplicates them
+        new_urls = []
+        for scheduler, part in zip(self._partitions, self._split(urls, canonicalize=True)):
+            new_urls.extend(scheduler.add(part))
+        if self._checkpoint:
+            self._checkpoint.add(new_urls)
+
+    def _lease(self, node, max_urls):
+        # Taken from the partitions in turn, so every lease mixes all of them
+        urls = []
+        while len(urls) < max_urls:
+            taken = False
+            for scheduler in self._partitions:
+                if len(urls) == max_urls:
+                    break
+                url = scheduler.next_url()
+                if url is not None:
+                    urls.append(url)
+                    taken = True
+            if not taken:
+                break
+        for url in urls:
+            self._owners[url] = node
+            node.leased.add(url)
+        return urls
+
+    def _release(self, node):
+        # Urls leased to a node that is gone go back to the frontier
+        for url in node.leased:
+            del self._owners[url]
+        for scheduler, part in zip(self._partitions, self._split(node.leased)):
+            scheduler.requeue(part)
+        node.leased = set()
+
+    @property
+    def outstanding(self):
+        return sum(scheduler.outstanding for scheduler in self._partitions)
+
+    @property
+    def done(self):
+        return all(scheduler.done for scheduler in self._partitions)
+
+    def _handle(self, node, message):
+        """
+        Applies a message of node. Returns the reply and the (url, status) of the urls
+        it completed
+        """
+        node.renew()
+        kind = message[0]
+        if kind == 'heartbeat':
+            return ('ok',), []
+        if kind != 'lease':
+            return ('error', 'Unknown message %s' % kind), []
+
+        _, max_urls, results, links = message
+        # Links before results, so the crawl can't look finished in between
+        self._add(links)
+        completed = []
+        for url, status in results:
+            # Results of a lease that expired are dropped, the url was handed out again
+            if self._owners.get(url) is not node:
+                continue
+            del self._owners[url]
+            node.leased.discard(url)
+            self._partitions[self._partition(url)].complete(url)
+            if self._checkpoint:
+                self._checkpoint.update(url, status, [])
+            metrics.incr('pages')
+            metrics.incr(STATUS_COUNTERS[status])
+            completed.append((url, status))
+
+        if not max_urls:
+            return ('ok',), completed
+        urls = self._lease(node, max_urls)
+        if urls:
+            return ('urls', urls), completed
+        if self.done:
+            return ('done',), completed
+        return ('wait', _RETRY_DELAY), completed
+
+    def _handshake(self, connection):
+        # A client that doesn't answer in time is cut off by shutting the socket down under
+        # the blocked read
+        lock = threading.Lock()
+        waiting = [True]
+
+        def cut_off():
+            with lock:
+                if waiting[0]:
+                    with socket.fromfd(connection.fileno(), socket.AF_INET, socket.SOCK_STREAM) as sock:
+                        sock.shutdown(socket.SHUT_RDWR)
+        timer = threading.Timer(_HANDSHAKE_TIMEOUT, cut_off)
+        timer.daemon = True
+        timer.start()
+        try:
+            deliver_challenge(connection, self._authkey)
+            answer_challenge(connection, self._authkey)
+            authenticated = True
+        except Exception:
+            # A client with the wrong key, one that hung up or was cut off
+            authenticated = False
+        with lock:
+            waiting[0] = False
+        timer.cancel()
+        if not authenticated:
+            connection.close()
+            return
+        with self._lock:
+            self._new_connections.append(connection)
+
+    def _accept(self, listener, closed):
+        # Clients are authenticated on threads of their own, so one that stalls holds up nobody
+        while not closed.is_set():
+            try:
+                connection = listener.accept()
+            except Exception:
+                # The listener closed
+                continue
+            threading.Thread(target=self._handshake, args=(connection,), daemon=True).start()
+
+    def _drop(self, connection):
+        self._release(self._nodes.pop(connection))
+        connection.close()
+
+    def serve(self):
+        """
+        Serves nodes until the crawl is done and yields (url, status) for every page as
+        nodes complete it
+        """
+        if self._checkpoint_path:
+            self._checkpoint = Checkpoint(self._checkpoint_path, resume=self._resume)
+            if self._resume:
+                seen, pending = self._checkpoint.load()
+                print('Resuming with %d urls seen, %d to do' % (len(seen), len(pending)))
+                for scheduler, seen_part, pending_part in zip(self._partitions, self._split(seen),
+                                                              self._split(pending)):
+                    scheduler.restore(seen_part, pending_part)
+        self._add(self._start_urls)
+
+        # Without an authkey the listener leaves the handshake to _handshake
+        listener = Listener(self._address)
+        closed = threading.Event()
+        accept_thread = threading.Thread(target=self._accept, args=(listener, closed), daemon=True)
+        accept_thread.start()
+        print('Coordinator listening on %s:%d' % listener.address)
+        start = last_progress = time.time()
+        finished_at = None
+        try:
+            while True:
+                with self._lock:
+                    for connection in self._new_connections:
+                        self._nodes[connection] = _Node(connection, self._lease_timeout)
+                    self._new_connections = []
+
+                for connection in wait(list(self._nodes), timeout=_RETRY_DELAY):
+                    node = self._nodes[connection]
+                    try:
+                        message = connection.recv()
+                    except (EOFError, OSError):
+                        self._drop(connection)
+                        continue
+                    reply, completed = self._handle(node, message)
+                    try:
+                        connection.send(reply)
+                    except OSError:
+                        # The node died after asking, what it reported still counts
+                        self._drop(connection)
+                    for url, status in completed:
+                        yield url, status
+
+                now = time.time()
+                for node in self._nodes.values():
+                    if node.leased and now > node.deadline:
+                        print('Lease of %d urls expired' % len(node.leased))
+                        metrics.incr('leases_expired')
+                        self._release(node)
+
+                if self._progress_interval and now - last_progress >= self._progress_interval:
+                    last_progress = now
+                    print(metrics.progress_line(now - start, self.outstanding))
+
+                # Once done, nodes get a moment to ask for work and be told so. Links in a late
+                # report of an expired lease can still add work
+                if not self.done:
+                    finished_at = None
+                else:
+                    finished_at = finished_at or now
+                    if not self._nodes or now - finished_at > 2 * self._lease_timeout:
+                        break
+        finally:
+            closed.set()
+            listener.close()
+            for connection in self._nodes:
+                connection.close()
+
+        elapsed = time.time() - start
+        print(metrics.progress_line(elapsed, 0))
+        if self._report_path:
+            metrics.save_report(self._report_path, elapsed)
+        print('Total links', sum(len(scheduler) for scheduler in self._partitions))
+
+    def close(self):
+        if self._checkpoint:
+            self._checkpoint.close()
+            self._checkpoint = None
+        for scheduler in self._partitions:
+            scheduler.close()
+        self._partitions = []
+
+
+class RemoteScheduler(object):
+    """
+    Scheduler of a crawl node, with the interface of Scheduler over the frontier of a
+    coordinator. Urls are leased lease_size at a time. Results and discovered links
+    are sent back with the next lease request, or every report_interval seconds or
+    report_size results, whichever comes first. A heartbeat keeps the leases of a node
+    that is busy with slow pages
+    """
+    def __init__(self, address, authkey=DEFAULT_AUTHKEY, lease_size=32, report_size=64, report_interval=1.0,
+                 heartbeat_interval=10.0):
+        self._connection = Client(address, authkey=_authkey_bytes(authkey))
+        self._lock = threading.Lock()
+        self._lease_size = lease_size
+        self._report_size = report_size
+        self._report_interval = report_interval
+        self._leased = deque()
+        self._results = []
+        self._links = []
+        self._inflight = 0
+        self._completed = 0
+        self._finished = False
+        self._last_report = time.time()
+        self._stop = threading.Event()
+        self._heartbeat = threading.Thread(target=self._heartbeat_loop, args=(heartbeat_interval,), daemon=True)
+        self._heartbeat.start()
+
+    def _call(self, message):
+        with self._lock:
+            self._connection.send(message)
+            return self._connection.recv()
+
+    def _heartbeat_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self._call(('heartbeat',))
+            except (EOFError, OSError):
+                return
+
+    def _send(self, max_urls):
+        results, links = self._results, self._links
+        self._results, self._links = [], []
+        self._last_report = time.time()
+        return self._call(('lease', max_urls, results, links))
+
+    def add(self, urls):
+        """
+        Sends urls to the coordinator with the next report. Which of them are new is
+        only known there, so none are returned
+        """
+        self._links.extend(urls)
+        return []
+
+    def restore(self, seen, pending):
+        # The coordinator keeps the state of the crawl
+        pass
+
+    def next_url(self):
+        """
+        Takes the next leased url, leasing more from the coordinator when there are none
+        left. With nothing in flight it waits until the coordinator has urls or the crawl
+        is done, None then
+        """
+        while not self._leased and not self._finished:
+            reply = self._send(self._lease_size)
+            if reply[0] == 'urls':
+                self._leased.extend(reply[1])
+            elif reply[0] == 'done':
+                self._finished = True
+            elif self._inflight:
+                break
+            else:
+                time.sleep(reply[1])
+        if not self._leased:
+            return None
+        self._inflight += 1
+        return self._leased.popleft()
+
+    def complete(self, url, status=None):
+        self._inflight -= 1
+        self._completed += 1
+        self._results.append((url, status))
+        if len(self._results) >= self._report_size or time.time() - self._last_report >= self._report_interval:
+            self._send(0)
+
+    @property
+    def fetches_avoided(self):
+        return 0
+
+    @property
+    def inflight(self):
+        return self._inflight
+
+    @property
+    def outstanding(self):
+        return len(self._leased) + self._inflight
+
+    @property
+    def done(self):
+        return self._finished and self.outstanding == 0
+
+    def close(self):
+        self._stop.set()
+        try:
+            if self._results or self._links:
+                self._send(0)
+        finally:
+            self._connection.close()
+
+    def __len__(self):
+        return self._completed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--start_url', required=True, nargs='+', help='The starting URLs of the crawl')
+    parser.add_argument('--listen', default='127.0.0.1:8790',
+                        help='[Optional] Address to serve nodes on, host:port')
+    parser.add_argument('--authkey', default=DEFAULT_AUTHKEY,
+                        help='Secret key nodes authenticate with. Defaults to $DOC_SCRAPER_AUTHKEY, one of them '
+                             'is required')
+    parser.add_argument('--partitions', type=int, default=4,
+                        help='[Optional] Partitions of the frontier and visited set, by url hash')
+    parser.add_argument('--lease_timeout', type=float, default=120,
+                        help='[Optional] Seconds after which the urls of a node that went silent are handed out again')
+    parser.add_argument('--save_path', default='', help='[Optional] Path to save the crawl state and report to')
+    parser.add_argument('--frontier_path', default=None,
+                        help='[Optional] Directory of the partitions. Defaults to temporary files')
+    parser.add_argument('--max_frontier_memory', type=int, default=100000,
+                        help='[Optional] Urls the frontier keeps in memory before spilling to disk')
+    parser.add_argument('--visited_capacity', type=int, default=1000000,
+                        help='[Optional] Expected number of urls, sizes the in-memory filter of the visited set')
+    parser.add_argument('--checkpoint_path', default=None,
+                        help='[Optional] Path of the crawl state file. Defaults to crawl-state.db under the save path')
+    parser.add_argument('--resume', action='store_true', default=False,
+                        help='[Optional] Resume an interrupted crawl from its saved state')
+    parser.add_argument('--progress_interval', type=float, default=10,
+                        help='[Optional] Seconds between progress lines. 0 to disable')
+    args = parser.parse_args()
+    if not args.authkey:
+        parser.error('pass --authkey or set DOC_SCRAPER_AUTHKEY')
+
+    if args.save_path:
+        os.makedirs(args.save_path, exist_ok=True)
+    coordinator = Coordinator(args.start_url, parse_address(args.listen), args.authkey, args.partitions,
+                              args.lease_timeout, args.frontier_path, args.max_frontier_memory,
+                              args.visited_capacity,
+                              args.checkpoint_path or os.path.join(args.save_path, 'crawl-state.db'),
+                              args.resume, args.progress_interval,
+                              os.path.join(args.save_path, 'crawl-report.json'))
+    try:
+        for url, status in coordinator.serve():
+            pass
+    finally:
+        coordinator.close()
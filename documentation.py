@@ -1,11 +1,224 @@
-class Parameters(dict):
+from json.encoder import encode_basestring_ascii
+import json
+
+
+class Record(object):
+    """
+    Base class for the members of a page. Records keep their values in slots and can
+    still be read like the dicts they used to be, e.g. constant['name']
+    """
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._template = '{' + ', '.join('"%s": %%s' % key for key in cls.__slots__) + '}'
+
+    def to_json(self):
+        return self._template % tuple([_encode(getattr(self, key)) for key in self.__slots__])
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def keys(self):
+        return self.__slots__
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.__slots__]
+
+    def __eq__(self, other):
+        return dict(self.items()) == (dict(other.items()) if isinstance(other, (Record, dict)) else other)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class NestedClass(Record):
+    __slots__ = ('name', 'type', 'description')
+
+    def __init__(self, name, obj_type, description):
+        self.name = name
+        self.type = obj_type
+        self.description = description
+
+
+class Constant(Record):
+    __slots__ = ('name', 'type', 'value', 'description', 'api_level')
+
+    def __init__(self, name, const_type, value, description, api_level):
+        self.name = name
+        self.type = const_type
+        self.value = value
+        self.description = description
+        self.api_level = api_level
+
+
+class Field(Record):
+    __slots__ = ('name', 'type', 'description', 'api_level')
+
+    def __init__(self, name, field_type, description, api_level):
+        self.name = name
+        self.type = field_type
+        self.description = description
+        self.api_level = api_level
+
+
+class Parameter(Record):
+    __slots__ = ('type', 'description')
+
+    def __init__(self, param_type, description):
+        self.type = param_type
+        self.description = description
+
+
+class Constructor(Record):
+    __slots__ = ('name', 'params', 'description', 'api_level')
+
+    def __init__(self, name, params, description, api_level):
+        self.name = name
+        self.params = params
+        self.description = description
+        self.api_level = api_level
+
+
+class Method(Record):
+    __slots__ = ('name', 'params', 'returns', 'description', 'api_level')
+
+    def __init__(self, name, params, returns, description, api_level):
+        self.name = name
+        self.params = params
+        self.returns = returns
+        self.description = description
+        self.api_level = api_level
+
+
+class Parameters(object):
+    """
+    Parameters of a method in order, readable like a dict of name to parameter
+    """
+    __slots__ = ('_doc', '_names', '_params')
+
+    def __init__(self, doc=None):
+        self._doc = doc
+        self._names = []
+        self._params = []
+
     def add(self, name, param_type, description):
-        self[name] = {'type': param_type, 'description': description}
+        if self._doc:
+            name, param_type = self._doc.intern(name), self._doc.intern(param_type)
+        param = Parameter(param_type, description)
+        if name in self._names:
+            self._params[self._names.index(name)] = param
+        else:
+            self._names.append(name)
+            self._params.append(param)
+
+    def __getitem__(self, name):
+        if name not in self._names:
+            raise KeyError(name)
+        return self._params[self._names.index(name)]
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def keys(self):
+        return list(self._names)
+
+    def items(self):
+        return list(zip(self._names, self._params))
+
+    def to_json(self):
+        return '{' + ', '.join([encode_basestring_ascii(name) + ': ' + param.to_json()
+                                for name, param in zip(self._names, self._params)]) + '}'
+
+    def __eq__(self, other):
+        return dict(self.items()) == (dict(other.items()) if isinstance(other, (Parameters, dict)) else other)
+
+
+class Returns(object):
+    """
+    Return type and description of a method, empty until set
+    """
+    __slots__ = ('_doc', 'type', 'description')
+
+    def __init__(self, doc=None):
+        self._doc = doc
+        self.type = None
+        self.description = None
 
-class Returns(dict):
     def set_returns(self, return_type, description):
-        self['type'] = return_type
-        self['description'] = description
+        self.type = self._doc.intern(return_type) if self._doc else return_type
+        self.description = description
+
+    def items(self):
+        return [('type', self.type), ('description', self.description)] if self.type is not None else []
+
+    def keys(self):
+        return [key for key, _ in self.items()]
+
+    def __getitem__(self, key):
+        return dict(self.items())[key]
+
+    def get(self, key, default=None):
+        return dict(self.items()).get(key, default)
+
+    def __len__(self):
+        return len(self.items())
+
+    def to_json(self):
+        if self.type is None:
+            return '{}'
+        return '{"type": %s, "description": %s}' % (_encode(self.type), _encode(self.description))
+
+    def __eq__(self, other):
+        return dict(self.items()) == (dict(other.items()) if isinstance(other, (Returns, dict)) else other)
+
+
+def _encode(value):
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    elif value is None:
+        return 'null'
+    elif isinstance(value, (Record, Parameters, Returns)):
+        return value.to_json()
+    elif isinstance(value, list):
+        return '[' + ', '.join([_encode(item) for item in value]) + ']'
+    return json.dumps(value)
+
+
+def iter_json(value):
+    """
+    Encodes value in chunks the way json.dumps does with its default settings, one
+    chunk per member of the top level lists. Records, Parameters and Returns are
+    encoded as the dicts they stand for
+    """
+    if isinstance(value, (list, tuple)) and value:
+        separator = '['
+        for item in value:
+            yield separator
+            yield _encode(item)
+            separator = ', '
+        yield ']'
+    elif isinstance(value, dict) and value:
+        separator = '{'
+        for key, item in value.items():
+            yield separator + encode_basestring_ascii(key) + ': '
+            yield from iter_json(item)
+            separator = ', '
+        yield '}'
+    else:
+        yield _encode(value)
+
 
 class Documentation(object):
     """
@@ -24,6 +237,14 @@ class Documentation(object):
         self._constructors = []
         self._public_methods = []
         self._protected_methods = []
+        self._strings = {}
+
+    def intern(self, s):
+        """
+        Returns the copy of s already in use on this page. Types and api levels repeat
+        across hundreds of members on big classes
+        """
+        return self._strings.setdefault(s, s)
 
     def set_name(self, name):
         self._name = name
@@ -33,7 +254,7 @@ class Documentation(object):
 
     def append_summary(self, summary):
         self._summary.append(summary)
-    
+
     def set_object_type(self, obj_type):
         self._obj_type = obj_type
 
@@ -44,50 +265,31 @@ class Documentation(object):
         self._interfaces = interfaces
 
     def add_nested_class(self, name, obj_type, description):
-        self._nested_classes.append({'name': name, 
-                                     'type': obj_type, 
-                                     'description': description})
+        self._nested_classes.append(NestedClass(name, self.intern(obj_type), description))
 
     def add_constant(self, name, const_type, const_value, description, api_level):
-        self._constants.append({'name': name, 
-                                'type': const_type, 
-                                'value': const_value, 
-                                'description': description,
-                                'api_level': api_level})
+        self._constants.append(Constant(name, self.intern(const_type), const_value, description,
+                                        self.intern(api_level)))
 
     def add_field(self, name, field_type, description, api_level):
-        self._fields.append({'name': name, 
-                                'type': field_type, 
-                                'description': description,
-                                'api_level': api_level})
+        self._fields.append(Field(name, self.intern(field_type), description, self.intern(api_level)))
 
     def add_constructor(self, name, description, api_level):
-        params = Parameters()
+        params = Parameters(self)
         returns = Returns() #dummy
-        self._constructors.append({'name': name, 
-                                    'params': params, 
-                                    'description': description, 
-                                    'api_level': api_level})
+        self._constructors.append(Constructor(name, params, description, self.intern(api_level)))
         return params, returns
 
     def add_public_method(self, name, description, api_level):
-        params = Parameters()
-        returns = Returns()
-        self._public_methods.append({'name': name, 
-                                    'params': params, 
-                                    'returns': returns, 
-                                    'description': description,
-                                    'api_level': api_level})
+        params = Parameters(self)
+        returns = Returns(self)
+        self._public_methods.append(Method(name, params, returns, description, self.intern(api_level)))
         return params, returns
 
     def add_protected_method(self, name, description, api_level):
-        params = Parameters()
-        returns = Returns()
-        self._protected_methods.append({'name': name, 
-                                        'params': params, 
-                                        'returns': returns, 
-                                        'description': description,
-                                        'api_level': api_level})
+        params = Parameters(self)
+        returns = Returns(self)
+        self._protected_methods.append(Method(name, params, returns, description, self.intern(api_level)))
         return params, returns
 
     @property
@@ -136,4 +338,4 @@ class Documentation(object):
 
     @property
     def protected_methods(self):
-        return self._protected_methods if len(self._protected_methods) > 0 else None
\ No newline at end of file
+        return self._protected_methods if len(self._protected_methods) > 0 else None
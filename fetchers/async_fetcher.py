@@ -0,0 +1,287 @@
+from fetchers.fetcher import Fetcher, FetchError, Response
+from metrics import metrics
+from urllib.parse import urljoin, urlsplit
+import asyncio
+import gzip
+import ssl
+import threading
+import time
+import zlib
+
+_REDIRECT_CODES = (301, 302, 303, 307, 308)
+_MAX_REDIRECTS = 5
+_SCHEMES = ('http', 'https')
+
+
+class _HostPool(object):
+    """
+    Keep-alive connections to a single host. Limits the number of open connections
+    and hands out idle ones before opening new ones
+    """
+    def __init__(self, scheme, host, port, limit, timeout):
+        self._scheme = scheme
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._idle = []
+        self._slots = asyncio.Semaphore(limit)
+
+    async def acquire(self):
+        await self._slots.acquire()
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+
+        try:
+            context = ssl.create_default_context() if self._scheme == 'https' else None
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(self._host, self._port, ssl=context), self._timeout)
+        except:
+            self._slots.release()
+            raise
+        return reader, writer, False
+
+    def release(self, reader, writer, keep_alive):
+        if keep_alive:
+            self._idle.append((reader, writer))
+        else:
+            writer.close()
+        self._slots.release()
+
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+
+async def _read_response(reader):
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError('Connection closed by server')
+        version, status = line.split(None, 2)[:2]
+        status = int(status)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        # Skip informational responses
+        if status >= 200:
+            break
+
+    keep_alive = version == b'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                # Trailers
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b''.join(chunks)
+    elif 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    elif status in (204, 304):
+        body = b''
+    else:
+        body = await reader.read()
+        keep_alive = False
+
+    encoding = headers.get('content-encoding', '').lower()
+    if encoding == 'gzip':
+        body = gzip.decompress(body)
+    elif encoding == 'deflate':
+        body = zlib.decompress(body)
+
+    return status, headers, body, keep_alive
+
+
+class AsyncFetcher(Fetcher):
+    """
+    Fetcher built on asyncio. Runs an event loop in a background thread of the main
+    process which keeps up to max_inflight requests going at once over pooled
+    keep-alive connections
+    """
+    in_worker = False
+
+    def __init__(self, max_inflight=20, max_per_host=None, timeout=30, rate_limiter=None, max_retries=3):
+        super(AsyncFetcher, self).__init__(rate_limiter, max_retries)
+        self._max_inflight = max_inflight
+        self._max_per_host = max_per_host or max_inflight
+        self._timeout = timeout
+        self._pools = {}
+        self._loop = None
+        self._thread = None
+        self._queue = None
+        self._callback = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def _get_pool(self, scheme, host, port):
+        key = (scheme, host, port)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = _HostPool(scheme, host, port, self._max_per_host, self._timeout)
+            self._pools[key] = pool
+        return pool
+
+    async def _request(self, url, headers):
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        request = ('GET %s HTTP/1.1\r\n'
+                   'Host: %s\r\n'
+                   'User-Agent: documentation-scraper\r\n'
+                   'Accept-Encoding: gzip, deflate\r\n'
+                   'Connection: keep-alive\r\n') % (path, parts.netloc)
+        for name, value in headers.items():
+            request += '%s: %s\r\n' % (name, value)
+        request += '\r\n'
+
+        pool = self._get_pool(parts.scheme, parts.hostname, port)
+        for attempt in range(2):
+            reader, writer, reused = await pool.acquire()
+            keep_alive = False
+            try:
+                status, response_headers, body, keep_alive = await asyncio.wait_for(
+                    self._exchange(reader, writer, request), self._timeout)
+                return status, response_headers, body
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # The server may have dropped an idle connection, try once more on a fresh one
+                if not reused or attempt > 0:
+                    raise
+            finally:
+                pool.release(reader, writer, keep_alive)
+
+    async def _exchange(self, reader, writer, request):
+        # Sending counts against the timeout too, a server that stops reading stalls drain
+        writer.write(request.encode('latin-1'))
+        await writer.drain()
+        return await _read_response(reader)
+
+    async def _fetch_once(self, url, headers):
+        for _ in range(_MAX_REDIRECTS + 1):
+            try:
+                status, response_headers, body = await self._request(url, headers or {})
+            except Exception as e:
+                raise FetchError(url, e)
+
+            if status in _REDIRECT_CODES and 'location' in response_headers:
+                location = urljoin(url, response_headers['location'])
+                if urlsplit(location).scheme not in _SCHEMES:
+                    # Carries the redirect status, which is not retried
+                    raise FetchError(url, 'Redirect to unsupported url %s' % location, status, response_headers)
+                url = location
+                continue
+            if status >= 400:
+                raise FetchError(url, 'HTTP Error %d' % status, status, response_headers)
+            return Response(url, status, response_headers, body)
+
+        raise FetchError(url, 'Too many redirects')
+
+    async def fetch_async(self, url, headers=None):
+        scheme = urlsplit(url).scheme
+        if scheme not in _SCHEMES:
+            # Nothing is sent, so there is nothing to retry or to slow the host down for
+            raise FetchError(url, 'Unsupported scheme %s' % scheme)
+        attempt = 0
+        while True:
+            if self._rate_limiter:
+                await self._rate_limiter.acquire_async(url)
+            start = time.time()
+            status = None
+            try:
+                response = await self._fetch_once(url, headers)
+                status = response.status
+                return response
+            except FetchError as e:
+                status = e.status
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            finally:
+                if self._rate_limiter:
+                    self._rate_limiter.release(url, time.time() - start, status)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _consume(self):
+        while True:
+            task = await self._queue.get()
+            if task is None:
+                break
+            url, headers = task
+            start = time.perf_counter()
+            try:
+                response, error = await self.fetch_async(url, headers), None
+            except FetchError as e:
+                response, error = None, e
+            metrics.add_time('fetch', time.perf_counter() - start)
+
+            try:
+                self._callback(url, response, error)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        consumers = [self._loop.create_task(self._consume()) for _ in range(self._max_inflight)]
+        ready.set()
+        self._loop.run_until_complete(asyncio.gather(*consumers))
+
+        for pool in self._pools.values():
+            pool.close()
+        self._loop.close()
+
+    def start(self, callback=None):
+        """
+        Starts the event loop. Pages passed to submit are handed to
+        callback(url, response, error) from the loop thread
+        """
+        if self._thread:
+            return
+        self._callback = callback
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def submit(self, url, headers=None):
+        with self._lock:
+            self._pending += 1
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (url, headers))
+
+    @property
+    def pending(self):
+        """
+        Number of submitted urls not yet handed to the callback
+        """
+        with self._lock:
+            return self._pending
+
+    def fetch(self, url, headers=None):
+        self.start(self._callback)
+        return asyncio.run_coroutine_threadsafe(self.fetch_async(url, headers), self._loop).result()
+
+    def close(self):
+        if self._thread:
+            for _ in range(self._max_inflight):
+                self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+            self._thread.join()
+            self._thread = None
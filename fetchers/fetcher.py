@@ -0,0 +1,81 @@
+from email.utils import parsedate_to_datetime
+from metrics import metrics
+import random
+import time
+
+# Statuses worth retrying. None is a network error or timeout
+_RETRY_STATUSES = (None, 429, 500, 502, 503, 504)
+_BASE_BACKOFF = 1.0
+_MAX_BACKOFF = 60.0
+
+
+def _parse_retry_after(headers):
+    value = (headers or {}).get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class FetchError(Exception):
+    """
+    Raised when a page could not be downloaded. status is the HTTP status if the
+    server responded
+    """
+    def __init__(self, url, reason, status=None, headers=None):
+        super(FetchError, self).__init__('%s: %s' % (url, reason))
+        self.url = url
+        self.reason = reason
+        self.status = status
+        self.headers = headers or {}
+
+
+class Response(object):
+    """
+    A downloaded page. Header names are lower case
+    """
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class Fetcher(object):
+    """
+    Base class for fetch backends. Backends with in_worker set are created inside
+    every worker process and called synchronously. Others run in the main process
+    and hand downloaded pages to the workers
+    """
+    in_worker = True
+
+    def __init__(self, rate_limiter=None, max_retries=3):
+        self._rate_limiter = rate_limiter
+        self._max_retries = max_retries
+
+    def _retry_delay(self, error, attempt):
+        """
+        Seconds to wait before retrying after error, None if it shouldn't be retried.
+        Honors Retry-After, otherwise backs off exponentially with full jitter
+        """
+        if error.status not in _RETRY_STATUSES or attempt >= self._max_retries:
+            return None
+        metrics.incr('retries')
+        retry_after = _parse_retry_after(error.headers)
+        if retry_after is not None:
+            if self._rate_limiter:
+                self._rate_limiter.block(error.url, retry_after)
+            return retry_after
+        return random.uniform(0, min(_MAX_BACKOFF, _BASE_BACKOFF * 2 ** attempt))
+
+    def fetch(self, url, headers=None):
+        raise NotImplementedError()
+
+    def close(self):
+        pass
@@ -0,0 +1,105 @@
+from fetchers.fetcher import Fetcher, FetchError, Response
+from urllib.parse import urlsplit, urlunsplit
+import hashlib
+import sqlite3
+import time
+import zlib
+
+
+def normalize_url(url):
+    """
+    Lower cases the scheme and host, drops default ports and the fragment
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or '').lower()
+    if parts.port and parts.port != {'http': 80, 'https': 443}.get(scheme):
+        netloc += ':%d' % parts.port
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, ''))
+
+
+def content_hash(body):
+    return hashlib.sha1(body).hexdigest()
+
+
+class HttpCache(object):
+    """
+    On-disk cache of fetched pages keyed by normalized url. Keeps the response body,
+    its validators (ETag/Last-Modified) and the links found on the page so that
+    unchanged pages can be skipped entirely on a re-crawl. Safe to open from
+    several processes at once
+    """
+    def __init__(self, path):
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS pages ('
+                         'url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, '
+                         'content_hash TEXT, body BLOB, links TEXT, fetched_at REAL)')
+
+    def conditional_headers(self, url):
+        """
+        Request headers to revalidate the cached copy of url
+        """
+        row = self._db.execute('SELECT etag, last_modified FROM pages WHERE url = ?',
+                               (normalize_url(url),)).fetchone()
+        headers = {}
+        if row:
+            etag, last_modified = row
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def unchanged_links(self, url, response):
+        """
+        Returns the cached links of url if response shows that the page hasn't changed,
+        otherwise None
+        """
+        row = self._db.execute('SELECT content_hash, links FROM pages WHERE url = ?',
+                               (normalize_url(url),)).fetchone()
+        if row is None:
+            return None
+        cached_hash, links = row
+        if response.status == 304 or cached_hash == content_hash(response.body):
+            return links.split('\n') if links else []
+        return None
+
+    def get_body(self, url):
+        row = self._db.execute('SELECT body FROM pages WHERE url = ?',
+                               (normalize_url(url),)).fetchone()
+        return zlib.decompress(row[0]) if row else None
+
+    def urls(self):
+        for (url,) in self._db.execute('SELECT url FROM pages'):
+            yield url
+
+    def store(self, url, response, links):
+        self._db.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (normalize_url(url), response.headers.get('etag'),
+                          response.headers.get('last-modified'), content_hash(response.body),
+                          zlib.compress(response.body), '\n'.join(links), time.time()))
+
+    def forget(self, urls):
+        self._db.executemany('DELETE FROM pages WHERE url = ?', ((normalize_url(url),) for url in urls))
+
+    def close(self):
+        self._db.close()
+
+
+class CacheFetcher(Fetcher):
+    """
+    Serves pages from an HttpCache without touching the network
+    """
+    def __init__(self, cache_path):
+        self._cache = HttpCache(cache_path)
+
+    def fetch(self, url, headers=None):
+        body = self._cache.get_body(url)
+        if body is None:
+            raise FetchError(url, 'Not in cache')
+        return Response(url, 200, {}, body)
+
+    def close(self):
+        self._cache.close()
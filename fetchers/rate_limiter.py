@@ -0,0 +1,119 @@
+import asyncio
+import multiprocessing as mp
+import time
+import zlib
+from urllib.parse import urlsplit
+
+# Fields of a host slot in the shared state array
+_TOKENS = 0
+_LAST_REFILL = 1
+_BLOCKED_UNTIL = 2
+_INFLIGHT = 3
+_WINDOW = 4
+_LATENCY = 5
+_BASE_LATENCY = 6
+_NUM_FIELDS = 7
+
+# Statuses that mean the server is overloaded. None is a network error or timeout
+_OVERLOAD_STATUSES = (None, 429, 500, 502, 503, 504)
+
+
+class RateLimiter(object):
+    """
+    Per host politeness shared by all worker processes. Every host gets a token bucket
+    refilled at rate requests per second (no limit if rate is 0) and a concurrency
+    window. The window grows by about one request per round trip while responses are
+    fast and is halved on errors or when latency climbs well above the best seen so
+    far. Hosts are hashed into a fixed number of slots, so hosts that collide simply
+    share a budget. Create it before starting the workers
+    """
+    def __init__(self, rate=0, max_concurrency=16, slots=64, latency_factor=2.0):
+        self._rate = float(rate)
+        self._max_concurrency = max_concurrency
+        self._slots = slots
+        self._latency_factor = latency_factor
+        self._lock = mp.Lock()
+        self._state = mp.RawArray('d', slots * _NUM_FIELDS)
+        for slot in range(slots):
+            self._state[slot * _NUM_FIELDS + _TOKENS] = max(self._rate, 1)
+            self._state[slot * _NUM_FIELDS + _WINDOW] = max_concurrency
+
+    def _base(self, url):
+        host = (urlsplit(url).hostname or '').encode('utf-8')
+        return (zlib.crc32(host) % self._slots) * _NUM_FIELDS
+
+    def reserve(self, url):
+        """
+        Takes a token and a concurrency slot for a request to url if both are available
+        and returns 0. Otherwise returns how long to wait before trying again
+        """
+        base = self._base(url)
+        state = self._state
+        now = time.time()
+        with self._lock:
+            if state[base + _BLOCKED_UNTIL] > now:
+                return state[base + _BLOCKED_UNTIL] - now
+            if state[base + _INFLIGHT] >= int(state[base + _WINDOW]):
+                return 0.05
+
+            if self._rate > 0:
+                elapsed = now - state[base + _LAST_REFILL]
+                state[base + _TOKENS] = min(self._rate, state[base + _TOKENS] + elapsed * self._rate)
+                state[base + _LAST_REFILL] = now
+                if state[base + _TOKENS] < 1:
+                    return (1 - state[base + _TOKENS]) / self._rate
+                state[base + _TOKENS] -= 1
+
+            state[base + _INFLIGHT] += 1
+            return 0
+
+    def acquire(self, url):
+        while True:
+            delay = self.reserve(url)
+            if delay == 0:
+                return
+            time.sleep(delay)
+
+    async def acquire_async(self, url):
+        while True:
+            delay = self.reserve(url)
+            if delay == 0:
+                return
+            await asyncio.sleep(delay)
+
+    def release(self, url, latency, status):
+        """
+        Returns the slot taken by reserve and adapts the window to the outcome of the
+        request. status is the HTTP status, None for network errors
+        """
+        base = self._base(url)
+        state = self._state
+        with self._lock:
+            state[base + _INFLIGHT] = max(0, state[base + _INFLIGHT] - 1)
+            window = state[base + _WINDOW]
+
+            if status in _OVERLOAD_STATUSES:
+                state[base + _WINDOW] = max(1, window / 2)
+                return
+
+            ewma = state[base + _LATENCY]
+            ewma = latency if ewma == 0 else 0.8 * ewma + 0.2 * latency
+            state[base + _LATENCY] = ewma
+            if state[base + _BASE_LATENCY] == 0 or ewma < state[base + _BASE_LATENCY]:
+                state[base + _BASE_LATENCY] = ewma
+
+            if ewma > self._latency_factor * state[base + _BASE_LATENCY]:
+                state[base + _WINDOW] = max(1, window * 0.9)
+            else:
+                state[base + _WINDOW] = min(self._max_concurrency, window + 1 / window)
+
+    def block(self, url, seconds):
+        """
+        Holds back all requests to the host of url, e.g. for a Retry-After
+        """
+        base = self._base(url)
+        with self._lock:
+            self._state[base + _BLOCKED_UNTIL] = max(self._state[base + _BLOCKED_UNTIL], time.time() + seconds)
+
+    def window(self, url):
+        return self._state[self._base(url) + _WINDOW]
@@ -0,0 +1,81 @@
+from fetchers.fetcher import Fetcher, FetchError
+from fetchers.urllib_fetcher import UrllibFetcher
+from metrics import metrics
+import queue
+import threading
+import time
+
+
+class ThreadedFetcher(Fetcher):
+    """
+    Runs a blocking fetcher on max_inflight threads of the main process, so pages are
+    downloaded while the workers parse. Takes urls and hands back pages like
+    AsyncFetcher does
+    """
+    in_worker = False
+
+    def __init__(self, max_inflight=20, fetcher_class=UrllibFetcher, rate_limiter=None, max_retries=3,
+                 **fetcher_options):
+        super(ThreadedFetcher, self).__init__(rate_limiter, max_retries)
+        self._fetcher = fetcher_class(rate_limiter=rate_limiter, max_retries=max_retries, **fetcher_options)
+        self._num_threads = max_inflight
+        self._queue = queue.Queue()
+        self._threads = []
+        self._callback = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def _consume(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            url, headers = task
+            start = time.perf_counter()
+            try:
+                response, error = self._fetcher.fetch(url, headers), None
+            except FetchError as e:
+                response, error = None, e
+            metrics.add_time('fetch', time.perf_counter() - start)
+
+            try:
+                self._callback(url, response, error)
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+    def start(self, callback=None):
+        """
+        Starts the threads. Pages passed to submit are handed to
+        callback(url, response, error) from the thread that fetched them
+        """
+        if self._threads:
+            return
+        self._callback = callback
+        self._threads = [threading.Thread(target=self._consume, daemon=True) for _ in range(self._num_threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, url, headers=None):
+        with self._lock:
+            self._pending += 1
+        self._queue.put((url, headers))
+
+    @property
+    def pending(self):
+        """
+        Number of submitted urls not yet handed to the callback
+        """
+        with self._lock:
+            return self._pending
+
+    def fetch(self, url, headers=None):
+        return self._fetcher.fetch(url, headers)
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._fetcher.close()
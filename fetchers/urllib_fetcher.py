@@ -0,0 +1,49 @@
+from fetchers.fetcher import Fetcher, FetchError, Response
+import time
+import urllib.error
+import urllib.request
+
+
+class UrllibFetcher(Fetcher):
+    """
+    Blocking fetcher that opens a new connection for every page
+    """
+    def __init__(self, timeout=30, rate_limiter=None, max_retries=3):
+        super(UrllibFetcher, self).__init__(rate_limiter, max_retries)
+        self._timeout = timeout
+
+    def _fetch_once(self, url, headers):
+        request = urllib.request.Request(url, headers=headers or {})
+        try:
+            with urllib.request.urlopen(request, timeout=self._timeout) as response:
+                headers = {k.lower(): v for k, v in response.getheaders()}
+                return Response(response.geturl(), response.status, headers, response.read())
+        except urllib.error.HTTPError as e:
+            headers = {k.lower(): v for k, v in e.headers.items()}
+            if e.code == 304:
+                return Response(url, 304, headers, b'')
+            raise FetchError(url, e, e.code, headers)
+        except Exception as e:
+            raise FetchError(url, e)
+
+    def fetch(self, url, headers=None):
+        attempt = 0
+        while True:
+            if self._rate_limiter:
+                self._rate_limiter.acquire(url)
+            start = time.time()
+            status = None
+            try:
+                response = self._fetch_once(url, headers)
+                status = response.status
+                return response
+            except FetchError as e:
+                status = e.status
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            finally:
+                if self._rate_limiter:
+                    self._rate_limiter.release(url, time.time() - start, status)
+            time.sleep(delay)
+            attempt += 1
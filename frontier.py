@@ -0,0 +1,120 @@
+from collections import deque
+import hashlib
+import math
+import os
+import sqlite3
+import tempfile
+
+
+class ScratchStore(object):
+    """
+    Scratch sqlite file behind the visited set and the frontier. Removed on close
+    unless a path was given
+    """
+    def __init__(self, path=None):
+        self._temporary = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(suffix='.db', prefix='frontier-')
+            os.close(fd)
+        elif os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.db = sqlite3.connect(path)
+        # Nothing here has to survive a crash, the checkpoint does that
+        self.db.execute('PRAGMA journal_mode=OFF')
+        self.db.execute('PRAGMA synchronous=OFF')
+
+    def close(self):
+        self.db.close()
+        if self._temporary:
+            os.remove(self.path)
+
+
+class VisitedSet(object):
+    """
+    Set of urls kept exactly in sqlite with a Bloom filter in memory in front of it, so
+    checking a url never seen before doesn't have to read from disk. The
+    filter is sized for capacity urls at error_rate false positives. Past capacity it
+    only gets slower, never wrong
+    """
+    def __init__(self, store, table='visited', capacity=1000000, error_rate=0.001):
+        self._db = store.db
+        self._table = table
+        self._db.execute('CREATE TABLE IF NOT EXISTS %s (url TEXT PRIMARY KEY) WITHOUT ROWID' % table)
+        self._db.execute('DELETE FROM %s' % table)
+        self._num_bits = int(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self._num_hashes = max(1, int(round(self._num_bits / capacity * math.log(2))))
+        self._bits = bytearray((self._num_bits + 7) // 8)
+        self._len = 0
+
+    def _positions(self, url):
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self._num_bits for i in range(self._num_hashes)]
+
+    def add(self, url):
+        """
+        Adds url and returns whether it is new
+        """
+        positions = self._positions(url)
+        bits = self._bits
+        if all(bits[p >> 3] & (1 << (p & 7)) for p in positions):
+            if self._db.execute('SELECT 1 FROM %s WHERE url = ?' % self._table, (url,)).fetchone():
+                return False
+        for p in positions:
+            bits[p >> 3] |= 1 << (p & 7)
+        self._db.execute('INSERT INTO %s VALUES (?)' % self._table, (url,))
+        self._len += 1
+        return True
+
+    def __contains__(self, url):
+        bits = self._bits
+        if not all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(url)):
+            return False
+        return self._db.execute('SELECT 1 FROM %s WHERE url = ?' % self._table, (url,)).fetchone() is not None
+
+    def __iter__(self):
+        for (url,) in self._db.execute('SELECT url FROM %s' % self._table):
+            yield url
+
+    def __len__(self):
+        return self._len
+
+
+class Frontier(object):
+    """
+    FIFO queue of urls that holds up to max_in_memory of them in memory and spills the
+    rest to sqlite, reading them back in order as the memory part drains
+    """
+    def __init__(self, store, max_in_memory=100000):
+        self._db = store.db
+        self._db.execute('CREATE TABLE IF NOT EXISTS frontier (id INTEGER PRIMARY KEY, url TEXT)')
+        self._db.execute('DELETE FROM frontier')
+        self._max_in_memory = max_in_memory
+        self._memory = deque()
+        self._spilled = 0
+
+    def extend(self, urls):
+        for url in urls:
+            # Once anything is on disk new urls go behind it to keep the order
+            if self._spilled or len(self._memory) >= self._max_in_memory:
+                self._db.execute('INSERT INTO frontier (url) VALUES (?)', (url,))
+                self._spilled += 1
+            else:
+                self._memory.append(url)
+
+    def pop(self):
+        """
+        Returns the next url, None if the frontier is empty
+        """
+        if not self._memory and self._spilled:
+            rows = self._db.execute('SELECT id, url FROM frontier ORDER BY id LIMIT ?',
+                                    (max(1, self._max_in_memory // 2),)).fetchall()
+            self._db.execute('DELETE FROM frontier WHERE id <= ?', (rows[-1][0],))
+            self._memory.extend(url for _, url in rows)
+            self._spilled -= len(rows)
+        return self._memory.popleft() if self._memory else None
+
+    def __len__(self):
+        return len(self._memory) + self._spilled
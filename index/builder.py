@@ -0,0 +1,153 @@
+from index.terms import TermTableWriter, tokenize, type_terms, api_level_term
+from array import array
+import json
+import os
+import shutil
+
+# Fielded indexes next to the full text one. Terms of text are words, the others
+# are whole values
+FIELDS = ('text', 'name', 'kind', 'class', 'returns', 'type', 'param', 'api_level')
+
+_MEMBERS = (('nested_class', 'nested_classes'), ('constant', 'constants'), ('field', 'fields'),
+            ('constructor', 'constructors'), ('public_method', 'public_methods'),
+            ('protected_method', 'protected_methods'))
+
+
+def _value(doc, key):
+    return doc.get(key) if isinstance(doc, dict) else getattr(doc, key)
+
+
+def document_entries(doc, url):
+    """
+    Flattens a Documentation, or the dict BasicSerializer saved it as, into one entry
+    for the class and one for each of its members
+    """
+    class_name = _value(doc, 'name')
+    yield {'kind': _value(doc, 'object_type') or 'class', 'class': class_name, 'name': class_name, 'url': url,
+           'api_level': _value(doc, 'api_level'), 'parent_class': _value(doc, 'parent_class'),
+           'interfaces': list(_value(doc, 'interfaces') or []),
+           'description': '\n'.join(_value(doc, 'summary') or [])}
+
+    for kind, key in _MEMBERS:
+        for member in _value(doc, key) or []:
+            entry = {'kind': kind, 'class': class_name, 'name': member.get('name'), 'url': url,
+                     'api_level': member.get('api_level'), 'description': member.get('description')}
+            if kind in ('nested_class', 'constant', 'field'):
+                entry['type'] = member.get('type')
+            if kind == 'constant':
+                entry['value'] = member.get('value')
+            if kind in ('constructor', 'public_method', 'protected_method'):
+                params = member.get('params') or {}
+                entry['params'] = [[name, param.get('type')] for name, param in params.items()]
+            if kind in ('public_method', 'protected_method'):
+                returns = member.get('returns') or {}
+                entry['returns'] = returns.get('type')
+            yield entry
+
+
+def _entry_terms(entry):
+    """
+    Yields the (field, term) pairs entry is indexed under
+    """
+    kind = entry['kind']
+    yield 'kind', kind
+    if kind.endswith('_method'):
+        yield 'kind', 'method'
+    if kind in ('class', 'interface', 'enum', 'annotation'):
+        yield 'kind', 'type'
+    if entry.get('class'):
+        yield 'class', entry['class'].lower()
+    if entry.get('name'):
+        yield 'name', entry['name'].lower()
+    if entry.get('api_level'):
+        yield 'api_level', api_level_term(entry['api_level'])
+    for term in type_terms(entry.get('returns')):
+        yield 'returns', term
+    for term in type_terms(entry.get('type')):
+        yield 'type', term
+    for _, param_type in entry.get('params') or []:
+        for term in type_terms(param_type):
+            yield 'param', term
+    for text in (entry.get('class'), entry.get('name'), entry.get('description')):
+        for term in tokenize(text):
+            yield 'text', term
+
+
+class IndexBuilder(object):
+    """
+    Builds the search index of a crawl in path. Entries are kept as JSON lines with an
+    array of their offsets, and every field gets a term table of entry ids. Everything
+    is written on close
+    """
+    def __init__(self, path):
+        self._path = path
+        self._tables = {field: TermTableWriter() for field in FIELDS}
+        self._entries = []
+        self._offsets = array('Q', [0])
+
+    def add_entry(self, entry):
+        entry_id = len(self._offsets) - 1
+        for field, term in _entry_terms(entry):
+            self._tables[field].add(term, entry_id)
+        data = (json.dumps(entry) + '\n').encode('utf-8')
+        self._entries.append(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+    def add(self, doc, url):
+        for entry in document_entries(doc, url):
+            self.add_entry(entry)
+
+    def close(self):
+        # Written next to the old index and swapped in, so readers never see half of one
+        tmp_path = self._path.rstrip(os.sep) + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        with open(os.path.join(tmp_path, 'entries.bin'), 'wb') as fp:
+            fp.writelines(self._entries)
+        with open(os.path.join(tmp_path, 'entries.idx'), 'wb') as fp:
+            fp.write(self._offsets.tobytes())
+        for field, table in self._tables.items():
+            table.write(tmp_path, field)
+        shutil.rmtree(self._path, ignore_errors=True)
+        os.rename(tmp_path, self._path)
+
+
+class EntryLog(object):
+    """
+    Appends the entries of the documents a worker extracts to a JSON lines file, to be
+    indexed together with those of the other workers at the end of the crawl
+    """
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, 'w')
+
+    def add(self, doc, url):
+        self._file.writelines(json.dumps(entry) + '\n' for entry in document_entries(doc, url))
+
+    def close(self):
+        self._file.close()
+
+
+def merge_logs(path, log_paths, previous=None, removed=()):
+    """
+    Builds the index in path from the entry logs of the workers. Entries of urls not
+    in the logs are carried over from the previous index, so pages skipped as unchanged
+    stay searchable, unless their url is in removed
+    """
+    builder = IndexBuilder(path)
+    urls = set(removed)
+    for log_path in log_paths:
+        with open(log_path) as fp:
+            for line in fp:
+                # Skip a line cut short by a crash
+                if not line.endswith('\n'):
+                    continue
+                entry = json.loads(line)
+                urls.add(entry['url'])
+                builder.add_entry(entry)
+    if previous is not None:
+        for entry in previous:
+            if entry['url'] not in urls:
+                builder.add_entry(entry)
+    builder.close()
@@ -0,0 +1,82 @@
+from index.builder import FIELDS
+from index.terms import TermTable, tokenize, type_terms, api_level_term, map_file
+import json
+import os
+
+
+class SearchIndex(object):
+    """
+    Queries an index written by IndexBuilder. All files are memory mapped, so opening
+    an index reads nothing and a lookup only touches the pages it needs
+    """
+    def __init__(self, path):
+        self._path = path
+        self._entries = map_file(os.path.join(path, 'entries.bin'))
+        self._offsets_file = map_file(os.path.join(path, 'entries.idx'))
+        self._offsets = memoryview(self._offsets_file).cast('Q')
+        self._tables = {}
+
+    def _table(self, field):
+        table = self._tables.get(field)
+        if table is None:
+            table = self._tables[field] = TermTable(self._path, field)
+        return table
+
+    def entry(self, entry_id):
+        start, end = self._offsets[entry_id], self._offsets[entry_id + 1]
+        return json.loads(self._entries[start:end])
+
+    def _lookup(self, field, value):
+        table = self._table(field)
+        if field == 'api_level':
+            if isinstance(value, (tuple, list)):
+                low, high = value
+                return table.range(None if low is None else api_level_term(low),
+                                   None if high is None else api_level_term(high))
+            return table.get(api_level_term(value))
+        value = value.lower()
+        if value.endswith('*'):
+            return table.prefix(value[:-1])
+        if field in ('returns', 'type', 'param'):
+            value = (type_terms(value) or [''])[0]
+        return table.get(value)
+
+    def search(self, text=None, limit=None, **fields):
+        """
+        Returns the entries matching every given condition, in index order. text
+        matches words anywhere in names and descriptions. Fields match whole values,
+        case insensitively: name, kind (class, method, constant, ...), class, returns,
+        type, param and api_level. A value ending in * matches by prefix and api_level
+        also takes a (low, high) range where either end can be None
+        """
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError('Unknown fields %s' % ', '.join(sorted(unknown)))
+        postings = [self._table('text').get(term) for term in tokenize(text)] if text else []
+        postings.extend(self._lookup(field, value) for field, value in fields.items() if value is not None)
+        if not postings:
+            return []
+
+        postings.sort(key=len)
+        ids = postings[0]
+        for other in postings[1:]:
+            if not ids:
+                break
+            other = set(other)
+            ids = [entry_id for entry_id in ids if entry_id in other]
+        return [self.entry(entry_id) for entry_id in ids[:limit]]
+
+    def __iter__(self):
+        for entry_id in range(len(self)):
+            yield self.entry(entry_id)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def close(self):
+        for table in self._tables.values():
+            table.close()
+        self._offsets.release()
+        for data in (self._entries, self._offsets_file):
+            if not isinstance(data, bytes):
+                data.close()
@@ -0,0 +1,186 @@
+from array import array
+from bisect import bisect_left
+import mmap
+import os
+import re
+import struct
+import sys
+
+_WORD = re.compile(r'[A-Za-z0-9_]+')
+_CAMEL_PART = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+')
+_TYPE_NAME = re.compile(r'([A-Za-z_][A-Za-z0-9_]*)(?:\s*<.*>)?\s*(?:\[\s*\]\s*|\.\.\.\s*)*$')
+
+# Every term is a fixed size directory record: offset and length of the term in the
+# lexicon, offset and count of its postings
+_RECORD = struct.Struct('<QIQI')
+
+
+def tokenize(text):
+    """
+    Lower cased words of text. Camel case identifiers are also split into their parts,
+    so getContentResolver matches both itself and content
+    """
+    tokens = []
+    for word in _WORD.findall(text or ''):
+        tokens.append(word.lower())
+        parts = _CAMEL_PART.findall(word)
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+def type_terms(type_name):
+    """
+    Terms a type is indexed under: the type as written and the simple name of its
+    class, so Cursor also matches android.database.Cursor and Cursor[]
+    """
+    type_name = ' '.join((type_name or '').split())
+    if not type_name:
+        return []
+    terms = [type_name.lower()]
+    m = _TYPE_NAME.search(type_name)
+    if m and m.group(1).lower() != terms[0]:
+        terms.append(m.group(1).lower())
+    return terms
+
+
+def api_level_term(api_level):
+    """
+    Api levels are zero padded so their terms sort numerically and ranges of them can
+    be read off the sorted lexicon. Codenames sort after all numbers
+    """
+    api_level = str(api_level or '').strip()
+    return '%04d' % int(api_level) if api_level.isdigit() else api_level.lower()
+
+
+class TermTableWriter(object):
+    """
+    Collects the postings of the terms of one field and writes them as a sorted
+    lexicon, a directory of fixed size records and a flat array of entry ids
+    """
+    def __init__(self):
+        self._postings = {}
+
+    def add(self, term, entry_id):
+        postings = self._postings.get(term)
+        if postings is None:
+            self._postings[term] = array('I', [entry_id])
+        elif postings[-1] != entry_id:
+            postings.append(entry_id)
+
+    def write(self, path, field):
+        lexicon = bytearray()
+        directory = bytearray()
+        count = 0
+        with open(os.path.join(path, field + '.post'), 'wb') as fp:
+            for term, postings in sorted((term.encode('utf-8'), postings)
+                                         for term, postings in self._postings.items()):
+                directory += _RECORD.pack(len(lexicon), len(term), count, len(postings))
+                lexicon += term
+                if sys.byteorder != 'little':
+                    postings.byteswap()
+                fp.write(postings.tobytes())
+                count += len(postings)
+        with open(os.path.join(path, field + '.lex'), 'wb') as fp:
+            fp.write(lexicon)
+        with open(os.path.join(path, field + '.dir'), 'wb') as fp:
+            fp.write(directory)
+
+
+def map_file(path):
+    with open(path, 'rb') as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class _Terms(object):
+    """
+    Sorted sequence view over the terms of a directory, for bisect
+    """
+    def __init__(self, table):
+        self._table = table
+
+    def __getitem__(self, i):
+        return self._table.term(i)
+
+    def __len__(self):
+        return len(self._table)
+
+
+class TermTable(object):
+    """
+    Memory mapped term table written by TermTableWriter. Nothing is read up front,
+    lookups binary search the directory
+    """
+    def __init__(self, path, field):
+        self._lexicon = map_file(os.path.join(path, field + '.lex'))
+        self._directory = map_file(os.path.join(path, field + '.dir'))
+        self._postings = map_file(os.path.join(path, field + '.post'))
+        self._ids = memoryview(self._postings).cast('I') if len(self._postings) else ()
+        self._len = len(self._directory) // _RECORD.size
+
+    def _record(self, i):
+        return _RECORD.unpack_from(self._directory, i * _RECORD.size)
+
+    def term(self, i):
+        offset, length, _, _ = self._record(i)
+        return bytes(self._lexicon[offset:offset + length])
+
+    def _postings_of(self, i):
+        _, _, start, count = self._record(i)
+        ids = self._ids[start:start + count]
+        if sys.byteorder != 'little':
+            ids = array('I', ids)
+            ids.byteswap()
+        return ids
+
+    def get(self, term):
+        """
+        Ids of the entries with term, in increasing order
+        """
+        term = term.encode('utf-8')
+        i = bisect_left(_Terms(self), term)
+        if i < self._len and self.term(i) == term:
+            return list(self._postings_of(i))
+        return []
+
+    def range(self, low=None, high=None):
+        """
+        Ids of the entries with any term from low to high, both included
+        """
+        terms = _Terms(self)
+        start = bisect_left(terms, low.encode('utf-8')) if low is not None else 0
+        ids = set()
+        for i in range(start, self._len):
+            if high is not None and self.term(i) > high.encode('utf-8'):
+                break
+            ids.update(self._postings_of(i))
+        return sorted(ids)
+
+    def prefix(self, prefix):
+        """
+        Ids of the entries with any term starting with prefix
+        """
+        prefix = prefix.encode('utf-8')
+        terms = _Terms(self)
+        ids = set()
+        for i in range(bisect_left(terms, prefix), self._len):
+            if not self.term(i).startswith(prefix):
+                break
+            ids.update(self._postings_of(i))
+        return sorted(ids)
+
+    def close(self):
+        if isinstance(self._ids, memoryview):
+            self._ids.release()
+        for data in (self._lexicon, self._directory, self._postings):
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def terms(self):
+        for i in range(self._len):
+            yield self.term(i).decode('utf-8')
+
+    def __len__(self):
+        return self._len
@@ -0,0 +1,191 @@
+from contextlib import contextmanager
+import functools
+import http.server
+import json
+import math
+import threading
+import time
+
+
+# Latency histograms use log spaced buckets, each about 10% wider than the previous
+_BUCKET_BASE = 1.1
+_BUCKET_MIN = 1e-4
+
+
+def _bucket(seconds):
+    return max(0, int(math.ceil(math.log(max(seconds, _BUCKET_MIN) / _BUCKET_MIN, _BUCKET_BASE))))
+
+
+def _percentile(histogram, fraction):
+    total = sum(histogram.values())
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= fraction * total:
+            return _BUCKET_MIN * _BUCKET_BASE ** bucket
+    return 0
+
+
+class Metrics(object):
+    """
+    Stage timings and counters of a process. Workers ship what they collected to the
+    main process, which merges everything into one view for progress lines, the
+    end of run report and the Prometheus endpoint
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._timings = {}
+            self._counters = {}
+            self._histograms = {}
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            timing = self._timings.get(stage)
+            if timing is None:
+                self._timings[stage] = [1, seconds, seconds]
+            else:
+                timing[0] += 1
+                timing[1] += seconds
+                timing[2] = max(timing[2], seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        """
+        Adds a sample to the latency histogram name
+        """
+        with self._lock:
+            histogram = self._histograms.setdefault(name, {})
+            bucket = _bucket(seconds)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    def incr(self, counter, value=1):
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def collect(self):
+        """
+        Returns everything recorded since the last call and starts afresh
+        """
+        with self._lock:
+            collected = (self._timings, self._counters, self._histograms)
+            self._timings = {}
+            self._counters = {}
+            self._histograms = {}
+        return collected
+
+    def merge(self, collected):
+        timings, counters, histograms = collected
+        with self._lock:
+            for name, buckets in histograms.items():
+                histogram = self._histograms.setdefault(name, {})
+                for bucket, count in buckets.items():
+                    histogram[bucket] = histogram.get(bucket, 0) + count
+            for stage, (count, total, longest) in timings.items():
+                timing = self._timings.get(stage)
+                if timing is None:
+                    self._timings[stage] = [count, total, longest]
+                else:
+                    timing[0] += count
+                    timing[1] += total
+                    timing[2] = max(timing[2], longest)
+            for counter, value in counters.items():
+                self._counters[counter] = self._counters.get(counter, 0) + value
+
+    def counter(self, counter):
+        with self._lock:
+            return self._counters.get(counter, 0)
+
+    def report(self, elapsed):
+        with self._lock:
+            pages = self._counters.get('pages', 0)
+            return {
+                'elapsed': elapsed,
+                'pages': pages,
+                'pages_per_sec': pages / elapsed if elapsed > 0 else 0,
+                'bytes': self._counters.get('bytes', 0),
+                'counters': dict(self._counters),
+                'stages': {stage: {'count': count, 'total': total, 'mean': total / count, 'max': longest}
+                           for stage, (count, total, longest) in sorted(self._timings.items())},
+                'latency': {name: {'count': sum(histogram.values()), 'p50': _percentile(histogram, 0.5),
+                                   'p90': _percentile(histogram, 0.9), 'p99': _percentile(histogram, 0.99)}
+                            for name, histogram in sorted(self._histograms.items())}
+            }
+
+    def progress_line(self, elapsed, queued):
+        pages = self.counter('pages')
+        return '[%.0fs] %d pages (%.1f/s), %.1f MB, %d saved, %d failed, %d queued' % (
+            elapsed, pages, pages / elapsed if elapsed > 0 else 0, self.counter('bytes') / 1e6,
+            self.counter('saved'), self.counter('failed'), queued)
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            lines.append('# TYPE scraper_stage_seconds_total counter')
+            for stage, (count, total, longest) in sorted(self._timings.items()):
+                lines.append('scraper_stage_seconds_total{stage="%s"} %f' % (stage, total))
+            lines.append('# TYPE scraper_stage_calls_total counter')
+            for stage, (count, total, longest) in sorted(self._timings.items()):
+                lines.append('scraper_stage_calls_total{stage="%s"} %d' % (stage, count))
+            for counter, value in sorted(self._counters.items()):
+                lines.append('# TYPE scraper_%s_total counter' % counter)
+                lines.append('scraper_%s_total %d' % (counter, value))
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port):
+        """
+        Serves the metrics in the Prometheus text format on /metrics from a
+        background thread
+        """
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                body = metrics.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = http.server.ThreadingHTTPServer(('', port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def save_report(self, path, elapsed):
+        with open(path, 'w') as fp:
+            json.dump(self.report(elapsed), fp, indent=2)
+
+
+# Metrics of the current process
+metrics = Metrics()
+
+
+def timed(stage):
+    """
+    Decorator that records the run time of a function under stage
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                metrics.add_time(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
@@ -1,114 +1,176 @@
 from parsers.documentation_parser import DocumentationParser
+from parsers.text import TextCleaner
+from metrics import timed
 import re
 
+_API_LEVEL = re.compile(r'apilevel-(.*)')
+_TYPE = re.compile(r'(\S+?)\s')
+_CONSTANT_VALUE = re.compile(r'.*[cC]onstant.*')
+_OBJECT_TYPE = re.compile(r'(?:public|private|protected)\s(?:static\s)?(?:abstract\s)?(interface|class)\s\S+')
+_SECTIONS = frozenset(['Constants', 'Fields', 'Public constructors', 'Protected constructors',
+                       'Public methods', 'Protected methods'])
 
-def _ws_mapping_fn(match):
-        if ' ' in match.group(0):
-            return ' '
-        else:
-            return ''
+# Plain walks over the tree that match what the equivalent find calls return. bs4 builds
+# a strainer for every find, which costs more than the walk itself on small subtrees
 
-def _get_text_cleaned(block):
-    return re.sub('\n+|\s+', _ws_mapping_fn, block.get_text().strip())
+def _first(tag, name):
+    for node in tag.descendants:
+        if node.name == name:
+            return node
+    return None
+
+def _all(tag, name):
+    return [node for node in tag.descendants if node.name == name]
+
+def _next(node, name):
+    node = node.next_element
+    while node is not None and node.name != name:
+        node = node.next_element
+    return node
+
+def _next_with_string(node, name, pattern):
+    node = _next(node, name)
+    while node is not None and (node.string is None or not pattern.search(node.string)):
+        node = _next(node, name)
+    return node
+
+def _next_sibling(node, name):
+    node = node.next_sibling
+    while node is not None and node.name != name:
+        node = node.next_sibling
+    return node
+
+def _has_class(tag, cls):
+    return cls in tag.get('class', ())
 
 class AndroidDocParser(DocumentationParser):
     """
     Parser for android documentation on https://developer.android.com
     """
+    tree_backend = 'lxml'
+    required_element = ('div', 'api')
+
+    # Handler and extra arguments for the top level blocks of each section by tag name.
+    # Tables of nested classes can show up in any section
+    section_handlers = {
+        'Class Summary': {'h1': ('process_class_summary',), 'p': ('process_class_summary',),
+                          'ul': ('process_class_summary',)},
+        'Constants': {'div': ('process_constants',)},
+        'Fields': {'div': ('process_fields',)},
+        'Public constructors': {'div': ('process_methods', 'Public constructors')},
+        'Protected constructors': {},
+        'Public methods': {'div': ('process_methods', 'Public methods')},
+        'Protected methods': {'div': ('process_methods', 'Protected methods')},
+    }
+
+    @classmethod
+    def _dispatch_table(cls):
+        # Resolved once per parser class
+        if '_dispatch' not in cls.__dict__:
+            cls._dispatch = {}
+            for section, handlers in cls.section_handlers.items():
+                table = {'table': (cls.process_nested_classes, ())}
+                for tag, (handler, *args) in handlers.items():
+                    table[tag] = (getattr(cls, handler), tuple(args))
+                cls._dispatch[section] = table
+        return cls._dispatch
+
     def _get_name_level(self, block):
-        m = re.search(r'apilevel-(.*)', block['class'][-1])
+        m = _API_LEVEL.search(block['class'][-1])
         api_level = m.group(1) if m else '1'
-        
-        if block.h3:
-            name = _get_text_cleaned(block.h3) 
-        elif block.h1:
-            name = _get_text_cleaned(block.h1)
-        else:
-            name = None 
+
+        title = _first(block, 'h3') or _first(block, 'h1')
+        name = self._cleaner.clean(title) if title else None
 
         return name, api_level
 
 
+    @timed('parse.nested_classes')
     def process_nested_classes(self, block, doc):
-        if block.name == 'table' and block.has_attr('id') and 'nestedclasses' in block['id']:
+        if block.has_attr('id') and 'nestedclasses' in block['id']:
 
-            for table_row in block.find_all('tr'):
-                cells = table_row.find_all('td')
+            for table_row in _all(block, 'tr'):
+                cells = _all(table_row, 'td')
                 if len(cells) > 0:
-                    class_interface = _get_text_cleaned(cells[0].code)
-                    name = _get_text_cleaned(cells[1].code)
-                    type_dec = _get_text_cleaned(cells[1].p)
+                    class_interface = self._cleaner.clean(_first(cells[0], 'code'))
+                    name = self._cleaner.clean(_first(cells[1], 'code'))
+                    type_dec = self._cleaner.clean(_first(cells[1], 'p'))
                     doc.add_nested_class(name, class_interface, type_dec)
 
 
+    @timed('parse.class_summary')
     def process_class_summary(self, block, doc):
-        if block.name == 'h1' and block.has_attr('class') and 'api-title' in block['class']:
-            doc.set_name(_get_text_cleaned(block))
-            
-            p = block.find_next_sibling('p')
-            if p and p.code and p.code.has_attr('class') and 'api-signature' in p.code['class']:
-                signature = _get_text_cleaned(p.code)
-                m = re.search(r'(?:public|private|protected)\s(?:static\s)?(?:abstract\s)?(interface|class)\s\S+', signature)
+        if block.name == 'h1' and _has_class(block, 'api-title'):
+            doc.set_name(self._cleaner.clean(block))
+
+            p = _next_sibling(block, 'p')
+            code = _first(p, 'code') if p else None
+            if code and _has_class(code, 'api-signature'):
+                signature = self._cleaner.clean(code)
+                m = _OBJECT_TYPE.search(signature)
                 if m:
                     doc.set_object_type(m.group(1))
             if p:
-                for code in p.find_all('code', class_='api-signature'):
+                for code in _all(p, 'code'):
+                    if not _has_class(code, 'api-signature'):
+                        continue
                     if 'extends' in code.text:
-                        item = code.find('a')
+                        item = _first(code, 'a')
                         if item:
-                            doc.set_parent_class(_get_text_cleaned(item))
+                            doc.set_parent_class(self._cleaner.clean(item))
                     elif 'implements' in code.text:
-                        items = code.find_all('a')
+                        items = _all(code, 'a')
                         if items:
-                            doc.set_interfaces([_get_text_cleaned(item) for item in items])
-        
+                            doc.set_interfaces([self._cleaner.clean(item) for item in items])
+
         if block.name == 'p':
             # Remove class signature
-            if block.find('code', {'class': 'api-signature'}):
+            if any(_has_class(code, 'api-signature') for code in _all(block, 'code')):
                 return
-            doc.append_summary(_get_text_cleaned(block))
+            doc.append_summary(self._cleaner.clean(block))
         elif block.name == 'ul':
-            doc.append_summary(_get_text_cleaned(block))
+            doc.append_summary(self._cleaner.clean(block))
 
 
+    @timed('parse.constants')
     def process_constants(self, block, doc):
-        if block.name == 'div' and 'api' in block['class']:
+        if _has_class(block, 'api'):
             const_name, api_level = self._get_name_level(block)
-            
-            sig_block = block.find('pre')
-            m = re.search(r'(\S+?)\s', sig_block.get_text())
-            const_type = m.group(0)
-            
-            desc_block = sig_block.find_next('p')
-            const_description = _get_text_cleaned(desc_block)
-            value_block = desc_block.find_next('p', text = re.compile(r'.*[cC]onstant.*'))
-            const_value = _get_text_cleaned(value_block)
+
+            sig_block = _first(block, 'pre')
+            const_type = _TYPE.search(sig_block.get_text()).group(0)
+
+            desc_block = _next(sig_block, 'p')
+            const_description = self._cleaner.clean(desc_block)
+            value_block = _next_with_string(desc_block, 'p', _CONSTANT_VALUE)
+            const_value = self._cleaner.clean(value_block)
 
             doc.add_constant(const_name, const_type, const_value, const_description, api_level)
 
 
 
+    @timed('parse.fields')
     def process_fields(self, block, doc):
-        if block.name == 'div' and 'api' in block['class']:
+        if _has_class(block, 'api'):
             field_name, api_level = self._get_name_level(block)
 
-            sig_block = block.find('pre')
-            m = re.search(r'(\S+?)\s', sig_block.get_text())
-            field_type = m.group(0)
-            
-            desc_block = sig_block.find_next('p')
-            field_description = _get_text_cleaned(desc_block)
+            sig_block = _first(block, 'pre')
+            field_type = _TYPE.search(sig_block.get_text()).group(0)
+
+            desc_block = _next(sig_block, 'p')
+            field_description = self._cleaner.clean(desc_block)
 
             doc.add_field(field_name, field_type, field_description, api_level)
 
 
+    @timed('parse.methods')
     def process_methods(self, block, doc, section):
-        if block.name == 'div' and 'api' in block['class']:
+        if _has_class(block, 'api'):
             method_name, api_level = self._get_name_level(block)
-            
+
             #Method description
-            desc_block = block.find('p')
-            method_description = _get_text_cleaned(desc_block)
+            desc_block = _first(block, 'p')
+            method_description = self._cleaner.clean(desc_block)
 
             if section == 'Public methods':
                 params, returns = doc.add_public_method(method_name, method_description, api_level)
@@ -118,64 +180,72 @@ class AndroidDocParser(DocumentationParser):
                 params, returns = doc.add_constructor(method_name, method_description, api_level)
             else:
                 return
-            
+
             #Method parameters
-            param_return_block = desc_block.find_next_sibling('table')
-            
+            param_return_block = _next_sibling(desc_block, 'table')
+
             if param_return_block:
-                header_row = param_return_block.find('tr')
-                if header_row.th and 'Parameters' in header_row.th.get_text():
-                    for table_row in header_row.find_next_siblings('tr'):
-                        #print(table_row)
-                        cells = table_row.find_all('td')
+                header_row = _first(param_return_block, 'tr')
+                header = _first(header_row, 'th')
+                if header and 'Parameters' in header.get_text():
+                    table_row = _next_sibling(header_row, 'tr')
+                    while table_row is not None:
+                        cells = _all(table_row, 'td')
                         if len(cells) > 0:
-                            param_name = _get_text_cleaned(cells[0].code)
-                            param_type = _get_text_cleaned(cells[1].code)
-                            param_desc = _get_text_cleaned(cells[1])
+                            param_name = self._cleaner.clean(_first(cells[0], 'code'))
+                            param_type = self._cleaner.clean(_first(cells[1], 'code'))
+                            param_desc = self._cleaner.clean(cells[1])
                             params.add(param_name, param_type, param_desc)
+                        table_row = _next_sibling(table_row, 'tr')
+
+                    param_return_block = _next(param_return_block, 'table')
 
-                    param_return_block = param_return_block.find_next('table')
-            
             # Method return type
             method_return_type = 'void' #default
             method_return_desc = None
             if param_return_block:
-                header_row = param_return_block.find('tr')
-                if header_row.th and 'Returns' in header_row.th.get_text():
-                    cells = param_return_block.find_all('td')
-                    method_return_type = _get_text_cleaned(cells[0].code)
-                    method_return_desc = _get_text_cleaned(cells[1])
+                header_row = _first(param_return_block, 'tr')
+                header = _first(header_row, 'th')
+                if header and 'Returns' in header.get_text():
+                    cells = _all(param_return_block, 'td')
+                    method_return_type = self._cleaner.clean(_first(cells[0], 'code'))
+                    method_return_desc = self._cleaner.clean(cells[1])
                     returns.set_returns(method_return_type, method_return_desc)
-            
-    
+
+
     def update_section(self, block, cur_section):
-        new_section = cur_section
-        if block.name == 'a' and block.h2: #Edge case
-            block = block.h2
-            
-        if block.name == 'h2' and block.has_attr('class') and 'api-section' in block['class']:
-            if block.text in ['Constants', 'Fields', 'Public constructors', 'Protected constructors',
-                              'Public methods', 'Protected methods']:
-                new_section = block.text
-        return new_section
-    
+        if block.name == 'a': #Edge case
+            block = _first(block, 'h2')
+            if block is None:
+                return cur_section
+
+        if block.name == 'h2' and _has_class(block, 'api-section'):
+            text = block.text
+            if text in _SECTIONS:
+                return text
+        return cur_section
+
     def process_tree(self, tree, doc):
+        dispatch = self._dispatch_table()
         section = 'Class Summary'
-        for block in tree:
-            section = self.update_section(block, section)
-            if section == 'Class Summary':
-                self.process_class_summary(block, doc)
-            elif section == 'Constants':
-                self.process_constants(block, doc)
-            elif section == 'Fields':
-                self.process_fields(block, doc)
-            elif section in ['Public methods', 'Protected methods', 'Public constructors']:
-                self.process_methods(block, doc, section)
-        
-            # Only found in table
-            self.process_nested_classes(block, doc)
+        handlers = dispatch[section]
+        for block in tree.children:
+            name = block.name
+            if name is None:
+                continue
+            if name == 'h2' or name == 'a':
+                new_section = self.update_section(block, section)
+                if new_section != section:
+                    section = new_section
+                    handlers = dispatch[section]
+
+            handler = handlers.get(name)
+            if handler:
+                fn, args = handler
+                fn(self, block, doc, *args)
 
     def parse(self, soup, doc):
+        self._cleaner = TextCleaner()
         tree = soup.find('div', class_="api")
         if not tree:
             return False
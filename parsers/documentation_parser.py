@@ -1,14 +1,39 @@
 from documentation import Documentation
+from parsers.link_scanner import scan_page
+from bs4 import BeautifulSoup
 import re
 
 class DocumentationParser(object):
     """
     Base class for documentation parsers
     """
+    # Tree the parser works on. 'html5lib', 'lxml' and 'html.parser' build a BeautifulSoup
+    # tree with that parser, 'lxml-etree' builds a raw lxml.html tree
+    tree_backend = 'html5lib'
+
+    # (tag, class) of an element every page the parser can extract has. Pages without it
+    # are only scanned for links and never get a full tree
+    required_element = None
+
     def __init__(self, soup):
         self._soup = soup
         self._documentation = Documentation()
 
+    @classmethod
+    def build_tree(cls, html):
+        if cls.tree_backend == 'lxml-etree':
+            import lxml.html
+            return lxml.html.document_fromstring(html)
+        return BeautifulSoup(html, cls.tree_backend)
+
+    @classmethod
+    def scan(cls, html):
+        """
+        Returns the hrefs of all links on the page, whether it needs a full tree and a
+        fingerprint of the content the parser extracts from
+        """
+        return scan_page(html, cls.required_element)
+
     def extract(self):
         return self.parse(self._soup, self._documentation)
 
@@ -18,6 +43,3 @@ class DocumentationParser(object):
     @property
     def documentation(self):
         return self._documentation
-
-
-
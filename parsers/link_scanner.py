@@ -0,0 +1,71 @@
+from lxml import etree
+import hashlib
+
+
+class _ScanTarget(object):
+    """
+    lxml parser target that collects hrefs from the tokenizer events without
+    building a tree. The first required element is hashed on the way, with
+    whitespace collapsed and attributes sorted, to fingerprint the content of
+    the page regardless of its url and the chrome around it
+    """
+    def __init__(self, required_element):
+        self.links = []
+        self.found = required_element is None
+        self._tag, self._class = required_element or (None, None)
+        self._hash = None
+        self._depth = 0
+        self._text = []
+
+    def _flush_text(self):
+        text = ' '.join(''.join(self._text).split())
+        if text:
+            self._hash.update(text.encode('utf-8'))
+        self._text = []
+
+    def start(self, tag, attrib):
+        if tag == 'a':
+            href = attrib.get('href')
+            if href is not None:
+                self.links.append(href)
+        if self._depth:
+            self._flush_text()
+            self._hash.update(('<%s %s>' % (tag, sorted(attrib.items()))).encode('utf-8'))
+            self._depth += 1
+        elif not self.found and tag == self._tag and self._class in attrib.get('class', '').split():
+            self.found = True
+            self._hash = hashlib.sha1()
+            self._depth = 1
+
+    def end(self, tag):
+        if self._depth:
+            self._flush_text()
+            self._hash.update(('</%s>' % tag).encode('utf-8'))
+            self._depth -= 1
+
+    def data(self, data):
+        if self._depth:
+            self._text.append(data)
+
+    @property
+    def fingerprint(self):
+        return self._hash.hexdigest() if self._hash else None
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        return self
+
+
+def scan_page(html, required_element=None):
+    """
+    Returns the hrefs of all links in html, whether it contains required_element, a
+    (tag, class) pair, and the fingerprint of that element (None if there is none)
+    """
+    target = _ScanTarget(required_element)
+    if html:
+        parser = etree.HTMLParser(target=target)
+        parser.feed(html)
+        parser.close()
+    return target.links, target.found, target.fingerprint
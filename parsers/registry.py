@@ -0,0 +1,108 @@
+from importlib import import_module
+from importlib.metadata import entry_points
+import re
+
+# Plugins register parsers under this entry point group. An entry point names the
+# parser and loads a dict with 'parser', the 'module:Class' path of a
+# DocumentationParser subclass, and 'patterns', regexes of the urls it parses. Keep
+# it in a module that doesn't import the parser, so listing parsers stays cheap
+ENTRY_POINT_GROUP = 'documentation_scraper.parsers'
+
+BUILTIN_PARSERS = {
+    'android-ref': {'parser': 'parsers.android_ref_parser:AndroidDocParser',
+                    'patterns': [r'[a-z]+://[^/]+/reference/']},
+}
+
+
+def load_object(path):
+    module, _, name = path.partition(':')
+    return getattr(import_module(module), name)
+
+
+def available_parsers():
+    """
+    Returns {name: declaration} of the built in parsers and those of installed plugins
+    """
+    parsers = dict(BUILTIN_PARSERS)
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        parsers[entry_point.name] = entry_point.load()
+    return parsers
+
+
+class ParserRouter(object):
+    """
+    Picks the parser of a url among routes, (pattern, parser) pairs tried in order,
+    with a single match of one combined regex. parser is a DocumentationParser
+    subclass or its 'module:Class' path, imported the first time a url routes to it,
+    so a worker only imports the parsers it uses
+    """
+    def __init__(self, routes):
+        self._targets = {}
+        alternatives = []
+        group = 1
+        for pattern, target in routes:
+            # Each pattern is wrapped in a group of its own. It closes after any group inside
+            # it, so lastindex of a match tells which pattern matched
+            self._targets[group] = target
+            alternatives.append('(%s)' % pattern)
+            group += re.compile(pattern).groups + 1
+        self._pattern = re.compile('|'.join(alternatives))
+        self._parsers = {}
+
+    @property
+    def key(self):
+        """
+        Identifies the parsers behind the router, e.g. to tell outputs of other parsers apart
+        """
+        names = []
+        for target in self._targets.values():
+            name = target.rpartition(':')[2] if isinstance(target, str) else target.__name__
+            if name not in names:
+                names.append(name)
+        return '+'.join(names)
+
+    def route(self, url):
+        """
+        Parser class of url, None if no pattern matches it
+        """
+        m = self._pattern.match(url)
+        if m is None:
+            return None
+        Parser = self._parsers.get(m.lastindex)
+        if Parser is None:
+            target = self._targets[m.lastindex]
+            Parser = self._parsers[m.lastindex] = load_object(target) if isinstance(target, str) else target
+        return Parser
+
+    def __getstate__(self):
+        # Workers import what they route to themselves
+        state = dict(self.__dict__)
+        state['_parsers'] = {}
+        return state
+
+
+def parser_router(names):
+    """
+    Router over the named parsers, in order. name=regex routes the urls matching regex
+    to a parser in place of the patterns it was registered with. A single parser named
+    without a regex gets every url, as when only one parser could be run
+    """
+    parsers = available_parsers()
+    if len(names) == 1 and '=' not in names[0] and names[0] in parsers:
+        return as_router(parsers[names[0]]['parser'])
+    routes = []
+    for name in names:
+        name, _, pattern = name.partition('=')
+        if name not in parsers:
+            raise ValueError('Unknown parser %s, available: %s' % (name, ', '.join(sorted(parsers))))
+        declaration = parsers[name]
+        for pattern in [pattern] if pattern else declaration['patterns']:
+            routes.append((pattern, declaration['parser']))
+    return ParserRouter(routes)
+
+
+def as_router(parser):
+    """
+    parser as is if it is a router, otherwise a router sending every url to it
+    """
+    return parser if isinstance(parser, ParserRouter) else ParserRouter([('', parser)])
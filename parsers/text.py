@@ -0,0 +1,62 @@
+from bs4.element import NavigableString
+
+# Every whitespace character but the space, to be deleted. None of them comes after
+# U+3000
+_DROP_WHITESPACE = dict.fromkeys(i for i in range(0x3001) if chr(i).isspace() and chr(i) != ' ')
+
+
+def clean_text(text):
+    """
+    Strips text and collapses every run of whitespace to a space if it has one and to
+    nothing otherwise, so lines wrapped inside identifiers join up again. Deleting all
+    whitespace but spaces first leaves every run as just its spaces, and split and
+    join collapse those, all without a Python callback per run
+    """
+    text = text.strip()
+    # Printable text has no whitespace but spaces
+    if not text.isprintable():
+        text = text.translate(_DROP_WHITESPACE)
+    return ' '.join(text.split()) if '  ' in text else text
+
+
+def _string_types(tag):
+    # The strings get_text keeps
+    types = tag.interesting_string_types
+    if types is None:
+        return tag.MAIN_CONTENT_STRING_TYPES
+    return (types,) if isinstance(types, type) else types
+
+
+class TextCleaner(object):
+    """
+    clean_text of the text of tree nodes, the same as of get_text. Table cells get
+    cleaned along with the code inside them, so the text of every node cleaned is
+    kept, both to answer again and to reuse when an ancestor is cleaned. Only valid
+    while the tree is unchanged, so use one per parse
+    """
+    def __init__(self):
+        self._texts = {}
+
+    def _collect(self, tag, types, parts):
+        for child in tag.contents:
+            if isinstance(child, NavigableString):
+                if type(child) in types:
+                    parts.append(child)
+                continue
+            known = self._texts.get(id(child))
+            if known is not None and known[0] == types:
+                parts.append(known[1])
+            else:
+                self._collect(child, types, parts)
+
+    def clean(self, tag):
+        known = self._texts.get(id(tag))
+        if known is not None:
+            return known[2]
+        types = _string_types(tag)
+        parts = []
+        self._collect(tag, types, parts)
+        text = ''.join(parts)
+        cleaned = clean_text(text)
+        self._texts[id(tag)] = (types, text, cleaned)
+        return cleaned
@@ -0,0 +1,225 @@
+"""
+Parses and saves stored pages without going to the network, fanning them across a
+process pool. Pages can come from a directory of html files, a tar archive of them,
+the page cache a crawl recorded with --cache_path or the WARC files of --warc_path.
+
+    python reparse.py --input dump/cache.db --save_path reparsed
+    python reparse.py --input pages.tar.gz --base_url https://developer.android.com --save_path reparsed
+"""
+import argparse
+import glob
+import logging
+import multiprocessing as mp
+import multiprocessing.util
+import os
+import time
+
+from parsers.registry import as_router, parser_router
+from serializers.basic_serializer import BasicSerializer
+from serializers.drqa_serializer import DrQASerializer
+from sinks.sink import Sink
+from sinks.file_sink import FileSink
+from sinks.shard_sink import ShardSink
+from sinks.sqlite_sink import SqliteSink
+from sources.directory_source import DirectorySource
+from sources.tar_source import TarSource
+from sources.cache_source import CacheSource
+from sources.warc_source import WarcSource
+from checkpoint import FETCHED, PARSED, SAVED, FAILED
+from metrics import metrics
+
+
+def open_source(path, base_url=''):
+    if path.endswith(('.warc', '.warc.gz')) or glob.glob(os.path.join(path, '*.warc*')):
+        return WarcSource(path, base_url)
+    elif os.path.isdir(path):
+        return DirectorySource(path, base_url)
+    elif path.endswith(('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')):
+        return TarSource(path, base_url)
+    return CacheSource(path, base_url)
+
+
+class _CaptureSink(Sink):
+    """
+    Keeps what a serializer writes so it can be sent back to the main process
+    """
+    def __init__(self):
+        super(_CaptureSink, self).__init__('')
+        self.documents = []
+
+    def write(self, url, path, text):
+        self.documents.append((url, path, text))
+
+
+# State of a pool worker, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(source, parsers, Serializer, Sink, sink_options, save_path, worker_ids):
+    with worker_ids.get_lock():
+        worker_id = worker_ids.value
+        worker_ids.value += 1
+    logging.basicConfig(filename=os.path.join(save_path, 'reparse-errors-%d.log' % worker_id),
+                        level=logging.ERROR, filemode='w')
+    sink = Sink(save_path, worker_id, **sink_options) if Sink else None
+    if sink:
+        # Pool workers have no exit hook of their own, flush the sink when the process ends
+        multiprocessing.util.Finalize(None, sink.close, exitpriority=10)
+    multiprocessing.util.Finalize(None, source.close, exitpriority=10)
+    metrics.reset()
+    _worker.update(source=source, parsers=parsers, Serializer=Serializer, sink=sink, save_path=save_path)
+
+
+def _reparse(key):
+    """
+    Parses and serializes one page. Without a sink of its own the worker sends the
+    documents back for the main process to write
+    """
+    Serializer = _worker['Serializer']
+    # A page that can't be read fails on its own, under its key if its url is unknown
+    url = key if isinstance(key, str) else key[0]
+    try:
+        url, body = _worker['source'].read(key)
+        if body is None:
+            raise ValueError('No body stored')
+    except:
+        logging.error('Read Error: %s' % url)
+        return url, FAILED, [], metrics.collect()
+    Parser = _worker['parsers'].route(url)
+    metrics.incr('bytes', len(body))
+    sink = _worker['sink'] or _CaptureSink()
+
+    status = FETCHED
+    try:
+        # Pages no parser is routed to are skipped
+        if Parser:
+            with metrics.timer('scan'):
+                _, needs_tree, _ = Parser.scan(body)
+        if Parser and needs_tree:
+            status = PARSED
+            with metrics.timer('tree'):
+                soup = Parser.build_tree(body)
+            parser = Parser(soup)
+            with metrics.timer('extract'):
+                extracted = parser.extract()
+            if extracted:
+                Serializer(url, parser, save_path=_worker['save_path'], sink=sink).save()
+                status = SAVED
+    except:
+        status = FAILED
+        logging.error('Parse Error: %s' % url)
+
+    documents = sink.documents if isinstance(sink, _CaptureSink) else []
+    return url, status, documents, metrics.collect()
+
+
+_STATUS_COUNTERS = {FETCHED: 'fetched', PARSED: 'parsed', SAVED: 'saved', FAILED: 'failed'}
+
+
+def reparse(source, Parser, Serializer, save_path, Sink=FileSink, sink_options=None, processes=None,
+            chunksize=16, ordered=False, progress_interval=10, report_path=None):
+    """
+    Runs Parser, a parser class or a router of them, and Serializer over every page of
+    source and yields (url, status) as pages complete. Workers write to sinks of their own in whatever order they finish.
+    With ordered, results come back in the order of the source and the main process
+    writes everything through a single sink, which makes the output deterministic
+    """
+    sink_options = sink_options or {}
+    if save_path:
+        os.makedirs(save_path, exist_ok=True)
+    processes = processes or os.cpu_count()
+    metrics.reset()
+
+    writer = Sink.start_writer(save_path, **sink_options)
+    if writer:
+        sink_options = dict(sink_options, **writer.sink_options)
+    main_sink = Sink(save_path, 0, **sink_options) if ordered else None
+    worker_ids = mp.Value('i', 1 if ordered else 0)
+    pool = mp.Pool(processes, _init_worker,
+                   (source, as_router(Parser), Serializer, None if ordered else Sink, sink_options, save_path, worker_ids))
+    start = last_progress = time.time()
+    finished = False
+    try:
+        imap = pool.imap if ordered else pool.imap_unordered
+        for url, status, documents, worker_metrics in imap(_reparse, source.keys(), chunksize):
+            for doc_url, path, text in documents:
+                with metrics.timer('write'):
+                    main_sink.write(doc_url, path, text)
+            metrics.merge(worker_metrics)
+            metrics.incr('pages')
+            metrics.incr(_STATUS_COUNTERS[status])
+            if progress_interval and time.time() - last_progress >= progress_interval:
+                last_progress = time.time()
+                print(metrics.progress_line(last_progress - start, 0))
+            yield url, status
+        finished = True
+    finally:
+        # Let workers run their finalizers and flush their sinks, unless the caller gave up early
+        if finished:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
+        if main_sink:
+            main_sink.close()
+        if writer:
+            writer.close()
+
+    elapsed = time.time() - start
+    print(metrics.progress_line(elapsed, 0))
+    if report_path:
+        metrics.save_report(report_path, elapsed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input', required=True,
+                        help='Directory of html files, tar archive of them, page cache file or WARC files '
+                             'of a crawl')
+    parser.add_argument('--base_url', default='https://developer.android.com',
+                        help='[Optional] Url the paths of a directory or archive are relative to')
+    parser.add_argument('--parser', default=['android-ref'], nargs='+',
+                        help='[Optional] Parsers to run. A single parser runs on every url, several run each on the '
+                             'urls it is registered for. name=regex runs a parser on the urls matching regex '
+                             'instead')
+    parser.add_argument('--save_format', choices=['basic', 'drqa'], default='basic', help='Format of saved files')
+    parser.add_argument('--save_path', default='', help='[Optional] Path to save files')
+    parser.add_argument('--sink', choices=['files', 'shards', 'sqlite'], default='files',
+                        help='[Optional] Save one file per class, append to JSON lines shards or store '
+                             'records in a sqlite database for DrQA')
+    parser.add_argument('--shard_size', type=int, default=64, help='[Optional] Maximum shard size in MB')
+    parser.add_argument('--compression', choices=['none', 'gzip', 'zstd'], default='none',
+                        help='[Optional] Compression of shards')
+    parser.add_argument('--db_path', default=None,
+                        help='[Optional] Path of the sqlite database. Defaults to docs.db under the save path')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='[Optional] Number of worker processes. Defaults to the number of cores')
+    parser.add_argument('--chunksize', type=int, default=16,
+                        help='[Optional] Pages sent to a worker at a time')
+    parser.add_argument('--ordered', action='store_true', default=False,
+                        help='[Optional] Write documents in input order from a single sink')
+    parser.add_argument('--progress_interval', type=float, default=10,
+                        help='[Optional] Seconds between progress lines. 0 to disable')
+    args = parser.parse_args()
+
+    if args.sink == 'shards':
+        sink_class = ShardSink
+        sink_options = {'shard_size': args.shard_size * 1024 * 1024,
+                        'compression': None if args.compression == 'none' else args.compression}
+    elif args.sink == 'sqlite':
+        sink_class, sink_options = SqliteSink, {'db_path': args.db_path}
+    else:
+        sink_class, sink_options = FileSink, {}
+
+    try:
+        parsers = parser_router(args.parser)
+    except ValueError as e:
+        parser.error(str(e))
+
+    source = open_source(args.input, args.base_url)
+    for url, status in reparse(source, parsers,
+                               DrQASerializer if args.save_format == 'drqa' else BasicSerializer,
+                               args.save_path, sink_class, sink_options, args.processes, args.chunksize,
+                               args.ordered, args.progress_interval,
+                               os.path.join(args.save_path, 'reparse-report.json')):
+        pass
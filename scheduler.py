@@ -0,0 +1,103 @@
+from frontier import ScratchStore, VisitedSet, Frontier
+
+
+class Scheduler(object):
+    """
+    Keeps the crawl frontier in the main process. Urls wait in the frontier until the
+    caller takes them for dispatch with next_url, and are in flight from then until a
+    worker reports back on them, so the crawl ends exactly when nothing is queued or
+    being processed. With canonicalize, urls are deduplicated on their canonical form.
+    Memory stays bounded however large the crawl gets: the frontier spills to disk
+    beyond max_in_memory urls and the visited set lives on disk behind a Bloom filter
+    sized for capacity urls
+    """
+    def __init__(self, canonicalize=None, path=None, max_in_memory=100000, capacity=1000000):
+        self._store = ScratchStore(path)
+        self._seen = VisitedSet(self._store, capacity=capacity)
+        self._frontier = Frontier(self._store, max_in_memory)
+        self._inflight = 0
+        self._canonicalize = canonicalize
+        # Distinct non canonical urls and the canonical urls only ever seen through them
+        self._aliases = VisitedSet(self._store, 'aliases', capacity=max(1000, capacity // 10))
+        self._alias_only = set()
+
+    def add(self, urls):
+        """
+        Registers a batch of discovered urls, queues the canonical form of the ones not
+        seen before and returns them
+        """
+        new_urls = []
+        for url in urls:
+            if self._canonicalize:
+                canonical = self._canonicalize(url)
+                if canonical != url:
+                    if self._aliases.add(url) and canonical not in self._seen:
+                        self._alias_only.add(canonical)
+                else:
+                    self._alias_only.discard(url)
+                url = canonical
+            if self._seen.add(url):
+                new_urls.append(url)
+        self._frontier.extend(new_urls)
+        return new_urls
+
+    def restore(self, seen, pending):
+        """
+        Restores the state of an earlier crawl and queues the pending urls again
+        """
+        for url in seen:
+            self._seen.add(url)
+        for url in pending:
+            self._seen.add(url)
+        self._frontier.extend(pending)
+
+    def next_url(self):
+        """
+        Takes the next url to dispatch off the frontier, None if there is none
+        """
+        url = self._frontier.pop()
+        if url is not None:
+            self._inflight += 1
+        return url
+
+    def complete(self, url, status=None):
+        self._inflight -= 1
+
+    def requeue(self, urls):
+        """
+        Puts urls taken with next_url back in the frontier, e.g. when the node they were
+        handed to died
+        """
+        self._inflight -= len(urls)
+        self._frontier.extend(urls)
+
+    @property
+    def fetches_avoided(self):
+        """
+        Fetches that deduplicating on the plain url would have made on top
+        """
+        return len(self._aliases) - len(self._alias_only)
+
+    @property
+    def inflight(self):
+        return self._inflight
+
+    @property
+    def outstanding(self):
+        return len(self._frontier) + self._inflight
+
+    @property
+    def done(self):
+        return self.outstanding == 0
+
+    def urls(self):
+        """
+        Streams every url seen so far
+        """
+        return iter(self._seen)
+
+    def close(self):
+        self._store.close()
+
+    def __len__(self):
+        return len(self._seen)
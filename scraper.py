@@ -1,17 +1,199 @@
-import urllib.request
 from urllib.parse import urldefrag, urlparse
-from bs4 import BeautifulSoup
-import multiprocessing as mp
 import re
 import os
 import logging
 import argparse
+import queue
+import shutil
+import threading
+import time
 
-from parsers.android_ref_parser import AndroidDocParser
+from parsers.registry import as_router, parser_router
+from parsers.link_scanner import scan_page
 from serializers.basic_serializer import BasicSerializer
 from serializers.drqa_serializer import DrQASerializer
+from fetchers.fetcher import FetchError
+from fetchers.urllib_fetcher import UrllibFetcher
+from fetchers.async_fetcher import AsyncFetcher
+from fetchers.threaded_fetcher import ThreadedFetcher
+from fetchers.http_cache import HttpCache, CacheFetcher
+from fetchers.rate_limiter import RateLimiter
+from scheduler import Scheduler
+from supervisor import WorkerSupervisor, ResultSender
+from distributed import RemoteScheduler, DEFAULT_AUTHKEY, parse_address
+from checkpoint import Checkpoint, FETCHED, PARSED, SAVED, UNCHANGED, FAILED, DUPLICATE, STATUS_COUNTERS
+from dedup import canonical_url, FingerprintIndex
+from warc import WarcWriter
+from sitemap import read_site_index, Manifest
+from index.builder import EntryLog, merge_logs
+from index.reader import SearchIndex
+from catalog.writer import CatalogWriter, arrow, merge_catalog
+from sinks.file_sink import FileSink
+from sinks.shard_sink import ShardSink
+from sinks.sqlite_sink import SqliteSink
+from metrics import metrics
 
-def _worker_loop(id, path_filter, url_queue, output_queue, busy_flag, save_path, Parser, Serializer):
+def _parse_page(id, url, response, cache, fingerprints, parsers):
+    """
+    Parse stage of a page. Returns its links, its status and, for pages to save, the
+    parser holding the extracted documentation along with the content fingerprint.
+    Pages no parser is routed to are only scanned for links
+    """
+    # Pages that haven't changed since the last crawl are neither parsed nor saved again
+    links = cache.unchanged_links(url, response) if cache else None
+    if links is not None:
+        print('%d Unchanged' % id, url)
+        metrics.incr('writes_avoided')
+        return links, UNCHANGED, None, None
+
+    Parser = parsers.route(url)
+    if Parser is None:
+        with metrics.timer('scan'):
+            links = scan_page(response.body)[0]
+        return links, FETCHED, None, None
+
+    # Links come from a streaming scan, the full tree is only built for pages the parser can extract
+    with metrics.timer('scan'):
+        links, needs_tree, fingerprint = Parser.scan(response.body)
+
+    # Skip pages whose content was already seen under another url in this run, or was
+    # saved unchanged by an earlier run
+    if needs_tree and fingerprints and fingerprint:
+        with metrics.timer('dedup'):
+            owner = fingerprints.claim(url, fingerprint)
+            unchanged = owner == url and fingerprints.unchanged(url, fingerprint)
+        if owner != url:
+            print('%d Duplicate of %s' % (id, owner), url)
+            metrics.incr('writes_avoided')
+            return links, DUPLICATE, None, None
+        if unchanged:
+            print('%d Unchanged' % id, url)
+            metrics.incr('writes_avoided')
+            return links, UNCHANGED, None, None
+
+    if not needs_tree:
+        return links, FETCHED, None, None
+
+    with metrics.timer('tree'):
+        soup = Parser.build_tree(response.body)
+    parser = Parser(soup)
+
+    # Actual parsing happens here
+    print('%d Parsing' % id, url)
+    try:
+        with metrics.timer('extract'):
+            extracted = parser.extract()
+    except:
+        print('%d Error parsing' % id, url)
+        logging.error('Parse Error: %s' % url)
+        return links, FAILED, None, None
+    return links, PARSED, parser if extracted else None, fingerprint
+
+
+class _Writer(object):
+    """
+    What a write thread saves pages with: its own sink, its own connections to the
+    shared page cache and fingerprint index and its own files of the catalog
+    """
+    def __init__(self, sink_id, save_path, Sink, sink_options, cache_path, fingerprint_options, index_path,
+                 catalog_options):
+        self.sink = Sink(save_path, sink_id, **sink_options)
+        self.cache = HttpCache(cache_path) if cache_path else None
+        self.fingerprints = FingerprintIndex(**fingerprint_options) if fingerprint_options else None
+        self.entry_log = (EntryLog(os.path.join(index_path + '.logs', 'entries-%03d.jsonl' % sink_id))
+                          if index_path else None)
+        self.catalog = CatalogWriter(writer_id=sink_id, **catalog_options) if catalog_options else None
+
+    def save(self, url, response, links, parser, fingerprint, Serializer, save_path):
+        """
+        Saves the documentation of a parsed page and records it as saved. links are
+        all links of the page, for the cache
+        """
+        Serializer(url, parser, save_path=save_path, sink=self.sink).save()
+        if self.fingerprints and fingerprint:
+            self.fingerprints.saved(url, fingerprint)
+        if self.entry_log:
+            with metrics.timer('index'):
+                self.entry_log.add(parser.documentation, url)
+        if self.catalog:
+            with metrics.timer('catalog'):
+                self.catalog.add(parser.documentation, url)
+        if self.cache:
+            self.cache.store(url, response, links)
+        return SAVED
+
+    def close(self):
+        self.sink.close()
+        for resource in (self.cache, self.fingerprints, self.entry_log, self.catalog):
+            if resource:
+                resource.close()
+
+
+class _WriteStage(object):
+    """
+    Saves the pages a worker parsed on num_threads threads of their own, so the worker
+    goes on parsing while documents are serialized and written. At most max_pending
+    pages wait to be written, beyond that the worker blocks. With no threads pages
+    are saved by the worker itself. Every page is reported back once it's saved
+    """
+    def __init__(self, id, num_threads, max_pending, output_queue, save_path, Serializer,
+                 Sink, sink_options, cache_path, fingerprint_options, index_path, catalog_options):
+        self._id = id
+        self._output_queue = output_queue
+        self._save_path = save_path
+        self._Serializer = Serializer
+        # Sink ids stay unique across workers, also those replacing recycled ones: thread j of
+        # worker id writes as id * num_threads + j
+        self._writer_args = [(id * max(1, num_threads) + j, save_path, Sink, sink_options, cache_path,
+                              fingerprint_options, index_path, catalog_options)
+                             for j in range(max(1, num_threads))]
+        self._inline = _Writer(*self._writer_args[0]) if not num_threads else None
+        self._pending = queue.Queue(max(1, max_pending))
+        self._threads = [threading.Thread(target=self._run, args=(args,), daemon=True)
+                         for args in self._writer_args[:num_threads]]
+        for thread in self._threads:
+            thread.start()
+
+    def _save(self, writer, url, response, links, new_urls, parser, fingerprint, page_start):
+        try:
+            status = writer.save(url, response, links, parser, fingerprint, self._Serializer, self._save_path)
+        except:
+            print('%d Error saving' % self._id, url)
+            logging.error('Save Error: %s' % url)
+            status = FAILED
+        metrics.observe('page', time.perf_counter() - page_start)
+        self._output_queue.put((url, new_urls, status, metrics.collect()))
+
+    def _run(self, writer_args):
+        # sqlite connections can only be used by the thread that opened them
+        writer = _Writer(*writer_args)
+        while True:
+            task = self._pending.get()
+            if task is None:
+                break
+            self._save(writer, *task)
+        writer.close()
+
+    def submit(self, url, response, links, new_urls, parser, fingerprint, page_start):
+        task = (url, response, links, new_urls, parser, fingerprint, page_start)
+        if self._inline:
+            self._save(self._inline, *task)
+            return
+        with metrics.timer('write_wait'):
+            self._pending.put(task)
+
+    def close(self):
+        for _ in self._threads:
+            self._pending.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self._inline:
+            self._inline.close()
+
+
+def _worker_loop(id, url_queue, results, state, path_filter, save_path, parsers, Serializer, Fetcher,
+                 fetcher_options, cache_path, Sink, sink_options, fingerprint_options, warc_options, index_path,
+                 catalog_options, write_threads):
     print('Worker %d started' % id)
     query_pattern = re.compile(path_filter)
 
@@ -19,93 +201,267 @@ def _worker_loop(id, path_filter, url_queue, output_queue, busy_flag, save_path,
         os.makedirs(save_path, exist_ok=True)
     log_path = os.path.join(save_path, 'scrape-errors-%d.log' % id)
     logging.basicConfig(filename=log_path, level=logging.ERROR, filemode='w')
+    output_queue = ResultSender(results)
     
+    # Fetchers that don't run in the worker send the downloaded page along with the url
+    fetcher = Fetcher(**fetcher_options) if Fetcher.in_worker else None
+    cache = HttpCache(cache_path) if cache_path else None
+    fingerprints = FingerprintIndex(**fingerprint_options) if fingerprint_options else None
+    archive = WarcWriter(worker_id=id, **warc_options) if warc_options else None
+    writer = _WriteStage(id, write_threads, 2 * write_threads, output_queue, save_path, Serializer,
+                         Sink, sink_options, cache_path, fingerprint_options, index_path, catalog_options)
+    metrics.reset()
     
     while True:
-        url = url_queue.get()
-        if url is None:
+        # The supervisor times the task a worker is on, not the wait for the next one
+        state[1] = 0
+        with metrics.timer('queue_wait'):
+            task = url_queue.get()
+        page_start = time.perf_counter()
+        if task is None:
             print('Worker %d exiting' % id)
+            writer.close()
+            if archive:
+                archive.close()
             break
-        
-        busy_flag.value |= 1 << id
-        print('%d Fetching' % id, url)
+        seq, task = task
+        state[0] = seq
+        state[1] = time.time()
 
-        try:
-            with urllib.request.urlopen(url) as response:
-                html = response.read()
-            soup = BeautifulSoup(html, 'html5lib')
-        except:
+        if fetcher:
+            url = task
+            print('%d Fetching' % id, url)
+            try:
+                with metrics.timer('fetch'):
+                    response = fetcher.fetch(url, cache.conditional_headers(url) if cache else None)
+            except FetchError:
+                response = None
+        else:
+            url, response = task
+
+        if response is None:
             print('%d Error fetching' % id, url)
             logging.error('Fetch Error: %s' % url)
+            metrics.incr('fetch_errors')
+            metrics.observe('page', time.perf_counter() - page_start)
+            output_queue.put((url, [], FAILED, metrics.collect()))
+            continue
 
-        parser = Parser(soup)
-        serializer = Serializer(url, parser, save_path=save_path)
-
-        # Actual parsing happens here
-        print('%d Parsing' % id, url)
+        metrics.incr('bytes', len(response.body))
+        if archive:
+            with metrics.timer('archive'):
+                archive.write(response)
         try:
-            if parser.extract():
-                serializer.save()
+            links, status, parser, fingerprint = _parse_page(id, url, response, cache, fingerprints, parsers)
         except:
-            print('%d Error parsing' % id, url)
-            logging.error('Parse Error: %s' % url)
-
+            print('%d Error processing' % id, url)
+            logging.error('Process Error: %s' % url)
+            links, status, parser, fingerprint = [], FAILED, None, None
 
-        items = soup.find_all('a', {'href': query_pattern})
+        # Report back exactly once per url with all links found on the page
         url_set = set()
-        if len(items) > 0:
-            for a in items:
-                url, frag = urldefrag(a['href'])
-                if url not in url_set:
-                    url_set.add(url)
-                    output_queue.put(url)
-        else:
-            output_queue.put(None)
+        for link in links:
+            if query_pattern.search(link):
+                link, frag = urldefrag(link)
+                url_set.add(link)
 
+        # Pages with documentation to save go on to the write stage, which reports them
+        if parser:
+            writer.submit(url, response, links, list(url_set), parser, fingerprint, page_start)
+            continue
+        if cache and status in (FETCHED, PARSED):
+            cache.store(url, response, links)
+        metrics.observe('page', time.perf_counter() - page_start)
+        output_queue.put((url, list(url_set), status, metrics.collect()))
 
-        busy_flag.value &= ~(1 << id)
 
 class Scraper(object):
     """
         Main Scraper Class
     """
     def __init__(self, start_url, parser_class, serializer_class, 
-                 path_filters=None, save_path=None, num_workers=5, crawl=True):
-        self._parser_class = parser_class
+                 path_filters=None, save_path=None, num_workers=5, crawl=True,
+                 fetcher_class=UrllibFetcher, max_inflight=20, cache_path=None, from_cache=False,
+                 sink_class=FileSink, sink_options=None, checkpoint_path=None, resume=False,
+                 max_rate=0, max_retries=3, progress_interval=10, report_path=None, metrics_port=None,
+                 fingerprint_path=None, max_queued=None, frontier_path=None, max_frontier_memory=100000,
+                 visited_capacity=1000000, warc_path=None, warc_size=1024 * 1024 * 1024,
+                 index_path=None, fetch_threads=0, write_threads=1, site_index=None, manifest_path=None,
+                 coordinator=None, authkey=DEFAULT_AUTHKEY, page_timeout=300, max_worker_pages=0,
+                 max_worker_memory=0, max_attempts=3, quarantine_path=None, catalog_path=None,
+                 catalog_format='parquet', revalidate_after=0):
+        # Several sites can be crawled at once, every parser gets the urls routed to it
+        start_urls = [start_url or site_index] if isinstance(start_url, str) or not start_url else start_url
+        self._parsers = as_router(parser_class)
         self._serializer_class = serializer_class
-        self._root_url = start_url
+        self._root_urls = [canonical_url(url) for url in start_urls]
         self._crawl = crawl
+        self._save_path = save_path
+        self._sink_class = sink_class
+        self._sink_options = sink_options or {}
+        self._checkpoint_path = checkpoint_path
+        self._resume = resume
+        self._progress_interval = progress_interval
+        self._report_path = report_path
+        self._frontier_path = frontier_path
+        self._max_frontier_memory = max_frontier_memory
+        self._visited_capacity = visited_capacity
+        self._index_path = index_path
+        self._cache_path = cache_path
+        self._fingerprint_path = fingerprint_path
+        self._site_index = site_index
+        self._manifest_path = manifest_path or os.path.join(save_path or '', 'site-manifest.db')
+        self._revalidate_after = revalidate_after
+        self._removed = []
+        self._coordinator = coordinator
+        self._authkey = authkey
+        if metrics_port:
+            metrics.serve(metrics_port)
 
-        url = urlparse(start_url)
-        domain = url.scheme + '://' + url.netloc
+        domains = []
+        for url in map(urlparse, start_urls):
+            if url.scheme + '://' + url.netloc not in domains:
+                domains.append(url.scheme + '://' + url.netloc)
+        domain = '(%s)' % '|'.join(map(re.escape, domains))
         if path_filters:
             filter_string = '%s/(%s)/.+html' % (domain, "|".join(path_filters))
         else:
             filter_string = '%s/.+html' % domain 
+        self._query_pattern = re.compile(filter_string)
 
-        self._url_queue = mp.Queue()
-        self._output_queue = mp.Queue()
-        self._busy_flag = mp.Value('i', 0)
         self._shutdown = False
         if not crawl:
             num_workers = 1
 
-        self._workers = [mp.Process(target=_worker_loop, 
-                                    args=(id, filter_string, self._url_queue, self._output_queue, self._busy_flag,
-                                          save_path, self._parser_class, self._serializer_class))
+        # Replaying from the cache parses every page again, so there is nothing to revalidate
+        if from_cache:
+            fetcher_class = CacheFetcher
+            fetcher_options = {'cache_path': cache_path}
+            cache_path = None
+        else:
+            # With fetch threads a blocking fetcher gets a stage of its own in the main process
+            # instead of running inside the workers, so downloads go on while pages are parsed
+            wrapped_class = None
+            if fetch_threads and fetcher_class.in_worker:
+                wrapped_class, fetcher_class, max_inflight = fetcher_class, ThreadedFetcher, fetch_threads
+            # Shared by all workers, so per host concurrency never exceeds what a single fetcher could use
+            max_concurrency = num_workers if fetcher_class.in_worker else max_inflight
+            fetcher_options = {'rate_limiter': RateLimiter(max_rate, max_concurrency),
+                               'max_retries': max_retries}
+            if wrapped_class:
+                fetcher_options['fetcher_class'] = wrapped_class
+
+        fingerprint_options = None
+        if fingerprint_path:
+            # Regenerating from the cache is meant to rewrite everything
+            salt = '%s/%s:' % (self._parsers.key, serializer_class.__name__)
+            if from_cache:
+                salt += '%d:' % time.time()
+            fingerprint_options = {'path': fingerprint_path, 'run_id': '%d-%d' % (os.getpid(), time.time()),
+                                   'salt': salt}
+            # Documents a sink lost in a crash have to be written again
+            saved_urls = sink_class.saved_urls(save_path, **self._sink_options)
+            if saved_urls is not None:
+                fingerprints = FingerprintIndex(fingerprint_path, None)
+                fingerprints.retain(saved_urls)
+                fingerprints.close()
+
+        # Every write thread exports the documents it saves to files of its own, merged into the
+        # catalog at the end like the index. Without pyarrow the run fails here instead of in
+        # every worker
+        self._catalog_path = catalog_path
+        self._catalog_format = catalog_format
+        catalog_options = None
+        if catalog_path:
+            arrow()
+            catalog_options = {'path': catalog_path + '.parts', 'format': catalog_format}
 
-                        for id in range(num_workers)]
-        for w in self._workers:
-            w.daemon = True
-            w.start()
+        # Workers archive every response they get, whichever fetcher it came from
+        warc_options = {'path': warc_path, 'max_size': warc_size} if warc_path else None
+
+        # Enough urls handed out to keep every worker or connection busy
+        self._max_queued = max_queued or 2 * (num_workers if fetcher_class.in_worker else max_inflight)
+
+        # Sinks that write through a single shared writer need it running before the workers
+        worker_sink_options = self._sink_options
+        self._writer = sink_class.start_writer(save_path, **self._sink_options)
+        if self._writer:
+            worker_sink_options = dict(self._sink_options, **self._writer.sink_options)
+
+        # Workers are killed when stuck on a page or past twice max_worker_memory, and recycled
+        # past max_worker_memory or after max_worker_pages pages. Pages that keep killing them
+        # are quarantined
+        self._supervisor = WorkerSupervisor(_worker_loop,
+                                            (filter_string, save_path, self._parsers, self._serializer_class,
+                                             fetcher_class, fetcher_options, cache_path,
+                                             sink_class, worker_sink_options, fingerprint_options, warc_options,
+                                             index_path, catalog_options, write_threads),
+                                            num_workers, page_timeout, max_worker_pages, max_worker_memory,
+                                            max_attempts,
+                                            quarantine_path or os.path.join(save_path or '', 'quarantine.tsv'))
+
+        self._fetcher_class = fetcher_class
+        self._fetcher_options = fetcher_options
+        self._fetcher = None
+        self._cache = None
+        if not fetcher_class.in_worker:
+            self._fetcher = fetcher_class(max_inflight=max_inflight, **fetcher_options)
+            self._fetcher.start(self._on_fetched)
+            if cache_path:
+                self._cache = HttpCache(cache_path)
 
-        
 
     def _shutdown_workers(self):
         if not self._shutdown:
             self._shutdown = True
-            for _ in self._workers:
-                self._url_queue.put(None)
+            if self._fetcher:
+                self._fetcher.close()
+            # Give workers the chance to flush their sinks
+            self._supervisor.close()
+            if self._writer:
+                self._writer.close()
+            if self._removed:
+                self._remove_documents()
+            if self._index_path:
+                self._build_index()
+            if self._catalog_path:
+                merge_catalog(self._catalog_path, self._catalog_path + '.parts', self._catalog_format,
+                              self._removed)
+                print('Catalog written to %s' % self._catalog_path)
+
+    def _build_index(self):
+        # Workers log the entries of the pages they saved, the index is built from the logs once
+        log_dir = self._index_path + '.logs'
+        log_paths = sorted(os.path.join(log_dir, name) for name in os.listdir(log_dir))
+        previous = SearchIndex(self._index_path) if os.path.exists(self._index_path) else None
+        try:
+            merge_logs(self._index_path, log_paths, previous, self._removed)
+        finally:
+            if previous:
+                previous.close()
+        shutil.rmtree(log_dir)
+        print('Search index written to %s' % self._index_path)
+
+    def _remove_documents(self):
+        # Pages gone from the site index lose their documents once no worker writes anymore,
+        # and everything that would keep them from being written again if they come back
+        documents = [(url, self._serializer_class.output_path(url)) for url in self._removed]
+        self._sink_class.remove(self._save_path, documents, **self._sink_options)
+        if self._fingerprint_path:
+            fingerprints = FingerprintIndex(self._fingerprint_path, None)
+            fingerprints.forget(self._removed)
+            fingerprints.close()
+        if self._cache_path:
+            cache = HttpCache(self._cache_path)
+            cache.forget(self._removed)
+            cache.close()
+        manifest = Manifest(self._manifest_path)
+        manifest.remove(self._removed)
+        manifest.close()
+        print('Removed %d documents of pages gone from the site index' % len(documents))
+
+    def close(self):
+        self._shutdown_workers()
 
     def __del__(self):
         self._shutdown_workers()
@@ -113,48 +469,262 @@ class Scraper(object):
     def _fetch_links(self, soup, query_pattern):
         return [item["href"] for item in soup.find_all("a", {"href": query_pattern})]
 
+    def _on_fetched(self, url, response, error):
+        self._supervisor.submit(url, (url, response))
+
+    def _schedule(self, url):
+        if self._fetcher:
+            self._fetcher.submit(url, self._cache.conditional_headers(url) if self._cache else None)
+        else:
+            self._supervisor.submit(url, url)
+
+
+    def _read_site_index(self, manifest):
+        """
+        Returns the {url: version} of the pages in the site index and the urls among them
+        that are new or changed since the manifest was written, or due for revalidation
+        """
+        if self._fetcher:
+            entries = read_site_index(self._site_index, self._fetcher)
+        else:
+            fetcher = self._fetcher_class(**self._fetcher_options)
+            try:
+                entries = read_site_index(self._site_index, fetcher)
+            finally:
+                fetcher.close()
+        versions = {}
+        for url, version in entries.items():
+            if self._query_pattern.search(url):
+                versions[canonical_url(url)] = version
+        changed, stale, self._removed = manifest.diff(versions, self._revalidate_after)
+        print('Site index lists %d pages, %d new or changed, %d to revalidate, %d removed' % (
+            len(versions), len(changed), len(stale), len(self._removed)))
+        return versions, changed + stale
+
+    def _dispatch(self, scheduler):
+        # Only a bounded number of urls are handed out at a time, the rest wait in the
+        # frontier. That bounds both queues, every url handed out produces one result
+        while scheduler.inflight < self._max_queued:
+            url = scheduler.next_url()
+            if url is None:
+                break
+            self._schedule(url)
 
     def start_scraping(self):
+        """
+        Crawls from the start url and yields (url, status) for every page as it
+        completes
+        """
+        # A node of a distributed crawl takes its urls from the coordinator, which also
+        # keeps the state of the crawl
+        if self._coordinator:
+            scheduler = RemoteScheduler(self._coordinator, self._authkey, lease_size=self._max_queued)
+        else:
+            scheduler = Scheduler(canonical_url, self._frontier_path, self._max_frontier_memory,
+                                  self._visited_capacity)
+        checkpoint = None
+        manifest = None
+        versions = {}
+        try:
+            if self._checkpoint_path and not self._coordinator:
+                checkpoint = Checkpoint(self._checkpoint_path, resume=self._resume)
+                if self._resume:
+                    saved_urls = self._sink_class.saved_urls(self._save_path, **self._sink_options)
+                    seen, pending = checkpoint.load(saved_urls)
+                    print('Resuming with %d urls seen, %d to do' % (len(seen), len(pending)))
+                    scheduler.restore(seen, pending)
 
-        url_set = set([self._root_url])
-        self._busy_flag = mp.Value('i', 0)
-        self._url_queue.put(self._root_url)
+            # With a site index only the pages it lists as new or changed are crawled, no links
+            # are followed
+            seeds = self._root_urls
+            if self._site_index and not self._coordinator:
+                manifest = Manifest(self._manifest_path)
+                versions, seeds = self._read_site_index(manifest)
+            new_urls = scheduler.add(seeds)
+            if checkpoint:
+                checkpoint.add(new_urls)
+            self._dispatch(scheduler)
 
-        while True:
-            cur_url = self._output_queue.get()
+            start = last_progress = time.time()
+            while not scheduler.done:
+                cur_url, links, status, worker_metrics = self._supervisor.get()
+                # Links go in before the page completes, a coordinator gets them with the result
+                # at the latest and never sees the crawl done while they are on their way
+                new_urls = scheduler.add(links) if self._crawl and not manifest else []
+                scheduler.complete(cur_url, status)
+                metrics.merge(worker_metrics)
+                metrics.incr('pages')
+                metrics.incr(STATUS_COUNTERS[status])
 
-            if cur_url != None and cur_url not in url_set:
-                # print("Adding url", cur_url)
-                url_set.add(cur_url)
-                self._url_queue.put(cur_url)
-                
+                if self._progress_interval and time.time() - last_progress >= self._progress_interval:
+                    last_progress = time.time()
+                    print(metrics.progress_line(last_progress - start, scheduler.outstanding))
 
-            if (not self._crawl or
-                (self._output_queue.qsize() == 0 and self._url_queue.qsize() == 0 
-                and self._busy_flag.value == 0)):
-                break
-        
-        print('Total links', len(url_set))
-        return list(url_set)
+                if manifest and status != FAILED and cur_url in versions:
+                    manifest.update(cur_url, versions[cur_url])
+                if checkpoint:
+                    checkpoint.update(cur_url, status, new_urls)
+                self._dispatch(scheduler)
+                yield cur_url, status
+
+            elapsed = time.time() - start
+            metrics.incr('fetches_avoided', scheduler.fetches_avoided)
+            print(metrics.progress_line(elapsed, 0))
+            print('Avoided %d fetches of aliases and %d writes of duplicate or unchanged documents' % (
+                metrics.counter('fetches_avoided'), metrics.counter('writes_avoided')))
+            if self._report_path:
+                metrics.save_report(self._report_path, elapsed)
+            print('Total links', len(scheduler))
+        finally:
+            if checkpoint:
+                checkpoint.close()
+            if manifest:
+                manifest.close()
+            scheduler.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('--start_url', default=None, help='The starting URL to start scraping')
+    parser.add_argument('--start_url', default=None, nargs='*', 
+                        help='The starting URL to start scraping. Several to crawl several sites at once')
+    parser.add_argument('--site_index', default=None, 
+                        help='[Optional] Url of a sitemap.xml or a listing like classes.html. Only the pages it '
+                             'lists as new or changed since the last run are crawled, documents of pages it no '
+                             'longer lists are deleted')
+    parser.add_argument('--manifest_path', default=None, 
+                        help='[Optional] Path of the pages and versions of the last run over the site index. '
+                             'Defaults to site-manifest.db under the save path')
+    parser.add_argument('--revalidate_days', type=float, default=0, 
+                        help='[Optional] Also crawl pages of the site index that were last crawled this many days '
+                             'ago, even if the index shows no change. With --cache_path unchanged pages only cost '
+                             'a conditional request')
+    parser.add_argument('--coordinator', default=None, type=parse_address, 
+                        help='[Optional] host:port of the coordinator of a distributed crawl, see distributed.py. '
+                             'Runs this scraper as one of its nodes')
+    parser.add_argument('--authkey', default=DEFAULT_AUTHKEY, 
+                        help='[Optional] Secret key to authenticate with the coordinator. Defaults to '
+                             '$DOC_SCRAPER_AUTHKEY, one of them is required with --coordinator')
     parser.add_argument('--path_filters', default=None, nargs='*', 
                         help='[Optional] List of path segments to restrict scraping to')
-    parser.add_argument('--parser', choices=['android-ref'], default='android-ref', help='Type of parser')      
+    parser.add_argument('--parser', default=['android-ref'], nargs='+', 
+                        help='[Optional] Parsers to run. A single parser runs on every url, several run each on the '
+                             'urls it is registered for. name=regex runs a parser on the urls matching regex '
+                             'instead. Built in: android-ref, plugins add '
+                             'more through the documentation_scraper.parsers entry point group')      
     parser.add_argument('--save_format', choices=['basic', 'drqa'], default='basic', help='Format of saved files')
     parser.add_argument('--save_path', default='', help='[Optional] Path to save files')
-    parser.add_argument('--num_workers', type=int, default=5, help='[Optional] Number of workers to run')
+    parser.add_argument('--sink', choices=['files', 'shards', 'sqlite'], default='files', 
+                        help='[Optional] Save one file per class, append to JSON lines shards or store '
+                             'records in a sqlite database for DrQA')
+    parser.add_argument('--shard_size', type=int, default=64, help='[Optional] Maximum shard size in MB')
+    parser.add_argument('--compression', choices=['none', 'gzip', 'zstd'], default='none', 
+                        help='[Optional] Compression of shards')
+    parser.add_argument('--db_path', default=None, 
+                        help='[Optional] Path of the sqlite database. Defaults to docs.db under the save path')
+    parser.add_argument('--num_workers', type=int, default=5, 
+                        help='[Optional] Number of worker processes of the parse stage')
+    parser.add_argument('--page_timeout', type=float, default=300, 
+                        help='[Optional] Seconds a worker may spend on a page before it is killed and the page '
+                             'retried. 0 for no limit')
+    parser.add_argument('--max_worker_pages', type=int, default=0, 
+                        help='[Optional] Pages after which a worker is replaced by a fresh one. 0 for no limit')
+    parser.add_argument('--max_worker_memory', type=int, default=0, 
+                        help='[Optional] Resident memory in MB past which a worker is replaced by a fresh one, '
+                             'and past twice which it is killed. 0 for no limit')
+    parser.add_argument('--max_attempts', type=int, default=3, 
+                        help='[Optional] Attempts at a page that kills its worker before it is quarantined '
+                             'in quarantine.tsv under the save path')
+    parser.add_argument('--fetch_threads', type=int, default=0, 
+                        help='[Optional] Threads of a fetch stage in the main process for the urllib fetcher. '
+                             '0 to fetch inside the workers')
+    parser.add_argument('--write_threads', type=int, default=1, 
+                        help='[Optional] Threads of the write stage of every worker. 0 to write inside the workers')
     parser.add_argument('--no_crawling', action='store_true', default=False, help='[Optional] Disable crawling')
+    parser.add_argument('--fetcher', choices=['urllib', 'async'], default='urllib', 
+                        help='[Optional] Fetch backend. async fetches from the main process over pooled connections')
+    parser.add_argument('--max_inflight', type=int, default=20, 
+                        help='[Optional] Number of concurrent requests for the async fetcher')
+    parser.add_argument('--max_rate', type=float, default=0, 
+                        help='[Optional] Maximum requests per second to a host. 0 for no limit')
+    parser.add_argument('--max_retries', type=int, default=3, 
+                        help='[Optional] Retries for throttled, failed or timed out requests')
+    parser.add_argument('--cache_path', default=None, 
+                        help='[Optional] Path of the page cache. Pages unchanged since the last crawl are skipped')
+    parser.add_argument('--from_cache', action='store_true', default=False, 
+                        help='[Optional] Parse and save pages from the cache without going to the network')
 
+    parser.add_argument('--fingerprint_path', default=None, 
+                        help='[Optional] Path of the content fingerprint index. Defaults to fingerprints.db '
+                             'under the save path')
+    parser.add_argument('--no_dedup', action='store_true', default=False, 
+                        help='[Optional] Parse and save every page even if its content was seen before')
+    parser.add_argument('--max_queued', type=int, default=None, 
+                        help='[Optional] Urls handed out to workers or the fetcher at a time. Defaults to twice '
+                             'the number of workers or --max_inflight')
+    parser.add_argument('--max_frontier_memory', type=int, default=100000, 
+                        help='[Optional] Urls the frontier keeps in memory before spilling to disk')
+    parser.add_argument('--visited_capacity', type=int, default=1000000, 
+                        help='[Optional] Expected number of urls, sizes the in-memory filter of the visited set')
+    parser.add_argument('--warc_path', default=None, 
+                        help='[Optional] Directory to archive every fetched response to as WARC files')
+    parser.add_argument('--warc_size', type=int, default=1024, help='[Optional] Maximum WARC file size in MB')
+    parser.add_argument('--index_path', default=None, 
+                        help='[Optional] Directory to build a search index of the crawl in, see search.py')
+    parser.add_argument('--catalog_path', default=None, 
+                        help='[Optional] Directory to export the classes, members and parameters of the saved '
+                             'pages to as columnar tables, see analytics.py. Needs pyarrow')
+    parser.add_argument('--catalog_format', choices=['parquet', 'arrow'], default='parquet', 
+                        help='[Optional] Write the catalog as Parquet or Arrow IPC files')
+    parser.add_argument('--checkpoint_path', default=None, 
+                        help='[Optional] Path of the crawl state file. Defaults to crawl-state.db under the save path')
+    parser.add_argument('--resume', action='store_true', default=False, 
+                        help='[Optional] Resume an interrupted crawl from its saved state')
+    parser.add_argument('--progress_interval', type=float, default=10, 
+                        help='[Optional] Seconds between progress lines. 0 to disable')
+    parser.add_argument('--metrics_port', type=int, default=None, 
+                        help='[Optional] Port to serve metrics on in the Prometheus text format')
     args = parser.parse_args()
+    if args.coordinator and not args.authkey:
+        parser.error('--coordinator needs --authkey or DOC_SCRAPER_AUTHKEY')
+
+    if args.sink == 'shards':
+        sink_class = ShardSink
+        sink_options = {'shard_size': args.shard_size * 1024 * 1024, 
+                        'compression': None if args.compression == 'none' else args.compression}
+    elif args.sink == 'sqlite':
+        sink_class, sink_options = SqliteSink, {'db_path': args.db_path}
+    else:
+        sink_class, sink_options = FileSink, {}
 
+    try:
+        parsers = parser_router(args.parser)
+    except ValueError as e:
+        parser.error(str(e))
 
-    scraper = Scraper(args.start_url, path_filters=args.path_filters, parser_class=AndroidDocParser,
+    scraper = Scraper(args.start_url, path_filters=args.path_filters, parser_class=parsers,
                       serializer_class=DrQASerializer if args.save_format == 'drqa' else BasicSerializer,
-                      save_path=args.save_path, num_workers=args.num_workers, crawl=not args.no_crawling)
-    scraper.start_scraping()
+                      save_path=args.save_path, num_workers=args.num_workers, crawl=not args.no_crawling,
+                      fetcher_class=AsyncFetcher if args.fetcher == 'async' else UrllibFetcher,
+                      max_inflight=args.max_inflight, cache_path=args.cache_path, from_cache=args.from_cache,
+                      sink_class=sink_class, sink_options=sink_options,
+                      checkpoint_path=args.checkpoint_path or os.path.join(args.save_path, 'crawl-state.db'),
+                      resume=args.resume, max_rate=args.max_rate, max_retries=args.max_retries,
+                      progress_interval=args.progress_interval, metrics_port=args.metrics_port,
+                      report_path=os.path.join(args.save_path, 'crawl-report.json'),
+                      fingerprint_path=None if args.no_dedup else 
+                      args.fingerprint_path or os.path.join(args.save_path, 'fingerprints.db'),
+                      max_queued=args.max_queued, max_frontier_memory=args.max_frontier_memory,
+                      visited_capacity=args.visited_capacity, warc_path=args.warc_path,
+                      warc_size=args.warc_size * 1024 * 1024, index_path=args.index_path,
+                      fetch_threads=args.fetch_threads, write_threads=args.write_threads,
+                      site_index=args.site_index, manifest_path=args.manifest_path,
+                      revalidate_after=args.revalidate_days * 24 * 3600,
+                      coordinator=args.coordinator, authkey=args.authkey, page_timeout=args.page_timeout,
+                      max_worker_pages=args.max_worker_pages, max_worker_memory=args.max_worker_memory * 1024 * 1024,
+                      max_attempts=args.max_attempts, catalog_path=args.catalog_path,
+                      catalog_format=args.catalog_format)
+    for url, status in scraper.start_scraping():
+        pass
+    scraper.close()
 
 
     # url = 'https://developer.android.com/reference/android/icu/text/BreakIterator.html'
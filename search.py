@@ -0,0 +1,107 @@
+"""
+Builds the search index of a crawl from the documents it saved in the basic format,
+and queries it.
+
+    python search.py build --save_path out
+    python search.py query --index_path out/index --kind method --returns Cursor
+    python search.py query --index_path out/index --kind constant --api_level 26
+"""
+import argparse
+import json
+import os
+import time
+
+from index.builder import IndexBuilder
+from index.reader import SearchIndex
+from sinks.shard_sink import ShardReader
+
+
+def saved_documents(save_path):
+    """
+    Yields the documents BasicSerializer saved under save_path, from files or shards
+    """
+    if os.path.isdir(os.path.join(save_path, 'shards')):
+        for url, text in ShardReader(save_path):
+            yield json.loads(text)
+    for root, dirs, files in os.walk(save_path):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(root, name)) as fp:
+                doc = json.load(fp)
+            # Skip reports and anything else that isn't a document
+            if isinstance(doc, dict) and 'url' in doc and 'name' in doc:
+                yield doc
+
+
+def build(save_path, index_path):
+    builder = IndexBuilder(index_path)
+    count = 0
+    for doc in saved_documents(save_path):
+        builder.add(doc, doc['url'])
+        count += 1
+    builder.close()
+    return count
+
+
+def _format(entry):
+    name = entry['name'] if entry['name'] == entry['class'] else '%s.%s' % (entry['class'], entry['name'])
+    if 'params' in entry:
+        name += '(%s)' % ', '.join('%s %s' % (param_type, param_name) for param_name, param_type in entry['params'])
+    if entry.get('returns'):
+        name = '%s %s' % (entry['returns'], name)
+    elif entry.get('type'):
+        name = '%s %s' % (entry['type'].strip(), name)
+    return '%-16s %s  [API %s]  %s' % (entry['kind'], name, entry.get('api_level'), entry['url'])
+
+
+def _api_level(value):
+    # 26 for exactly 26, 26: for 26 and later, :26 for up to 26
+    if ':' in value:
+        low, high = value.split(':', 1)
+        return (low or None, high or None)
+    return value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help='Index the documents saved by a crawl')
+    build_parser.add_argument('--save_path', required=True, help='Save path of the crawl')
+    build_parser.add_argument('--index_path', default=None,
+                              help='[Optional] Directory of the index. Defaults to index under the save path')
+
+    query_parser = commands.add_parser('query', help='Search an index')
+    query_parser.add_argument('text', nargs='*', help='[Optional] Words to find in names and descriptions')
+    query_parser.add_argument('--index_path', required=True, help='Directory of the index')
+    query_parser.add_argument('--name', help='[Optional] Name of the class or member. Ends with * for a prefix')
+    query_parser.add_argument('--kind', help='[Optional] class, interface, method, public_method, '
+                                             'protected_method, constructor, field, constant or nested_class')
+    query_parser.add_argument('--class', dest='class_name', help='[Optional] Name of the class of members')
+    query_parser.add_argument('--returns', help='[Optional] Return type of methods')
+    query_parser.add_argument('--type', help='[Optional] Type of fields, constants and nested classes')
+    query_parser.add_argument('--param', help='[Optional] Type of any parameter')
+    query_parser.add_argument('--api_level', type=_api_level,
+                              help='[Optional] Api level the entry was added in, e.g. 26, 26: or 21:25')
+    query_parser.add_argument('--limit', type=int, default=50, help='[Optional] Maximum number of results')
+    query_parser.add_argument('--json', action='store_true', default=False, help='[Optional] Print JSON lines')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        index_path = args.index_path or os.path.join(args.save_path, 'index')
+        start = time.time()
+        count = build(args.save_path, index_path)
+        print('Indexed %d documents in %.1fs' % (count, time.time() - start))
+    else:
+        start = time.perf_counter()
+        index = SearchIndex(args.index_path)
+        results = index.search(' '.join(args.text), limit=args.limit, name=args.name, kind=args.kind,
+                               returns=args.returns, type=args.type, param=args.param,
+                               api_level=args.api_level, **{'class': args.class_name})
+        elapsed = time.perf_counter() - start
+        for entry in results:
+            print(json.dumps(entry) if args.json else _format(entry))
+        if not args.json:
+            print('%d results in %.1f ms' % (len(results), elapsed * 1000))
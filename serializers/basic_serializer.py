@@ -1,14 +1,14 @@
 from serializers.document_serializer import DocumentSerializer
-import json
+from documentation import iter_json
 
 class BasicSerializer(DocumentSerializer):
     """
     A basic serializer. Saves everything as JSON
     """
-    def __init__(self, url, documentation_parser, save_path=''):
-        super(BasicSerializer, self).__init__(url, documentation_parser, 'json', save_path=save_path)
+    def __init__(self, url, documentation_parser, save_path='', sink=None):
+        super(BasicSerializer, self).__init__(url, documentation_parser, 'json', save_path=save_path, sink=sink)
 
-    def convert(self, doc, url, fname):
+    def convert_iter(self, doc, url, fname):
         content = {
             'name': doc.name,
             'url': url,
@@ -26,4 +26,4 @@ class BasicSerializer(DocumentSerializer):
 
         }
 
-        return json.dumps(content)
\ No newline at end of file
+        return iter_json(content)
\ No newline at end of file
@@ -1,34 +1,79 @@
+from sinks.file_sink import FileSink
+from metrics import metrics
 from urllib.parse import urlparse
 import os
+import time
 
 
 class DocumentSerializer(object):
     """
     Base class for document serializers
     """
-    def __init__(self, url, documentation_parser, file_ext, save_path=''):
+    def __init__(self, url, documentation_parser, file_ext, save_path='', sink=None):
         self._parser = documentation_parser
         self._url = url
         self._file_ext = file_ext
         self._save_path = save_path
+        self._sink = sink or FileSink(save_path)
 
     def _create_path(self):
         p = urlparse(self._url)
         reldir, html_filename = os.path.split(p.path)
-        dir = os.path.join(self._save_path, reldir[1:])
-        os.makedirs(dir, exist_ok=True)
         fname, ext = os.path.splitext(html_filename)
+        # Canonical urls drop index.html, the document keeps its name
+        if not fname:
+            fname = 'index'
 
-        path = os.path.join(dir, fname + '.' + self._file_ext)
+        path = os.path.join(reldir[1:], fname + '.' + self._file_ext)
         return path, fname
     
+    @classmethod
+    def output_path(cls, url):
+        """
+        Path relative to the save path that the document of url is saved under
+        """
+        return cls(url, None)._create_path()[0]
+
+    # Serializers implement either convert or convert_iter
     def convert(self, doc, url, fname):
-        raise NotImplementedError()
+        return ''.join(self.convert_iter(doc, url, fname))
+
+    def convert_iter(self, doc, url, fname):
+        """
+        Yields the serialized document in chunks. Serializers that implement it write
+        to the sink as they go instead of building the whole document first
+        """
+        yield self.convert(doc, url, fname)
 
     def save(self):
         path, fname = self._create_path()
-        text = self.convert(self._parser.documentation, self._url, fname)
-        if len(text.strip()) > 10:
-            with open(path, 'w') as fp:
-                fp.write(text)
+        chunks = iter(self.convert_iter(self._parser.documentation, self._url, fname))
+
+        # Hold back the first chunks until it is clear the document isn't empty
+        start = time.perf_counter()
+        head = []
+        for chunk in chunks:
+            head.append(chunk)
+            if len(''.join(head).strip()) > 10:
+                break
+        else:
+            metrics.add_time('serialize', time.perf_counter() - start)
+            return
+        head_time = time.perf_counter() - start
+        serialize_time = [head_time]
+
+        def rest():
+            yield from head
+            while True:
+                chunk_start = time.perf_counter()
+                chunk = next(chunks, None)
+                serialize_time[0] += time.perf_counter() - chunk_start
+                if chunk is None:
+                    return
+                yield chunk
 
+        # Serializing continues while the sink writes, so take it out of the write time
+        start = time.perf_counter()
+        self._sink.write_chunks(self._url, path, rest())
+        metrics.add_time('serialize', serialize_time[0])
+        metrics.add_time('write', time.perf_counter() - start - (serialize_time[0] - head_time))
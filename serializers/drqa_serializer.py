@@ -8,57 +8,53 @@ class DrQASerializer(DocumentSerializer):
     """
     A serializer that saves documents in a format compatible with Facebook's DrQA system
     """
-    def __init__(self, url, documentation_parser, save_path=''):
-        super(DrQASerializer, self).__init__(url, documentation_parser, 'txt', save_path=save_path)
+    def __init__(self, url, documentation_parser, save_path='', sink=None):
+        super(DrQASerializer, self).__init__(url, documentation_parser, 'txt', save_path=save_path, sink=sink)
 
-    def convert(self, doc, url, fname):
+    def convert_iter(self, doc, url, fname):
         path = urlparse(url).path
+        if path.endswith('/'):
+            path += 'index'
         path, _ = os.path.splitext(path)
 
         name = re.sub(r'/', '.', path)
 
         prefix = name[1:] #doc.name or fname
-        contents = []
+        sections = []
+
+        def summary_text(items):
+            return items
+
+        def value_text(items):
+            return [item.name + ' is ' + item.description for item in items]
+
+        def method_text(items):
+            return [item.name + ' ' + item.description for item in items]
 
         if doc.summary:
-            summary = {
-                "id": prefix + ' Summary',
-                "url": url,
-                "text": '\n'.join(doc.summary)
-            }
-            contents.append(json.dumps(summary))
-        
-        def add_value_text(items, header):
-            items_text = [item['name'] + ' is ' + item['description'] for item in items]
-            item_dict = {
-                "id": prefix + ' ' + header,
-                "url": url,
-                "text": '\n'.join(items_text)
-            }
-            contents.append(json.dumps(item_dict))
+            sections.append(('Summary', doc.summary, summary_text))
 
-        def add_method_text(items, header):
-            items_text = [item['name'] + ' ' + item['description'] for item in items]
-            item_dict = {
-                "id": prefix + ' ' + header,
-                "url": url,
-                "text": '\n'.join(items_text)
-            }
-            contents.append(json.dumps(item_dict))
-        
         if doc.constants:
-            add_value_text(doc.constants, 'Constants')
+            sections.append(('Constants', doc.constants, value_text))
 
         if doc.fields:
-            add_value_text(doc.fields, 'Fields')
+            sections.append(('Fields', doc.fields, value_text))
 
         if doc.constructors:
-            add_method_text(doc.constructors, 'Constructors')
-        
+            sections.append(('Constructors', doc.constructors, method_text))
+
         if doc.public_methods:
-            add_method_text(doc.public_methods, 'Public methods')
+            sections.append(('Public methods', doc.public_methods, method_text))
 
         if doc.protected_methods is not None:
-            add_method_text(doc.protected_methods, "Protected methods")
+            sections.append(('Protected methods', doc.protected_methods, method_text))
 
-        return '\n'.join(contents)
\ No newline at end of file
+        # One JSON line per section, each encoded only when the sink is ready for it
+        for i, (header, items, to_text) in enumerate(sections):
+            if i > 0:
+                yield '\n'
+            yield json.dumps({
+                "id": prefix + ' ' + header,
+                "url": url,
+                "text": '\n'.join(to_text(items))
+            })
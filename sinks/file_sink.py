@@ -0,0 +1,25 @@
+from sinks.sink import Sink
+import os
+
+
+class FileSink(Sink):
+    """
+    Writes every document to its own file, mirroring the url path
+    """
+    @classmethod
+    def remove(cls, save_path, documents, **options):
+        for url, path in documents:
+            try:
+                os.remove(os.path.join(save_path, path))
+            except FileNotFoundError:
+                pass
+
+    def write(self, url, path, text):
+        self.write_chunks(url, path, (text,))
+
+    def write_chunks(self, url, path, chunks):
+        path = os.path.join(self._save_path, path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as fp:
+            fp.writelines(chunks)
@@ -0,0 +1,167 @@
+from sinks.sink import Sink
+import glob
+import gzip
+import os
+import re
+import time
+
+
+def _get_codec(compression):
+    if compression == 'gzip':
+        return gzip.compress, gzip.decompress, '.gz'
+    elif compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor().compress, zstandard.ZstdDecompressor().decompress, '.zst'
+    return None, None, ''
+
+
+class ShardSink(Sink):
+    """
+    Appends documents as JSON lines to rotating, size bounded shard files under
+    save_path/shards. Every document is indexed by url with the shard, offset and length
+    of its record and when it was written, so it can be read back without a scan. With compression every record
+    is a separate gzip member or zstd frame, which keeps each shard a valid compressed
+    file
+    """
+    def __init__(self, save_path, worker_id=0, shard_size=64 * 1024 * 1024, compression=None,
+                 buffer_size=1024 * 1024):
+        super(ShardSink, self).__init__(save_path, worker_id)
+        self._dir = os.path.join(save_path, 'shards')
+        os.makedirs(self._dir, exist_ok=True)
+        self._compress, _, self._ext = _get_codec(compression)
+        self._shard_size = shard_size
+        self._buffer_size = buffer_size
+
+        # Continue after the shards of earlier runs instead of overwriting them
+        prefix = 'part-%03d-' % worker_id
+        numbers = [int(m.group(1)) for m in
+                   (re.match(re.escape(prefix) + r'(\d+)', os.path.basename(p))
+                    for p in glob.glob(os.path.join(self._dir, prefix + '*')))
+                   if m]
+        self._shard_number = max(numbers) if numbers else -1
+        self._shard_name = None
+        self._shard_file = None
+        self._shard_offset = 0
+        self._index_file = open(os.path.join(self._dir, 'index-%03d.tsv' % worker_id), 'a')
+
+        self._buffer = []
+        self._buffered = 0
+        self._index = []
+
+    @classmethod
+    def saved_urls(cls, save_path, **options):
+        return set(ShardReader(save_path).urls())
+
+    @classmethod
+    def remove(cls, save_path, documents, **options):
+        # Records stay in their shards until they are rewritten, only the index forgets them
+        urls = set(url for url, path in documents)
+        for index_path in glob.glob(os.path.join(save_path, 'shards', 'index-*.tsv')):
+            with open(index_path) as fp:
+                lines = fp.readlines()
+            kept = [line for line in lines if line.split('\t', 1)[0] not in urls]
+            if len(kept) < len(lines):
+                with open(index_path + '.tmp', 'w') as fp:
+                    fp.writelines(kept)
+                os.replace(index_path + '.tmp', index_path)
+
+    def _rotate(self):
+        self.flush()
+        if self._shard_file:
+            self._shard_file.close()
+        self._shard_number += 1
+        self._shard_name = 'part-%03d-%05d.jsonl%s' % (self._worker_id, self._shard_number, self._ext)
+        self._shard_file = open(os.path.join(self._dir, self._shard_name), 'wb')
+        self._shard_offset = 0
+
+    def write(self, url, path, text):
+        data = (text.rstrip('\n') + '\n').encode('utf-8')
+        if self._compress:
+            data = self._compress(data)
+
+        if self._shard_file is None or (self._shard_offset > 0 and
+                                        self._shard_offset + len(data) > self._shard_size):
+            self._rotate()
+
+        self._buffer.append(data)
+        self._index.append('%s\t%s\t%d\t%d\t%.6f\n' % (url, self._shard_name, self._shard_offset, len(data),
+                                                        time.time()))
+        self._shard_offset += len(data)
+        self._buffered += len(data)
+        if self._buffered >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        # Data goes out before the index so the index never points past the end of a shard
+        self._shard_file.write(b''.join(self._buffer))
+        self._shard_file.flush()
+        self._index_file.write(''.join(self._index))
+        self._index_file.flush()
+        self._buffer = []
+        self._index = []
+        self._buffered = 0
+
+    def close(self):
+        self.flush()
+        if self._shard_file:
+            self._shard_file.close()
+            self._shard_file = None
+        self._index_file.close()
+
+
+class ShardReader(object):
+    """
+    Reads back documents written by ShardSink. A url written more than once, by any
+    worker in any run, resolves to the record written last
+    """
+    def __init__(self, save_path):
+        self._dir = os.path.join(save_path, 'shards')
+        self._index = {}
+        written = {}
+        for index_path in sorted(glob.glob(os.path.join(self._dir, 'index-*.tsv'))):
+            with open(index_path) as fp:
+                for line in fp:
+                    # Skip a line cut short by a crash
+                    if not line.endswith('\n'):
+                        continue
+                    url, shard, offset, length, when = line.rstrip('\n').split('\t')
+                    when = float(when)
+                    if when >= written.get(url, when):
+                        self._index[url] = (shard, int(offset), int(length))
+                        written[url] = when
+
+    def _decompress(self, shard, data):
+        if shard.endswith('.gz'):
+            return _get_codec('gzip')[1](data)
+        elif shard.endswith('.zst'):
+            return _get_codec('zstd')[1](data)
+        return data
+
+    def get(self, url):
+        shard, offset, length = self._index[url]
+        with open(os.path.join(self._dir, shard), 'rb') as fp:
+            fp.seek(offset)
+            data = fp.read(length)
+        return self._decompress(shard, data).decode('utf-8')
+
+    def urls(self):
+        return list(self._index)
+
+    def __iter__(self):
+        # Read in shard order so every shard is opened once and read sequentially
+        entries = sorted(self._index.items(), key=lambda item: item[1])
+        fp, cur_shard = None, None
+        for url, (shard, offset, length) in entries:
+            if shard != cur_shard:
+                if fp:
+                    fp.close()
+                fp, cur_shard = open(os.path.join(self._dir, shard), 'rb'), shard
+            fp.seek(offset)
+            yield url, self._decompress(shard, fp.read(length)).decode('utf-8')
+        if fp:
+            fp.close()
+
+    def __len__(self):
+        return len(self._index)
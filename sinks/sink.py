@@ -0,0 +1,50 @@
+class Sink(object):
+    """
+    Base class for output sinks. A worker creates one sink and every serializer it
+    runs writes through it
+    """
+    def __init__(self, save_path, worker_id=0):
+        self._save_path = save_path
+        self._worker_id = worker_id
+
+    @classmethod
+    def start_writer(cls, save_path, **options):
+        """
+        Called once in the main process before any sink is created. Sinks that funnel
+        the documents of all workers through a single writer start it here and return
+        it. Its sink_options are added to the options of every sink, and it is closed
+        once all sinks are. None if every sink writes on its own
+        """
+        return None
+
+    @classmethod
+    def saved_urls(cls, save_path, **options):
+        """
+        Urls of the documents that have reached storage. None if every write is
+        durable once it returns
+        """
+        return None
+
+    @classmethod
+    def remove(cls, save_path, documents, **options):
+        """
+        Deletes the stored documents of the (url, path) pairs in documents, e.g. of
+        classes gone from the site. Only called while no sink is open
+        """
+        raise NotImplementedError()
+
+    def write(self, url, path, text):
+        """
+        Stores the serialized text of url. path is the relative path the document
+        would have in a one-file-per-class layout
+        """
+        raise NotImplementedError()
+
+    def write_chunks(self, url, path, chunks):
+        """
+        Like write, with the text given as an iterable of strings
+        """
+        self.write(url, path, ''.join(chunks))
+
+    def close(self):
+        pass
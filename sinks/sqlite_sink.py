@@ -0,0 +1,157 @@
+from sinks.sink import Sink
+import json
+import multiprocessing as mp
+import os
+import queue
+import sqlite3
+import time
+
+
+def _default_db_path(save_path):
+    return os.path.join(save_path, 'docs.db')
+
+
+def _connect(db_path):
+    if os.path.dirname(db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    db = sqlite3.connect(db_path, isolation_level=None)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    # The table DrQA's retriever reads, with the url every record came from
+    db.execute('CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, text TEXT, url TEXT)')
+    db.execute('CREATE INDEX IF NOT EXISTS documents_url ON documents (url)')
+    return db
+
+
+def _records(url, text):
+    """
+    Splits a serialized document into (id, text) records. DrQA output is a JSON line
+    per record, anything else is stored whole under its url
+    """
+    records = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            records.append((record['id'], record['text']))
+        except (ValueError, KeyError, TypeError):
+            return [(url, text)]
+    return records
+
+
+def _upsert(db, url, records):
+    # Only records whose text changed are written, and sections a class lost go away
+    db.executemany('INSERT INTO documents VALUES (?, ?, ?) ON CONFLICT (id) DO UPDATE '
+                   'SET text = excluded.text, url = excluded.url '
+                   'WHERE text IS NOT excluded.text OR url IS NOT excluded.url',
+                   [(id, text, url) for id, text in records])
+    db.execute('DELETE FROM documents WHERE url = ? AND id NOT IN (%s)' % ','.join('?' * len(records)),
+               [url] + [id for id, _ in records])
+
+
+def _write_loop(db_path, documents, batch_size, commit_interval):
+    db = _connect(db_path)
+    batch = []
+    last_commit = time.time()
+    while True:
+        try:
+            document = documents.get(timeout=commit_interval)
+        except queue.Empty:
+            document = False
+        if document:
+            batch.append(document)
+        if batch and (document is None or len(batch) >= batch_size or
+                      time.time() - last_commit >= commit_interval):
+            db.execute('BEGIN')
+            for url, records in batch:
+                _upsert(db, url, records)
+            db.execute('COMMIT')
+            batch = []
+            last_commit = time.time()
+        if document is None:
+            break
+    db.close()
+
+
+class SqliteWriter(object):
+    """
+    Process that owns the documents database and writes what the sinks of all workers
+    send it, in transactions of up to batch_size documents or commit_interval seconds
+    """
+    def __init__(self, db_path, batch_size=1000, commit_interval=1.0, max_pending=10000):
+        self._documents = mp.Queue(max_pending)
+        self._process = mp.Process(target=_write_loop,
+                                   args=(db_path, self._documents, batch_size, commit_interval))
+        self._process.daemon = True
+        self._process.start()
+        self.sink_options = {'documents': self._documents}
+
+    def close(self):
+        self._documents.put(None)
+        self._process.join()
+
+
+class SqliteSink(Sink):
+    """
+    Stores documents in a sqlite database ready for DrQA's retriever, one row per
+    record keyed by id. Records are upserted, so a crawl over an existing database
+    only rewrites classes that changed. All sinks send their documents to a single
+    SqliteWriter so workers never wait on each other's locks
+    """
+    def __init__(self, save_path, worker_id=0, db_path=None, documents=None, batch_size=1000):
+        super(SqliteSink, self).__init__(save_path, worker_id)
+        # Without a shared writer, e.g. when used on its own, the sink writes itself
+        self._db = None
+        self._documents = documents
+        if documents is None:
+            self._db = _connect(db_path or _default_db_path(save_path))
+            self._db.execute('BEGIN')
+            self._batch_size = batch_size
+            self._batched = 0
+
+    @classmethod
+    def start_writer(cls, save_path, db_path=None, batch_size=1000, **options):
+        return SqliteWriter(db_path or _default_db_path(save_path), batch_size)
+
+    @classmethod
+    def saved_urls(cls, save_path, db_path=None, **options):
+        db_path = db_path or _default_db_path(save_path)
+        if not os.path.exists(db_path):
+            return set()
+        db = _connect(db_path)
+        try:
+            return set(url for (url,) in db.execute('SELECT DISTINCT url FROM documents'))
+        finally:
+            db.close()
+
+    @classmethod
+    def remove(cls, save_path, documents, db_path=None, **options):
+        db_path = db_path or _default_db_path(save_path)
+        if not os.path.exists(db_path):
+            return
+        db = _connect(db_path)
+        try:
+            db.execute('BEGIN')
+            db.executemany('DELETE FROM documents WHERE url = ?', ((url,) for url, path in documents))
+            db.execute('COMMIT')
+        finally:
+            db.close()
+
+    def write(self, url, path, text):
+        records = _records(url, text)
+        if self._documents is not None:
+            self._documents.put((url, records))
+            return
+        _upsert(self._db, url, records)
+        self._batched += 1
+        if self._batched >= self._batch_size:
+            self._db.execute('COMMIT')
+            self._db.execute('BEGIN')
+            self._batched = 0
+
+    def close(self):
+        if self._db:
+            self._db.execute('COMMIT')
+            self._db.close()
+            self._db = None
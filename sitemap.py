@@ -0,0 +1,110 @@
+from urllib.parse import urldefrag, urljoin
+import gzip
+import hashlib
+import os
+import re
+import sqlite3
+import time
+import xml.etree.ElementTree as ElementTree
+
+_ROW = re.compile(rb'<tr\b.*?</tr>', re.S | re.I)
+_HREF = re.compile(rb'<a\s[^>]*?href\s*=\s*["\']([^"\']+)["\']', re.I)
+
+
+def _local_name(tag):
+    return tag.rpartition('}')[2]
+
+
+def _child_text(element, name):
+    for child in element:
+        if _local_name(child.tag) == name:
+            return (child.text or '').strip() or None
+    return None
+
+
+def _listing_entries(url, body):
+    # Every row of a class listing links its class and describes it, a row that changes
+    # changes its version
+    for row in _ROW.findall(body):
+        m = _HREF.search(row)
+        if m:
+            link = urldefrag(urljoin(url, m.group(1).decode('utf-8', 'replace')))[0]
+            yield link, hashlib.sha1(b' '.join(row.split())).hexdigest()
+
+
+def read_site_index(url, fetcher):
+    """
+    Returns {url: version} for the pages listed by the site index at url: a
+    sitemap.xml, gzipped or not, where the version is lastmod, a sitemap index of
+    those, or an HTML listing like classes.html, where the version is a hash of the
+    table row of the page. Pages without a version are only new or removed, never
+    changed
+    """
+    body = fetcher.fetch(url).body
+    if body[:2] == b'\x1f\x8b':
+        body = gzip.decompress(body)
+    if not re.match(rb'\s*(<\?xml|<urlset|<sitemapindex)', body):
+        return dict(_listing_entries(url, body))
+
+    entries = {}
+    root = ElementTree.fromstring(body)
+    for element in root:
+        loc = _child_text(element, 'loc')
+        if not loc:
+            continue
+        if _local_name(root.tag) == 'sitemapindex':
+            entries.update(read_site_index(loc, fetcher))
+        else:
+            entries[urldefrag(loc)[0]] = _child_text(element, 'lastmod')
+    return entries
+
+
+class Manifest(object):
+    """
+    Pages of the site index as of the last refresh, with the version each was crawled
+    at and when. Kept in sqlite next to the output and committed every commit_interval
+    seconds
+    """
+    def __init__(self, path, commit_interval=1.0):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, version TEXT, '
+                         'checked REAL) WITHOUT ROWID')
+        self._db.commit()
+        self._commit_interval = commit_interval
+        self._last_commit = time.time()
+
+    def diff(self, entries, revalidate_after=0):
+        """
+        Compares the {url: version} of a site index to the manifest. Returns the urls
+        that are new or changed, in the order of the index, the urls crawled more than
+        revalidate_after seconds ago whatever their version, if it's set, and the urls
+        no longer listed
+        """
+        pages = dict((url, (version, checked)) for url, version, checked in
+                     self._db.execute('SELECT url, version, checked FROM pages'))
+        changed = [url for url, version in entries.items() if url not in pages or pages[url][0] != version]
+        stale = []
+        if revalidate_after:
+            changed_set = set(changed)
+            before = time.time() - revalidate_after
+            stale = [url for url in entries if url not in changed_set and pages[url][1] < before]
+        removed = [url for url in pages if url not in entries]
+        return changed, stale, removed
+
+    def update(self, url, version):
+        self._db.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?)', (url, version, time.time()))
+        if time.time() - self._last_commit >= self._commit_interval:
+            self._db.commit()
+            self._last_commit = time.time()
+
+    def remove(self, urls):
+        self._db.executemany('DELETE FROM pages WHERE url = ?', ((url,) for url in urls))
+        self._db.commit()
+
+    def close(self):
+        self._db.commit()
+        self._db.close()
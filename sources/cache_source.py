@@ -0,0 +1,28 @@
+from sources.source import PageSource
+from fetchers.http_cache import HttpCache
+
+
+class CacheSource(PageSource):
+    """
+    Pages recorded by a crawl in the page cache of --cache_path
+    """
+    def __init__(self, path, base_url=''):
+        super(CacheSource, self).__init__(path, base_url)
+        self._cache = None
+
+    def keys(self):
+        cache = HttpCache(self._path)
+        try:
+            for url in cache.urls():
+                yield url
+        finally:
+            cache.close()
+
+    def read(self, key):
+        if self._cache is None:
+            self._cache = HttpCache(self._path)
+        return key, self._cache.get_body(key)
+
+    def close(self):
+        if self._cache:
+            self._cache.close()
@@ -0,0 +1,20 @@
+from sources.source import PageSource
+import os
+
+
+class DirectorySource(PageSource):
+    """
+    Html files saved under a directory. The url of a page is base_url followed by the
+    path of its file relative to the directory
+    """
+    def keys(self):
+        for root, dirs, files in os.walk(self._path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(('.html', '.htm')):
+                    yield os.path.relpath(os.path.join(root, name), self._path)
+
+    def read(self, key):
+        with open(os.path.join(self._path, key), 'rb') as fp:
+            body = fp.read()
+        return '%s/%s' % (self._base_url, key.replace(os.sep, '/')), body
@@ -0,0 +1,22 @@
+class PageSource(object):
+    """
+    Base class for stored pages to parse offline. keys runs in the main process and
+    yields a small picklable key for every page, read runs in the pool workers and
+    turns a key into the url and body of the page, so bodies don't have to travel
+    between processes when the source can be read from anywhere
+    """
+    def __init__(self, path, base_url=''):
+        self._path = path
+        self._base_url = base_url.rstrip('/')
+
+    def keys(self):
+        raise NotImplementedError()
+
+    def read(self, key):
+        """
+        Returns (url, body) of the page for key
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        pass
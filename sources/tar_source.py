@@ -0,0 +1,44 @@
+from sources.source import PageSource
+import tarfile
+
+
+class TarSource(PageSource):
+    """
+    Html files in a tar archive, urls are formed like DirectorySource does. Members of
+    an uncompressed archive are read by offset in the workers. A compressed archive can
+    only be read front to back, so its bodies are read in the main process and sent
+    along with the keys
+    """
+    def __init__(self, path, base_url=''):
+        super(TarSource, self).__init__(path, base_url)
+        self._file = None
+
+    def _url(self, name):
+        return '%s/%s' % (self._base_url, name[2:] if name.startswith('./') else name)
+
+    def keys(self):
+        try:
+            archive, compressed = tarfile.open(self._path, 'r:'), False
+        except tarfile.ReadError:
+            archive, compressed = tarfile.open(self._path, 'r:*'), True
+        with archive:
+            for member in archive:
+                if not member.isfile() or not member.name.endswith(('.html', '.htm')):
+                    continue
+                if not compressed:
+                    yield (self._url(member.name), member.offset_data, member.size)
+                else:
+                    yield (self._url(member.name), archive.extractfile(member).read())
+
+    def read(self, key):
+        if len(key) == 2:
+            return key
+        url, offset, size = key
+        if self._file is None:
+            self._file = open(self._path, 'rb')
+        self._file.seek(offset)
+        return url, self._file.read(size)
+
+    def close(self):
+        if self._file:
+            self._file.close()
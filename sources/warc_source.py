@@ -0,0 +1,16 @@
+from sources.source import PageSource
+from warc import WarcReader, read_record
+
+
+class WarcSource(PageSource):
+    """
+    Responses archived in WARC files, a single file or a directory written with
+    --warc_path. Only the latest successful response of every url is read
+    """
+    def keys(self):
+        for url, path, offset, length, status in WarcReader(self._path).entries(successful=True):
+            yield (path, offset, length)
+
+    def read(self, key):
+        response = read_record(*key)
+        return response.url, response.body
@@ -0,0 +1,230 @@
+from multiprocessing.connection import wait
+import collections
+import multiprocessing as mp
+import os
+import threading
+import time
+
+from checkpoint import FAILED
+from metrics import metrics
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def process_rss(pid):
+    """
+    Resident memory of process pid in bytes, 0 where /proc isn't there to tell
+    """
+    try:
+        with open('/proc/%d/statm' % pid) as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class ResultSender(object):
+    """
+    Sends the results of a worker back to its supervisor. The worker and its write
+    threads share it
+    """
+    def __init__(self, connection):
+        self._connection = connection
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        with self._lock:
+            self._connection.send(item)
+
+
+class _Worker(object):
+    def __init__(self, id, process, tasks, results, state):
+        self.id = id
+        self.process = process
+        self.tasks = tasks
+        self.results = results
+        # Number of the task the worker is on and when it started it, 0 while it waits
+        self.state = state
+        # {seq: (url, task)} of the tasks handed to it and not reported yet
+        self.pending = {}
+        self.seqs = {}
+        self.pages = 0
+        # Retiring workers get no new tasks, a replacement already took their place
+        self.retiring = False
+        self.reason = None
+
+
+class WorkerSupervisor(object):
+    """
+    Runs num_workers processes of target(id, tasks, results, state, *args) and hands
+    them tasks. Every worker has a task queue and a result pipe of its own, so the
+    supervisor knows what each one holds and a worker killed halfway through a send
+    breaks nobody else's. A worker that spends more than page_timeout seconds on a task,
+    or grows past twice max_memory bytes, is killed. One past max_memory, or that did
+    max_pages tasks, is recycled: it finishes what it holds and exits while a fresh
+    worker takes its place. Tasks of a worker that died go to the others, and the task
+    it died on counts an attempt. After max_attempts its url is reported FAILED and
+    written to quarantine_path
+    """
+    def __init__(self, target, args, num_workers, page_timeout=300, max_pages=0, max_memory=0, max_attempts=3,
+                 quarantine_path=None, check_interval=1.0):
+        self._target = target
+        self._args = tuple(args)
+        self._page_timeout = page_timeout
+        self._max_pages = max_pages
+        self._max_memory = max_memory
+        self._max_attempts = max_attempts
+        self._quarantine_path = quarantine_path
+        self._check_interval = check_interval
+        self._last_check = time.time()
+        # Fetch threads hand over tasks while the main thread gets results
+        self._lock = threading.RLock()
+        self._next_id = 0
+        self._next_seq = 1
+        self._attempts = {}
+        self._ready = collections.deque()
+        self._closing = False
+        self._workers = []
+        for _ in range(num_workers):
+            self._spawn()
+
+    def _spawn(self):
+        id = self._next_id
+        self._next_id += 1
+        tasks = mp.Queue()
+        results, sender = mp.Pipe(duplex=False)
+        state = mp.RawArray('d', 2)
+        process = mp.Process(target=self._target, args=(id, tasks, sender, state) + self._args)
+        process.daemon = True
+        process.start()
+        # The pipe only reports the end of the worker once no process holds its sending end
+        sender.close()
+        worker = _Worker(id, process, tasks, results, state)
+        self._workers.append(worker)
+        return worker
+
+    def _submit(self, url, task):
+        worker = min((w for w in self._workers if not w.retiring), key=lambda w: len(w.pending))
+        seq = self._next_seq
+        self._next_seq += 1
+        worker.pending[seq] = (url, task)
+        worker.seqs[url] = seq
+        worker.tasks.put((seq, task))
+
+    def submit(self, url, task):
+        """
+        Hands task, the work on url, to the worker holding the fewest
+        """
+        with self._lock:
+            self._submit(url, task)
+
+    def _retire(self, worker, reason, kill=False):
+        if not worker.retiring and not self._closing:
+            self._spawn()
+        worker.retiring = True
+        if kill:
+            worker.reason = reason
+            worker.process.kill()
+        else:
+            worker.tasks.put(None)
+        print('Worker %d %s after %d pages: %s' % (worker.id, 'killed' if kill else 'recycled', worker.pages, reason))
+
+    def _quarantine(self, url, reason):
+        attempts = self._attempts.pop(url)
+        print('Quarantined %s after %d attempts: %s' % (url, attempts, reason))
+        metrics.incr('quarantined')
+        if self._quarantine_path:
+            with open(self._quarantine_path, 'a') as f:
+                f.write('%s\t%d\t%s\n' % (url, attempts, reason))
+        self._ready.append((url, [], FAILED, ({}, {}, {})))
+
+    def _exited(self, worker):
+        worker.process.join()
+        worker.results.close()
+        worker.tasks.cancel_join_thread()
+        worker.tasks.close()
+        self._workers.remove(worker)
+        if self._closing:
+            return
+        if not worker.retiring:
+            self._spawn()
+        if not worker.pending:
+            return
+
+        metrics.incr('worker_restarts')
+        # The task it was on is to blame, or else the oldest one it held, which its write
+        # stage was saving
+        reason = worker.reason or 'exit code %s' % worker.process.exitcode
+        culprit = int(worker.state[0]) if worker.state[1] else min(worker.pending)
+        print('Worker %d died with %d pages: %s' % (worker.id, len(worker.pending), reason))
+        for seq, (url, task) in sorted(worker.pending.items()):
+            if seq == culprit:
+                self._attempts[url] = self._attempts.get(url, 0) + 1
+                if self._attempts[url] >= self._max_attempts:
+                    self._quarantine(url, reason)
+                    continue
+            self._submit(url, task)
+
+    def _receive(self, worker):
+        try:
+            result = worker.results.recv()
+        except (EOFError, OSError):
+            self._exited(worker)
+            return
+        url = result[0]
+        worker.pending.pop(worker.seqs.pop(url, None), None)
+        self._attempts.pop(url, None)
+        worker.pages += 1
+        self._ready.append(result)
+        if self._max_pages and worker.pages >= self._max_pages and not worker.retiring:
+            self._retire(worker, 'page limit')
+
+    def _check(self):
+        now = self._last_check = time.time()
+        for worker in list(self._workers):
+            if worker.reason:
+                continue
+            started = worker.state[1]
+            if self._page_timeout and started and now - started > self._page_timeout:
+                metrics.incr('page_timeouts')
+                self._retire(worker, 'page timeout', kill=True)
+                continue
+            rss = process_rss(worker.process.pid) if self._max_memory else 0
+            if rss > 2 * self._max_memory:
+                self._retire(worker, 'memory %d MB' % (rss // 2 ** 20), kill=True)
+            elif rss > self._max_memory and not worker.retiring:
+                self._retire(worker, 'memory %d MB' % (rss // 2 ** 20))
+
+    def _poll(self):
+        with self._lock:
+            readers = {worker.results: worker for worker in self._workers}
+        for reader in wait(list(readers), self._check_interval):
+            with self._lock:
+                self._receive(readers[reader])
+        if time.time() - self._last_check >= self._check_interval:
+            with self._lock:
+                self._check()
+
+    def get(self):
+        """
+        Next (url, links, status, metrics) result of a worker
+        """
+        while True:
+            with self._lock:
+                if self._ready:
+                    return self._ready.popleft()
+            self._poll()
+
+    def close(self):
+        """
+        Stops the workers once they finished what they hold
+        """
+        with self._lock:
+            self._closing = True
+            for worker in self._workers:
+                if not worker.retiring:
+                    worker.tasks.put(None)
+                    worker.retiring = True
+        # Results are still read, a worker can't exit while it's blocked sending one
+        while self._workers:
+            self._poll()
+        self._ready.clear()
@@ -0,0 +1,79 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.replay_server import ReplayServer
+
+# Class pages of the corpus the tests crawl
+NUM_CLASSES = 12
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope='session')
+def corpus_server(tmp_path_factory):
+    """
+    Replay server of a small generated reference corpus
+    """
+    root = str(tmp_path_factory.mktemp('corpus'))
+    generate_corpus(root, num_classes=NUM_CLASSES, num_packages=2)
+    server = ReplayServer(root).start()
+    yield server
+    server.stop()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append((self.path, time.time()))
+        self.server.connections.add(self.client_address)
+        responses = self.server.responses.get(self.path) or [(404, {}, b'')]
+        response = responses.pop(0) if len(responses) > 1 else responses[0]
+        status, headers, body = response[:3]
+        time.sleep(response[3] if len(response) > 3 else self.server.delay)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    """
+    HTTP server answering every path with the (status, headers, body) responses
+    listed for it in responses, in turn and the last one from then on. Every request
+    is recorded in requests as (path, time) and the address it came from in
+    connections. delay holds back every response, a fourth item in a response holds
+    back that one
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    server.daemon_threads = True
+    server.responses = {}
+    server.requests = []
+    server.connections = set()
+    server.delay = 0.0
+    server.url = 'http://127.0.0.1:%d' % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
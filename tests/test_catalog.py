@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from analytics import stats
+from catalog.reader import read_table
+from catalog.writer import CatalogWriter, merge_catalog
+
+
+def _doc(name, methods):
+    return {'name': name, 'object_type': 'class', 'api_level': '1', 'parent_class': 'Object', 'summary': [name],
+            'public_methods': [{'name': m, 'description': '', 'api_level': '1', 'returns': {'type': 'void'},
+                                'params': {'value': {'type': 'int', 'description': ''}}} for m in methods]}
+
+
+def _url(name):
+    return 'http://docs.test/reference/android/app/%s.html' % name
+
+
+def _crawl(path, docs, format, removed=()):
+    # Every worker writes parts of its own, merged into the catalog at the end of the crawl
+    parts_path = path + '.parts'
+    for writer_id, (name, methods) in enumerate(docs):
+        writer = CatalogWriter(parts_path, writer_id, format=format, row_group_size=2)
+        writer.add(_doc(name, methods), _url(name))
+        writer.close()
+    merge_catalog(path, parts_path, format, [_url(name) for name in removed])
+
+
+def _methods(path):
+    table = read_table(path, 'methods', ['url', 'name']).to_pydict()
+    return sorted((os.path.basename(url), name) for url, name in zip(table['url'], table['name']))
+
+
+@pytest.mark.parametrize('format', ['parquet', 'arrow'])
+def test_merge_carries_over_unchanged_pages(tmp_path, format):
+    path = str(tmp_path / 'catalog')
+    _crawl(path, [('Activity', ['finish', 'recreate']), ('Fragment', ['getActivity']), ('Loader', ['reset'])],
+           format)
+    assert len(read_table(path, 'classes')) == 3
+
+    # Activity changed, Fragment was skipped as unchanged and Loader is gone
+    _crawl(path, [('Activity', ['finish', 'onCreate', 'recreate'])], format, removed=['Loader'])
+    assert sorted(read_table(path, 'classes', ['name']).column('name').to_pylist()) == ['Activity', 'Fragment']
+    assert _methods(path) == [('Activity.html', 'finish'), ('Activity.html', 'onCreate'),
+                              ('Activity.html', 'recreate'), ('Fragment.html', 'getActivity')]
+    assert len(read_table(path, 'parameters')) == 4
+    assert not os.path.exists(path + '.parts') and not os.path.exists(path + '.merge')
+
+    packages, api_levels = stats(path)
+    assert packages == {'android.app': (2, 4)}
+    assert api_levels == {'1': 4}
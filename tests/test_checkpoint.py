@@ -0,0 +1,55 @@
+import itertools
+
+from checkpoint import Checkpoint, FAILED, QUEUED, SAVED
+from conftest import NUM_CLASSES
+from parsers.android_ref_parser import AndroidDocParser
+from scraper import Scraper
+from serializers.basic_serializer import BasicSerializer
+
+
+def test_resume_picks_up_queued_urls(tmp_path):
+    path = str(tmp_path / 'crawl-state.db')
+    checkpoint = Checkpoint(path)
+    checkpoint.add(['http://docs.test/a.html'])
+    checkpoint.update('http://docs.test/a.html', SAVED, ['http://docs.test/b.html', 'http://docs.test/c.html'])
+    checkpoint.update('http://docs.test/b.html', FAILED, ['http://docs.test/a.html'])
+    checkpoint.close()
+
+    checkpoint = Checkpoint(path, resume=True)
+    seen, pending = checkpoint.load()
+    assert sorted(seen) == ['http://docs.test/a.html', 'http://docs.test/b.html', 'http://docs.test/c.html']
+    assert pending == ['http://docs.test/c.html']
+    # A saved document that never reached the sink is crawled again
+    assert sorted(checkpoint.load(saved_urls=set())[1]) == ['http://docs.test/a.html', 'http://docs.test/c.html']
+    checkpoint.close()
+
+    # Without resume the state of the last crawl is dropped
+    checkpoint = Checkpoint(path)
+    assert checkpoint.load() == ([], [])
+    checkpoint.close()
+
+
+def _scraper(corpus_server, tmp_path, resume):
+    return Scraper(corpus_server.url + '/reference/classes.html', AndroidDocParser, BasicSerializer,
+                   path_filters=['reference'], save_path=str(tmp_path / 'out'), num_workers=2,
+                   checkpoint_path=str(tmp_path / 'crawl-state.db'), resume=resume, progress_interval=0)
+
+
+def test_interrupted_crawl_resumes_where_it_stopped(corpus_server, tmp_path):
+    scraper = _scraper(corpus_server, tmp_path, resume=False)
+    crawl = scraper.start_scraping()
+    first = dict(itertools.islice(crawl, 5))
+    crawl.close()
+    scraper.close()
+
+    scraper = _scraper(corpus_server, tmp_path, resume=True)
+    try:
+        second = dict(scraper.start_scraping())
+    finally:
+        scraper.close()
+
+    assert len(first) == 5
+    assert not set(first) & set(second)
+    statuses = list(first.values()) + list(second.values())
+    assert statuses.count(SAVED) == NUM_CLASSES
+    assert QUEUED not in statuses
@@ -0,0 +1,142 @@
+from multiprocessing import Pipe
+import glob
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from checkpoint import FETCHED, SAVED
+from conftest import NUM_CLASSES, ROOT, free_port
+from distributed import Coordinator, RemoteScheduler, _Node
+
+AUTHKEY = 'test-secret'
+
+
+def _wait_for_port(port, timeout=10):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def test_links_come_with_the_result_they_were_found_on():
+    coordinator = Coordinator(['http://docs.test/reference/A.html'], authkey=AUTHKEY, partitions=2)
+    try:
+        coordinator._add(coordinator._start_urls)
+        node = _Node(None, 60)
+        assert coordinator._handle(node, ('lease', 8, [], []))[0] == ('urls', ['http://docs.test/reference/A.html'])
+        # The last leased page completes, the crawl goes on with the links it reported
+        reply, completed = coordinator._handle(node, ('lease', 8, [('http://docs.test/reference/A.html', SAVED)],
+                                                      ['http://docs.test/reference/B.html']))
+        assert completed == [('http://docs.test/reference/A.html', SAVED)]
+        assert reply == ('urls', ['http://docs.test/reference/B.html'])
+        assert not coordinator.done
+    finally:
+        coordinator.close()
+
+
+def test_nodes_crawl_every_page_once(corpus_server, tmp_path):
+    port = free_port()
+    start_url = corpus_server.url + '/reference/classes.html'
+    coordinator = subprocess.Popen([sys.executable, 'distributed.py', '--start_url', start_url,
+                                    '--listen', '127.0.0.1:%d' % port, '--save_path', str(tmp_path / 'coordinator'),
+                                    '--progress_interval', '0', '--lease_timeout', '10', '--authkey', AUTHKEY],
+                                   cwd=ROOT, stdout=subprocess.DEVNULL)
+    nodes = []
+    try:
+        _wait_for_port(port)
+        for i in range(2):
+            nodes.append(subprocess.Popen([sys.executable, 'scraper.py', '--coordinator', '127.0.0.1:%d' % port,
+                                           '--start_url', start_url, '--path_filters', 'reference',
+                                           '--save_path', str(tmp_path / ('node%d' % i)), '--num_workers', '1',
+                                           '--max_queued', '2', '--progress_interval', '0', '--authkey', AUTHKEY],
+                                          cwd=ROOT, stdout=subprocess.DEVNULL))
+        assert coordinator.wait(timeout=120) == 0
+        for node in nodes:
+            assert node.wait(timeout=60) == 0
+    finally:
+        for process in [coordinator] + nodes:
+            if process.poll() is None:
+                process.kill()
+
+    db = sqlite3.connect(str(tmp_path / 'coordinator' / 'crawl-state.db'))
+    statuses = dict(db.execute('SELECT status, COUNT(*) FROM urls GROUP BY status'))
+    db.close()
+    assert statuses.get(SAVED) == NUM_CLASSES
+    assert set(statuses) <= {FETCHED, SAVED}
+
+    saved = [os.path.relpath(path, str(tmp_path / ('node%d' % i)))
+             for i in range(2) for path in glob.glob(str(tmp_path / ('node%d' % i) / 'reference' / '**' / '*.json'),
+                                                      recursive=True)]
+    assert len(saved) == NUM_CLASSES == len(set(saved))
+
+
+def test_coordinator_needs_an_authkey(monkeypatch):
+    monkeypatch.delenv('DOC_SCRAPER_AUTHKEY', raising=False)
+    with pytest.raises(ValueError):
+        Coordinator(['http://docs.test/reference/A.html'], authkey=None)
+    result = subprocess.run([sys.executable, 'distributed.py', '--start_url', 'http://docs.test/reference/A.html'],
+                            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    assert result.returncode == 2
+    assert b'DOC_SCRAPER_AUTHKEY' in result.stderr
+
+
+def test_coordinator_outlives_nodes_that_die_or_stall():
+    port = free_port()
+    url = 'http://docs.test/reference/A.html'
+    coordinators = []
+    completed = []
+
+    def serve():
+        # Its partitions are sqlite files, used from the thread that made them
+        coordinator = Coordinator([url], ('127.0.0.1', port), AUTHKEY, partitions=1, lease_timeout=5,
+                                  progress_interval=0)
+        coordinators.append(coordinator)
+        try:
+            completed.extend(coordinator.serve())
+        finally:
+            coordinator.close()
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    stalled = None
+    try:
+        _wait_for_port(port)
+        coordinator = coordinators[0]
+        # A client that never answers the authentication challenge
+        stalled = socket.create_connection(('127.0.0.1', port))
+
+        # A node that dies between its lease request and the reply
+        dying, node_end = Pipe()
+
+        def broken_send(reply):
+            raise BrokenPipeError()
+        dying.send = broken_send
+        with coordinator._lock:
+            coordinator._new_connections.append(dying)
+        node_end.send(('lease', 8, [], []))
+        deadline = time.time() + 5
+        while not dying.closed and time.time() < deadline:
+            time.sleep(0.05)
+        assert dying.closed
+
+        # Another node still gets in, and takes over the url the dead one held
+        scheduler = RemoteScheduler(('127.0.0.1', port), AUTHKEY, lease_size=8)
+        assert scheduler.next_url() == url
+        scheduler.complete(url, SAVED)
+        assert scheduler.next_url() is None
+        scheduler.close()
+        thread.join(10)
+        assert completed == [(url, SAVED)]
+    finally:
+        if stalled:
+            stalled.close()
@@ -0,0 +1,181 @@
+import gzip
+import socket
+import threading
+import time
+
+import pytest
+
+from conftest import NUM_CLASSES
+from fetchers import fetcher
+from fetchers.async_fetcher import AsyncFetcher
+from fetchers.fetcher import FetchError
+from fetchers.rate_limiter import RateLimiter
+from fetchers.urllib_fetcher import UrllibFetcher
+
+
+def test_retry_after_holds_back_the_host(stub_server):
+    stub_server.responses['/page'] = [(429, {'Retry-After': '1'}, b''), (200, {}, b'page')]
+    limiter = RateLimiter(max_concurrency=8)
+    url = stub_server.url + '/page'
+
+    assert UrllibFetcher(rate_limiter=limiter).fetch(url).body == b'page'
+    (_, first), (_, second) = stub_server.requests
+    assert second - first >= 1.0
+    # The 429 halved the window and the success after it only grew it a little
+    assert limiter.window(url) < 5
+
+    # Until Retry-After runs out no request to the host goes out
+    limiter.block(url, 0.5)
+    assert limiter.reserve(stub_server.url + '/other') > 0.4
+
+
+def test_overload_backs_off_and_retries(stub_server, monkeypatch):
+    monkeypatch.setattr(fetcher, '_BASE_BACKOFF', 0.1)
+    stub_server.responses['/page'] = [(503, {}, b''), (502, {}, b''), (200, {}, b'page')]
+    limiter = RateLimiter()
+
+    assert UrllibFetcher(rate_limiter=limiter).fetch(stub_server.url + '/page').body == b'page'
+    times = [t for _, t in stub_server.requests]
+    assert len(times) == 3
+    # Full jitter waits at most the base backoff, doubled every attempt
+    assert times[1] - times[0] < 0.1 + 0.5
+    assert times[2] - times[1] < 0.2 + 0.5
+
+
+def test_gives_up_after_max_retries(stub_server, monkeypatch):
+    monkeypatch.setattr(fetcher, '_BASE_BACKOFF', 0.01)
+    stub_server.responses['/page'] = [(429, {}, b'')]
+
+    with pytest.raises(FetchError) as error:
+        UrllibFetcher(max_retries=2).fetch(stub_server.url + '/page')
+    assert error.value.status == 429
+    assert len(stub_server.requests) == 3
+
+
+def test_client_errors_are_not_retried(stub_server):
+    with pytest.raises(FetchError) as error:
+        UrllibFetcher().fetch(stub_server.url + '/missing')
+    assert error.value.status == 404
+    assert len(stub_server.requests) == 1
+
+
+def test_window_shrinks_when_latency_climbs():
+    limiter = RateLimiter(max_concurrency=8)
+    url = 'http://docs.test/page'
+    for _ in range(20):
+        assert limiter.reserve(url) == 0
+        limiter.release(url, 0.01, 200)
+    assert limiter.window(url) == 8
+    for _ in range(5):
+        assert limiter.reserve(url) == 0
+        limiter.release(url, 1.0, 200)
+    assert limiter.window(url) < 8
+
+
+def test_token_bucket_spaces_requests():
+    limiter = RateLimiter(rate=5)
+    url = 'http://docs.test/page'
+    start = time.time()
+    for _ in range(10):
+        limiter.acquire(url)
+        limiter.release(url, 0.0, 200)
+    # The bucket starts full, the other 5 requests wait for a token each
+    assert 0.8 < time.time() - start < 2.0
+
+
+def _fetch_all(fetcher, urls):
+    results = {}
+    done = threading.Event()
+
+    def callback(url, response, error):
+        results[url] = response or error
+        if len(results) == len(urls):
+            done.set()
+
+    fetcher.start(callback)
+    try:
+        for url in urls:
+            fetcher.submit(url)
+        assert done.wait(30)
+    finally:
+        fetcher.close()
+    return results
+
+
+def test_async_fetcher_downloads_the_corpus(corpus_server):
+    paths = ['/reference/classes.html'] + ['/reference/android/app/Class%d.html' % i
+                                           for i in range(NUM_CLASSES) if i % 2 == 0]
+    # Classes are spread over the packages
+    paths = [path for path in paths if corpus_server.load(path) is not None]
+    assert len(paths) > 3
+    urls = [corpus_server.url + path for path in paths]
+
+    results = _fetch_all(AsyncFetcher(max_inflight=4), urls)
+    for path, url in zip(paths, urls):
+        assert results[url].status == 200
+        assert results[url].body == corpus_server.load(path)
+
+
+def test_async_fetcher_reuses_connections(stub_server):
+    stub_server.delay = 0.01
+    for i in range(20):
+        stub_server.responses['/%d' % i] = [(200, {}, b'page %d' % i)]
+
+    results = _fetch_all(AsyncFetcher(max_inflight=2), [stub_server.url + '/%d' % i for i in range(20)])
+    assert [results[stub_server.url + '/%d' % i].body for i in range(20)] == [b'page %d' % i for i in range(20)]
+    assert len(stub_server.connections) <= 2
+
+
+def test_async_fetcher_follows_redirects_and_decodes(stub_server):
+    stub_server.responses['/old'] = [(301, {'Location': '/new'}, b'')]
+    stub_server.responses['/new'] = [(200, {'Content-Encoding': 'gzip'}, gzip.compress(b'page'))]
+    fetcher = AsyncFetcher()
+    try:
+        response = fetcher.fetch(stub_server.url + '/old')
+    finally:
+        fetcher.close()
+    assert response.url == stub_server.url + '/new'
+    assert response.body == b'page'
+
+
+def test_async_fetcher_honors_retry_after(stub_server):
+    stub_server.responses['/page'] = [(429, {'Retry-After': '1'}, b''), (200, {}, b'page')]
+    limiter = RateLimiter()
+    results = _fetch_all(AsyncFetcher(rate_limiter=limiter), [stub_server.url + '/page'])
+
+    assert results[stub_server.url + '/page'].body == b'page'
+    (_, first), (_, second) = stub_server.requests
+    assert second - first >= 1.0
+
+
+def test_async_fetcher_does_not_retry_unsupported_urls(stub_server, monkeypatch):
+    backoffs = []
+    monkeypatch.setattr(fetcher.random, 'uniform', lambda a, b: backoffs.append(b) or 0)
+    stub_server.responses['/moved'] = [(302, {'Location': 'ftp://files.test/page'}, b'')]
+    limiter = RateLimiter()
+    window = limiter.window(stub_server.url)
+    results = _fetch_all(AsyncFetcher(rate_limiter=limiter), ['ftp://files.test/page', stub_server.url + '/moved'])
+
+    assert results['ftp://files.test/page'].reason == 'Unsupported scheme ftp'
+    assert results[stub_server.url + '/moved'].status == 302
+    assert len(stub_server.requests) == 1
+    assert backoffs == []
+    # Neither counts as an overloaded host
+    assert limiter.window(stub_server.url) >= window
+    assert limiter.window('ftp://files.test/page') == window
+
+
+def test_async_fetcher_times_out_a_server_that_stops_reading():
+    # A request too large for the socket buffers stalls drain once nothing reads it
+    listener = socket.create_server(('127.0.0.1', 0))
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    url = 'http://127.0.0.1:%d/page' % listener.getsockname()[1]
+    fetcher = AsyncFetcher(timeout=1, max_retries=0)
+    start = time.time()
+    try:
+        with pytest.raises(FetchError):
+            fetcher.fetch(url, {'X-Padding': 'x' * (32 << 20)})
+    finally:
+        fetcher.close()
+        listener.close()
+    assert time.time() - start < 10
@@ -0,0 +1,68 @@
+import pytest
+
+from checkpoint import FETCHED, SAVED, UNCHANGED
+from fetchers.fetcher import FetchError, Response
+from fetchers.http_cache import CacheFetcher, HttpCache
+from fetchers.urllib_fetcher import UrllibFetcher
+from parsers.android_ref_parser import AndroidDocParser
+from scraper import Scraper
+from serializers.basic_serializer import BasicSerializer
+
+
+def test_revalidation_and_unchanged_pages(stub_server, tmp_path):
+    url = stub_server.url + '/page.html'
+    validators = {'ETag': '"v1"', 'Last-Modified': 'Mon, 05 Oct 2026 10:00:00 GMT'}
+    stub_server.responses['/page.html'] = [(200, validators, b'page'), (304, validators, b''),
+                                           (200, validators, b'page'), (200, validators, b'edited')]
+    cache = HttpCache(str(tmp_path / 'cache.db'))
+    fetcher = UrllibFetcher()
+    try:
+        assert cache.conditional_headers(url) == {}
+        assert cache.unchanged_links(url, fetcher.fetch(url)) is None
+        cache.store(url, Response(url, 200, {'etag': '"v1"', 'last-modified': validators['Last-Modified']},
+                                  b'page'), ['http://docs.test/a.html', 'http://docs.test/b.html'])
+
+        # Keys are normalized, so aliases of the url share the entry
+        headers = cache.conditional_headers(url.replace('http://', 'HTTP://') + '#top')
+        assert headers == {'If-None-Match': '"v1"', 'If-Modified-Since': validators['Last-Modified']}
+        # A 304, or the same body again, skips the page with the links it had
+        response = fetcher.fetch(url, headers)
+        assert response.status == 304
+        assert cache.unchanged_links(url, response) == ['http://docs.test/a.html', 'http://docs.test/b.html']
+        assert cache.unchanged_links(url, fetcher.fetch(url, headers)) == ['http://docs.test/a.html',
+                                                                           'http://docs.test/b.html']
+        assert cache.unchanged_links(url, fetcher.fetch(url, headers)) is None
+    finally:
+        cache.close()
+
+
+def test_cache_fetcher_replays_stored_pages(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = HttpCache(path)
+    cache.store('http://docs.test/a.html', Response('http://docs.test/a.html', 200, {}, b'page'), [])
+    cache.close()
+
+    fetcher = CacheFetcher(path)
+    try:
+        assert fetcher.fetch('http://docs.test/a.html').body == b'page'
+        with pytest.raises(FetchError):
+            fetcher.fetch('http://docs.test/b.html')
+    finally:
+        fetcher.close()
+
+
+def test_recrawl_skips_unchanged_pages(corpus_server, tmp_path):
+    def crawl():
+        scraper = Scraper(corpus_server.url + '/reference/classes.html', AndroidDocParser, BasicSerializer,
+                          path_filters=['reference'], save_path=str(tmp_path / 'out'), num_workers=2,
+                          cache_path=str(tmp_path / 'cache.db'), progress_interval=0)
+        try:
+            return dict(scraper.start_scraping())
+        finally:
+            scraper.close()
+
+    first = crawl()
+    assert set(first.values()) == {FETCHED, SAVED}
+    second = crawl()
+    assert sorted(second) == sorted(first)
+    assert set(second.values()) == {UNCHANGED}
@@ -0,0 +1,99 @@
+import json
+import os
+
+from index.builder import EntryLog, IndexBuilder, merge_logs
+from index.reader import SearchIndex
+from search import build
+
+
+def _doc(name, api_level, methods=(), constants=()):
+    return {'name': name, 'object_type': 'class', 'api_level': api_level, 'summary': ['The %s class' % name],
+            'constants': [{'name': c, 'type': 'int', 'value': 1, 'description': '', 'api_level': api_level}
+                          for c in constants],
+            'public_methods': [{'name': m, 'description': 'Returns a cursor', 'api_level': level,
+                                'returns': {'type': returns}, 'params': {'uri': {'type': 'Uri'}}}
+                               for m, returns, level in methods]}
+
+
+DOCS = [
+    ('http://docs.test/reference/android/content/ContentResolver.html',
+     _doc('ContentResolver', '1', [('query', 'Cursor', '1'), ('queryAll', 'android.database.Cursor', '26'),
+                                   ('insert', 'Uri', '1')], ['SYNC_EXTRAS_ACCOUNT'])),
+    ('http://docs.test/reference/android/app/Activity.html',
+     _doc('Activity', '1', [('getContentResolver', 'ContentResolver', '1'), ('requestPermissions', 'void', '23')],
+          ['RESULT_OK'])),
+    ('http://docs.test/reference/android/app/Fragment.html', _doc('Fragment', '11', [('getActivity', 'Activity', '11')])),
+]
+
+
+def _build(path):
+    builder = IndexBuilder(path)
+    for url, doc in DOCS:
+        builder.add(doc, url)
+    builder.close()
+    return SearchIndex(path)
+
+
+def _names(entries):
+    return sorted(entry['name'] for entry in entries)
+
+
+def test_exact_prefix_and_api_level_queries(tmp_path):
+    index = _build(str(tmp_path / 'index'))
+    try:
+        # Classes, methods and constants
+        assert len(index) == 3 + 6 + 2
+        assert _names(index.search(name='Activity')) == ['Activity']
+        assert _names(index.search(name='query*')) == ['query', 'queryAll']
+        assert _names(index.search(kind='method', returns='Cursor')) == ['query', 'queryAll']
+        assert _names(index.search(kind='constant')) == ['RESULT_OK', 'SYNC_EXTRAS_ACCOUNT']
+        assert _names(index.search(kind='method', api_level='11')) == ['getActivity']
+        assert _names(index.search(kind='method', api_level=('11', None))) == ['getActivity', 'queryAll',
+                                                                              'requestPermissions']
+        assert _names(index.search(kind='method', api_level=(None, '11'))) == ['getActivity', 'getContentResolver',
+                                                                               'insert', 'query']
+        assert _names(index.search(kind='method', api_level=('12', '25'))) == ['requestPermissions']
+        # Words of camel case names match on their own
+        assert _names(index.search('permissions')) == ['requestPermissions']
+        assert index.search(name='Missing') == []
+    finally:
+        index.close()
+
+
+def test_merge_carries_over_unchanged_pages(tmp_path):
+    path = str(tmp_path / 'index')
+    previous = _build(path)
+    log_path = str(tmp_path / 'logs' / 'entries-0.jsonl')
+    log = EntryLog(log_path)
+    # Activity was crawled again, ContentResolver skipped as unchanged and Fragment removed
+    log.add(_doc('Activity', '1', [('finish', 'void', '1')]), DOCS[1][0])
+    log.close()
+
+    merge_logs(path, [log_path], previous, removed=[DOCS[2][0]])
+    previous.close()
+    index = SearchIndex(path)
+    try:
+        assert _names(index.search(kind='method')) == ['finish', 'insert', 'query', 'queryAll']
+        assert _names(index.search(kind='class')) == ['Activity', 'ContentResolver']
+        assert index.search(name='Fragment') == []
+    finally:
+        index.close()
+
+
+def test_build_from_saved_documents(tmp_path):
+    save_path = str(tmp_path / 'out')
+    for url, doc in DOCS:
+        path = os.path.join(save_path, url.split('/reference/')[1].replace('.html', '.json'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as fp:
+            json.dump(dict(doc, url=url), fp)
+    # Reports are saved next to the documents and left out
+    with open(os.path.join(save_path, 'crawl-report.json'), 'w') as fp:
+        json.dump({'pages': 3}, fp)
+
+    assert build(save_path, str(tmp_path / 'index')) == 3
+    index = SearchIndex(str(tmp_path / 'index'))
+    try:
+        assert [entry['url'] for entry in index.search(name='Fragment')] == [DOCS[2][0]]
+    finally:
+        index.close()
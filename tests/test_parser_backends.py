@@ -0,0 +1,69 @@
+"""
+Every tree backend AndroidDocParser can run on has to give byte identical records
+to html5lib, the backend the expected outputs were made with. Run this file to make
+them again after a deliberate change of the output
+
+    python tests/test_parser_backends.py
+"""
+import glob
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.android_ref_parser import AndroidDocParser
+from serializers.basic_serializer import BasicSerializer
+from serializers.drqa_serializer import DrQASerializer
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'android_ref')
+PAGES = sorted(os.path.basename(path)[:-len('.html')] for path in glob.glob(os.path.join(FIXTURES, '*.html')))
+SERIALIZERS = {'json': BasicSerializer, 'drqa': DrQASerializer}
+
+
+def _url(page):
+    # app-Class5 was saved from reference/android/app/Class5.html
+    return 'https://developer.android.com/reference/android/%s.html' % page.replace('-', '/', 1)
+
+
+def convert(page, backend, Serializer):
+    """
+    Serialized documentation of a fixture page parsed on backend, 'null' if the parser
+    can't extract it
+    """
+    with open(os.path.join(FIXTURES, page + '.html'), 'rb') as fp:
+        html = fp.read()
+    Parser = type('Parser', (AndroidDocParser,), {'tree_backend': backend})
+    parser = Parser(Parser.build_tree(html))
+    if not parser.extract():
+        return 'null'
+    return Serializer(_url(page), parser).convert(parser.documentation, _url(page), page)
+
+
+def _expected_path(page, name):
+    return os.path.join(FIXTURES, '%s.%s.expected' % (page, name))
+
+
+def test_fixtures_present():
+    assert PAGES
+    for page in PAGES:
+        for name in SERIALIZERS:
+            assert os.path.exists(_expected_path(page, name))
+
+
+@pytest.mark.parametrize('backend', sorted({AndroidDocParser.tree_backend, 'html5lib', 'lxml', 'html.parser'}))
+@pytest.mark.parametrize('name', sorted(SERIALIZERS))
+@pytest.mark.parametrize('page', PAGES)
+def test_backend_output(page, name, backend):
+    with open(_expected_path(page, name), encoding='utf-8') as fp:
+        expected = fp.read()
+    assert convert(page, backend, SERIALIZERS[name]) == expected
+
+
+if __name__ == '__main__':
+    for page in PAGES:
+        for name, Serializer in SERIALIZERS.items():
+            with open(_expected_path(page, name), 'w', encoding='utf-8') as fp:
+                fp.write(convert(page, 'html5lib', Serializer))
+    print('Wrote the expected outputs of %d pages' % len(PAGES))
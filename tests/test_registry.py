@@ -0,0 +1,56 @@
+import pickle
+
+import pytest
+
+from parsers.android_ref_parser import AndroidDocParser
+from parsers.documentation_parser import DocumentationParser
+from parsers.registry import BUILTIN_PARSERS, ParserRouter, as_router, parser_router
+
+
+class GuideParser(DocumentationParser):
+    pass
+
+
+class SampleParser(DocumentationParser):
+    pass
+
+
+def test_router_dispatches_on_the_pattern_that_matched():
+    # Groups inside a pattern must not shift the routes after it
+    router = ParserRouter([(r'[a-z]+://([^/]+)/(guide|training)/', GuideParser),
+                           (r'[a-z]+://[^/]+/reference/', 'parsers.android_ref_parser:AndroidDocParser'),
+                           (r'[a-z]+://(?:[^/]+)/samples/', SampleParser)])
+    assert router.route('https://d.test/training/basics.html') is GuideParser
+    assert router.route('https://d.test/reference/android/app/Activity.html') is AndroidDocParser
+    assert router.route('https://d.test/samples/index.html') is SampleParser
+    assert router.route('https://d.test/about/') is None
+    assert router.key == 'GuideParser+AndroidDocParser+SampleParser'
+
+    # Workers import what they route to once unpickled
+    clone = pickle.loads(pickle.dumps(router))
+    assert clone._parsers == {}
+    assert clone.route('https://d.test/reference/android/app/Activity.html') is AndroidDocParser
+
+
+def test_named_regex_overrides_registered_patterns(monkeypatch):
+    monkeypatch.setitem(BUILTIN_PARSERS, 'guide', {'parser': GuideParser, 'patterns': [r'[a-z]+://[^/]+/guide/']})
+    router = parser_router(['guide', 'android-ref=.*/reference/android/app/'])
+    assert router.route('https://d.test/guide/topics.html') is GuideParser
+    assert router.route('https://d.test/reference/android/app/Activity.html') is AndroidDocParser
+    assert router.route('https://d.test/reference/android/view/View.html') is None
+
+    with pytest.raises(ValueError):
+        parser_router(['missing'])
+
+
+def test_as_router_sends_every_url_to_a_parser_class():
+    router = as_router(GuideParser)
+    assert router.route('https://d.test/anything') is GuideParser
+    assert as_router(router) is router
+
+
+def test_a_single_parser_gets_every_url():
+    router = parser_router(['android-ref'])
+    assert router.route('https://d.test/guide/topics.html') is AndroidDocParser
+    assert router.key == 'AndroidDocParser'
+    assert parser_router(['android-ref', 'android-ref=.*/guide/']).route('https://d.test/about/') is None
@@ -0,0 +1,36 @@
+import os
+
+from checkpoint import FAILED, SAVED
+from reparse import reparse
+from parsers.android_ref_parser import AndroidDocParser
+from serializers.basic_serializer import BasicSerializer
+from sources.directory_source import DirectorySource
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'android_ref')
+
+
+class _BrokenSource(DirectorySource):
+    """
+    Fixture pages, with one that has no body and one that can't be read
+    """
+    def keys(self):
+        for key in super(_BrokenSource, self).keys():
+            yield key
+        yield 'missing.html'
+        yield 'empty.html'
+
+    def read(self, key):
+        if key == 'empty.html':
+            return 'https://developer.android.com/empty.html', None
+        return super(_BrokenSource, self).read(key)
+
+
+def test_unreadable_pages_fail_alone(tmp_path):
+    source = _BrokenSource(FIXTURES, 'https://developer.android.com')
+    results = dict(reparse(source, AndroidDocParser, BasicSerializer, str(tmp_path), processes=2, chunksize=4,
+                           progress_interval=0))
+
+    assert results.pop('missing.html') == FAILED
+    assert results.pop('https://developer.android.com/empty.html') == FAILED
+    assert len(results) == 4
+    assert list(results.values()).count(SAVED) == 3
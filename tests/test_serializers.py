@@ -0,0 +1,12 @@
+from dedup import canonical_url
+from serializers.basic_serializer import BasicSerializer
+from serializers.drqa_serializer import DrQASerializer
+
+
+def test_output_path_of_canonical_index_pages():
+    url = canonical_url('https://developer.android.com/reference/android/index.html')
+    assert url.endswith('/android/')
+    assert BasicSerializer.output_path(url) == 'reference/android/index.json'
+    assert DrQASerializer.output_path(url) == 'reference/android/index.txt'
+    assert BasicSerializer.output_path('https://developer.android.com/reference/android/app/Activity.html') == \
+        'reference/android/app/Activity.json'
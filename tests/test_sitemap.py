@@ -0,0 +1,18 @@
+import time
+
+from sitemap import Manifest
+
+
+def test_pages_are_revalidated_once_stale(tmp_path):
+    manifest = Manifest(str(tmp_path / 'manifest.db'))
+    manifest.update('http://docs.test/A.html', 'a')
+    manifest.update('http://docs.test/B.html', 'b')
+    entries = {'http://docs.test/A.html': 'a', 'http://docs.test/B.html': 'b2', 'http://docs.test/C.html': 'c'}
+
+    assert manifest.diff(entries) == (['http://docs.test/B.html', 'http://docs.test/C.html'], [], [])
+    time.sleep(0.2)
+    assert manifest.diff(entries, revalidate_after=0.1)[1] == ['http://docs.test/A.html']
+    assert manifest.diff(entries, revalidate_after=60)[1] == []
+    assert manifest.diff({'http://docs.test/A.html': 'a'})[2] == ['http://docs.test/B.html']
+    manifest.close()
+
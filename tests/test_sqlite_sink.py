@@ -0,0 +1,55 @@
+import json
+import sqlite3
+
+from sinks.sqlite_sink import SqliteSink
+
+A = 'http://docs.test/reference/android/app/Activity.html'
+B = 'http://docs.test/reference/android/app/Fragment.html'
+
+
+def _drqa(records):
+    return ''.join(json.dumps({'id': id, 'text': text}) + '\n' for id, text in records)
+
+
+def _rows(db_path):
+    db = sqlite3.connect(db_path)
+    try:
+        return sorted(db.execute('SELECT id, text, url FROM documents'))
+    finally:
+        db.close()
+
+
+def test_upsert_replaces_changed_and_stale_sections(tmp_path):
+    db_path = str(tmp_path / 'docs.db')
+    sink = SqliteSink(str(tmp_path), db_path=db_path)
+    sink.write(A, 'Activity.txt', _drqa([('Activity Summary', 'old'), ('Activity Fields', 'fields'),
+                                         ('Activity Constants', 'constants')]))
+    sink.write(B, 'Fragment.txt', _drqa([('Fragment Summary', 'fragment')]))
+    sink.close()
+
+    # Activity lost its constants and changed its summary
+    sink = SqliteSink(str(tmp_path), db_path=db_path)
+    sink.write(A, 'Activity.txt', _drqa([('Activity Summary', 'new'), ('Activity Fields', 'fields')]))
+    sink.close()
+    assert _rows(db_path) == [('Activity Fields', 'fields', A), ('Activity Summary', 'new', A),
+                              ('Fragment Summary', 'fragment', B)]
+    assert SqliteSink.saved_urls(str(tmp_path), db_path=db_path) == {A, B}
+
+    SqliteSink.remove(str(tmp_path), [(B, 'Fragment.txt')], db_path=db_path)
+    assert SqliteSink.saved_urls(str(tmp_path), db_path=db_path) == {A}
+
+
+def test_documents_of_all_sinks_go_through_one_writer(tmp_path):
+    save_path = str(tmp_path)
+    writer = SqliteSink.start_writer(save_path)
+    sinks = [SqliteSink(save_path, worker_id, **writer.sink_options) for worker_id in range(2)]
+    sinks[0].write(A, 'Activity.txt', _drqa([('Activity Summary', 'activity')]))
+    # Text that isn't DrQA records is stored whole under its url
+    sinks[1].write(B, 'Fragment.json', '{"name": "Fragment"}')
+    for sink in sinks:
+        sink.close()
+    writer.close()
+
+    assert _rows(str(tmp_path / 'docs.db')) == [('Activity Summary', 'activity', A),
+                                                (B, '{"name": "Fragment"}', B)]
+    assert SqliteSink.saved_urls(str(tmp_path / 'missing')) == set()
@@ -0,0 +1,35 @@
+from checkpoint import FAILED, FETCHED
+from metrics import metrics
+from parsers.android_ref_parser import AndroidDocParser
+from scraper import Scraper
+from serializers.basic_serializer import BasicSerializer
+
+
+def _page(*links):
+    return ('<html><body>%s</body></html>' % ''.join('<a href="%s">link</a>' % link for link in links)).encode()
+
+
+def test_hanging_page_is_retried_then_quarantined(stub_server, tmp_path):
+    stub_server.responses['/site/start.html'] = [(200, {}, _page(stub_server.url + '/site/ok.html', stub_server.url + '/site/hangs.html'))]
+    stub_server.responses['/site/ok.html'] = [(200, {}, _page())]
+    # Far past the page timeout, the worker is killed long before
+    stub_server.responses['/site/hangs.html'] = [(200, {}, _page(), 60)]
+    quarantine_path = str(tmp_path / 'quarantine.tsv')
+    metrics.reset()
+
+    scraper = Scraper(stub_server.url + '/site/start.html', AndroidDocParser, BasicSerializer,
+                      path_filters=['site'], save_path=str(tmp_path), num_workers=2, progress_interval=0,
+                      page_timeout=1, max_attempts=2, quarantine_path=quarantine_path)
+    try:
+        results = dict(scraper.start_scraping())
+    finally:
+        scraper.close()
+
+    assert results == {stub_server.url + '/site/start.html': FETCHED, stub_server.url + '/site/ok.html': FETCHED,
+                       stub_server.url + '/site/hangs.html': FAILED}
+    # Every attempt killed the worker it ran on, which a fresh one replaced
+    assert [path for path, _ in stub_server.requests].count('/site/hangs.html') == 2
+    assert metrics.counter('page_timeouts') == 2
+    assert metrics.counter('quarantined') == 1
+    with open(quarantine_path) as f:
+        assert f.read() == '%s/site/hangs.html\t2\tpage timeout\n' % stub_server.url
@@ -0,0 +1,77 @@
+import glob
+import os
+import random
+
+from fetchers.fetcher import Response
+from warc import WarcReader, WarcWriter, scan
+
+
+def _response(url, body, status=200):
+    return Response(url, status, {'content-type': 'text/html'}, body)
+
+
+def _body(size, seed):
+    # Random bytes don't compress, so records stay about this large
+    return random.Random(seed).randbytes(size)
+
+
+def test_write_rotate_and_read_back(tmp_path):
+    path = str(tmp_path)
+    bodies = dict(('http://docs.test/%d.html' % i, _body(3000, i)) for i in range(5))
+    writer = WarcWriter(path, worker_id=0, max_size=4096)
+    for url, body in bodies.items():
+        writer.write(_response(url, body))
+    # Revalidated with a 304, which archives no body
+    writer.write(_response('http://docs.test/0.html', b'', status=304))
+    writer.close()
+
+    files = sorted(glob.glob(os.path.join(path, '*.warc.gz')))
+    assert len(files) == 5
+    assert all(len(list(scan(f))) >= 1 for f in files)
+
+    reader = WarcReader(path)
+    assert sorted(reader.urls()) == sorted(bodies)
+    assert reader.get('http://docs.test/3.html').body == bodies['http://docs.test/3.html']
+    assert reader.get('http://docs.test/0.html').status == 304
+    successful = dict((url, (path, offset, length)) for url, path, offset, length, _ in reader.entries(True))
+    assert len(successful) == 5
+    assert len(list(reader)) == 6
+
+
+def test_records_larger_than_a_file_go_in_one_file_each(tmp_path):
+    path = str(tmp_path)
+    writer = WarcWriter(path, max_size=1000)
+    for i in range(3):
+        writer.write(_response('http://docs.test/%d.html' % i, _body(5000, i)))
+    writer.close()
+
+    files = sorted(glob.glob(os.path.join(path, '*.warc.gz')))
+    assert [len(list(scan(f))) for f in files] == [1, 1, 1]
+
+
+def test_latest_record_wins_across_workers(tmp_path):
+    path = str(tmp_path)
+    later = WarcWriter(path, worker_id=1)
+    later.write(_response('http://docs.test/a.html', b'old'))
+    later.close()
+    earlier = WarcWriter(path, worker_id=0)
+    earlier.write(_response('http://docs.test/a.html', b'new'))
+    earlier.close()
+
+    assert WarcReader(path).get('http://docs.test/a.html').body == b'new'
+
+
+def test_index_is_rebuilt_from_the_files(tmp_path):
+    path = str(tmp_path)
+    writer = WarcWriter(path, max_size=4096)
+    for i in range(3):
+        writer.write(_response('http://docs.test/%d.html' % i, _body(3000, i)))
+    writer.write(_response('http://docs.test/1.html', b'refetched'))
+    writer.close()
+    for index_path in glob.glob(os.path.join(path, 'index-*.tsv')):
+        os.remove(index_path)
+
+    reader = WarcReader(path)
+    assert sorted(reader.urls()) == ['http://docs.test/%d.html' % i for i in range(3)]
+    assert reader.get('http://docs.test/1.html').body == b'refetched'
+    assert reader.get('http://docs.test/2.html').body == _body(3000, 2)
@@ -0,0 +1,322 @@
+"""
+Archives fetched responses as WARC files, so a crawl can be reproduced exactly and
+processed again from disk instead of from the network.
+"""
+from fetchers.fetcher import Response
+from http.client import responses as _REASONS
+from datetime import datetime, timezone
+import base64
+import glob
+import gzip
+import hashlib
+import os
+import queue
+import re
+import threading
+import uuid
+import zlib
+
+# Headers describing the transfer rather than the body. Bodies are stored decoded
+_TRANSFER_HEADERS = ('content-encoding', 'transfer-encoding', 'content-length', 'connection', 'keep-alive')
+_READ_SIZE = 64 * 1024
+
+
+def _now():
+    # With microseconds, dates order the records of all workers and runs as strings
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def _record(warc_type, headers, block, date=None):
+    lines = ['WARC/1.1', 'WARC-Type: %s' % warc_type, 'WARC-Record-ID: <urn:uuid:%s>' % uuid.uuid4(),
+             'WARC-Date: %s' % (date or _now())]
+    lines.extend('%s: %s' % header for header in headers)
+    lines.append('Content-Length: %d' % len(block))
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8') + block + b'\r\n\r\n'
+
+
+def _http_block(response):
+    lines = ['HTTP/1.1 %d %s' % (response.status, _REASONS.get(response.status, ''))]
+    lines.extend('%s: %s' % (name, value) for name, value in sorted(response.headers.items())
+                 if name not in _TRANSFER_HEADERS)
+    lines.append('content-length: %d' % len(response.body))
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1', 'replace') + response.body
+
+
+def _record_date(data):
+    m = re.search(rb'(?im)^warc-date:[ \t]*(\S+)', data[:data.find(b'\r\n\r\n')])
+    return m.group(1).decode('ascii') if m else ''
+
+
+def _parse_record(data):
+    """
+    Returns the response in a WARC record, None for records of other types
+    """
+    head, _, rest = data.partition(b'\r\n\r\n')
+    fields = {}
+    for line in head.decode('utf-8').split('\r\n')[1:]:
+        name, _, value = line.partition(':')
+        fields[name.strip().lower()] = value.strip()
+    if fields.get('warc-type') != 'response':
+        return None
+    block = rest[:int(fields['content-length'])]
+
+    http_head, _, body = block.partition(b'\r\n\r\n')
+    status_line, *header_lines = http_head.decode('latin-1').split('\r\n')
+    headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    headers.pop('content-length', None)
+    return Response(fields['warc-target-uri'], int(status_line.split(' ')[1]), headers, body)
+
+
+def _scan_compressed(fp):
+    # Every record is a gzip member of its own. Yields where each member starts and ends
+    offset, data = 0, b''
+    while True:
+        decompressor = zlib.decompressobj(31)
+        parts, length = [], 0
+        while not decompressor.eof:
+            if not data:
+                data = fp.read(_READ_SIZE)
+                if not data:
+                    # End of the file, or a record cut short by a crash
+                    return
+            parts.append(decompressor.decompress(data))
+            length += len(data) - len(decompressor.unused_data)
+            data = decompressor.unused_data
+        yield offset, length, b''.join(parts)
+        offset += length
+
+
+def _scan_plain(fp):
+    while True:
+        offset = fp.tell()
+        head = []
+        line = fp.readline()
+        while line and line != b'\r\n':
+            head.append(line)
+            line = fp.readline()
+        if not line:
+            return
+        length = int(re.search(rb'(?im)^content-length:\s*(\d+)', b''.join(head)).group(1))
+        block = fp.read(length + 4)
+        if len(block) < length + 4:
+            return
+        yield offset, fp.tell() - offset, b''.join(head) + b'\r\n' + block
+
+
+def _scan(path):
+    with open(path, 'rb') as fp:
+        records = _scan_compressed(fp) if path.endswith('.gz') else _scan_plain(fp)
+        for offset, length, data in records:
+            response = _parse_record(data)
+            if response is not None:
+                yield offset, length, response, _record_date(data)
+
+
+def scan(path):
+    """
+    Reads a WARC file front to back and yields (offset, length, response) for every
+    response record, without an index
+    """
+    for offset, length, response, _ in _scan(path):
+        yield offset, length, response
+
+
+def read_record(path, offset, length):
+    """
+    Reads the response record at offset of a WARC file
+    """
+    with open(path, 'rb') as fp:
+        fp.seek(offset)
+        data = fp.read(length)
+    return _parse_record(gzip.decompress(data) if path.endswith('.gz') else data)
+
+
+class WarcWriter(object):
+    """
+    Appends every response given to write as a WARC response record to rotating, size
+    bounded files under path. Records are gzip members of their own, the usual
+    .warc.gz layout, and indexed by url with the file, offset and length of their
+    record. Compressing and writing happens on a background thread behind a bounded
+    queue, so archiving doesn't hold up fetching
+    """
+    def __init__(self, path, worker_id=0, max_size=1024 * 1024 * 1024, compression='gzip',
+                 buffer_size=1024 * 1024, max_pending=256):
+        self._dir = path
+        os.makedirs(self._dir, exist_ok=True)
+        self._worker_id = worker_id
+        self._compress = gzip.compress if compression == 'gzip' else None
+        self._ext = '.gz' if compression == 'gzip' else ''
+        self._max_size = max_size
+        self._buffer_size = buffer_size
+
+        # Continue after the files of earlier runs instead of overwriting them
+        prefix = 'crawl-%03d-' % worker_id
+        numbers = [int(m.group(1)) for m in
+                   (re.match(re.escape(prefix) + r'(\d+)', os.path.basename(p))
+                    for p in glob.glob(os.path.join(self._dir, prefix + '*')))
+                   if m]
+        self._file_number = max(numbers) if numbers else -1
+        self._file_name = None
+        self._file = None
+        self._offset = 0
+        self._info_size = 0
+        self._index_file = open(os.path.join(self._dir, 'index-%03d.tsv' % worker_id), 'a')
+
+        self._buffer = []
+        self._buffered = 0
+        self._index = []
+        self._error = None
+        self._pending = queue.Queue(max_pending)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, response):
+        if self._error:
+            raise self._error
+        self._pending.put(response)
+
+    def _run(self):
+        while True:
+            response = self._pending.get()
+            if response is None:
+                break
+            try:
+                self._append(response)
+            except Exception as e:
+                self._error = e
+
+    def _rotate(self):
+        self.flush()
+        if self._file:
+            self._file.close()
+        self._file_number += 1
+        self._file_name = 'crawl-%03d-%05d.warc%s' % (self._worker_id, self._file_number, self._ext)
+        self._file = open(os.path.join(self._dir, self._file_name), 'wb')
+        self._offset = 0
+        info = b'software: documentation-scraper\r\nformat: WARC File Format 1.1\r\n'
+        self._add(self._encode(_record('warcinfo', [('Content-Type', 'application/warc-fields'),
+                                                    ('WARC-Filename', self._file_name)], info)))
+        self._info_size = self._offset
+
+    def _encode(self, data):
+        return self._compress(data) if self._compress else data
+
+    def _add(self, data):
+        self._buffer.append(data)
+        self._offset += len(data)
+        self._buffered += len(data)
+
+    def _append(self, response):
+        block = _http_block(response)
+        digest = base64.b32encode(hashlib.sha1(response.body).digest()).decode('ascii')
+        date = _now()
+        data = self._encode(_record('response', [('WARC-Target-URI', response.url),
+                                                 ('Content-Type', 'application/http;msgtype=response'),
+                                                 ('WARC-Payload-Digest', 'sha1:' + digest)], block, date))
+
+        # A record larger than max_size still goes in the file just started for it
+        if self._file is None or (self._offset > self._info_size and self._offset + len(data) > self._max_size):
+            self._rotate()
+        self._index.append('%s\t%s\t%d\t%d\t%d\t%s\n' % (response.url, self._file_name, self._offset,
+                                                         len(data), response.status, date))
+        self._add(data)
+        if self._buffered >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        # Data goes out before the index so the index never points past the end of a file
+        self._file.write(b''.join(self._buffer))
+        self._file.flush()
+        self._index_file.write(''.join(self._index))
+        self._index_file.flush()
+        self._buffer = []
+        self._index = []
+        self._buffered = 0
+
+    def close(self):
+        self._pending.put(None)
+        self._thread.join()
+        self.flush()
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._index_file.close()
+
+
+class WarcReader(object):
+    """
+    Reads back responses archived by WarcWriter, or any WARC files under path. Iterating
+    reads the files lazily front to back. get looks a url up in the index, which is
+    built by scanning the files when the writer left none. Urls fetched more than once
+    resolve to their latest response by WARC-Date, whichever worker or run archived
+    it. The latest successful one is kept apart, as revalidations archive a 304
+    without a body
+    """
+    def __init__(self, path):
+        self._is_dir = os.path.isdir(path)
+        if self._is_dir:
+            self._dir = path
+            self._files = sorted(glob.glob(os.path.join(path, '*.warc')) +
+                                 glob.glob(os.path.join(path, '*.warc.gz')))
+        else:
+            self._dir, self._files = os.path.dirname(path), [path]
+        self._index = None
+        self._successful = None
+
+    def _add(self, index, url, entry, date):
+        # Records of the same date keep the order they were read in
+        for latest in (index, self._successful) if entry[3] == 200 else (index,):
+            known = latest.get(url)
+            if known is None or date >= known[4]:
+                latest[url] = entry + (date,)
+
+    def _load_index(self):
+        index = {}
+        self._successful = {}
+        if self._is_dir:
+            for index_path in sorted(glob.glob(os.path.join(self._dir, 'index-*.tsv'))):
+                with open(index_path) as fp:
+                    for line in fp:
+                        # Skip a line cut short by a crash
+                        if not line.endswith('\n'):
+                            continue
+                        url, name, offset, length, status, date = line.rstrip('\n').split('\t')
+                        self._add(index, url, (os.path.join(self._dir, name), int(offset), int(length), int(status)),
+                                  date)
+        if not index:
+            for path in self._files:
+                for offset, length, response, date in _scan(path):
+                    self._add(index, response.url, (path, offset, length, response.status), date)
+        return index
+
+    def entries(self, successful=False):
+        """
+        Returns (url, path, offset, length, status) of the latest record of every url, or
+        with successful of the latest one with status 200
+        """
+        if self._index is None:
+            self._index = self._load_index()
+        index = self._successful if successful else self._index
+        return [(url,) + entry[:4] for url, entry in index.items()]
+
+    def get(self, url):
+        if self._index is None:
+            self._index = self._load_index()
+        path, offset, length, _, _ = self._index[url]
+        return read_record(path, offset, length)
+
+    def urls(self):
+        return [entry[0] for entry in self.entries()]
+
+    def __iter__(self):
+        for path in self._files:
+            for _, _, response in scan(path):
+                yield response
+
+    def __len__(self):
+        return len(self.entries())